@@ -0,0 +1,97 @@
+"""
+Сравнение построчных реализаций src/services.py с публичными функциями на списке словарей
+и с колоночными на синтетической истории.
+
+Запуск: python -m benchmarks.bench_services --rows 1000000
+"""
+
+import argparse
+import logging
+import re
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+from benchmarks.synthetic import synthetic_frame, synthetic_transactions
+from src.search import PHONE_PATTERN
+from src.services import (
+    analyze_cashback_categories,
+    cashback_categories_frame,
+    find_phone_frame,
+    find_phone_transactions,
+    investment_bank,
+    investment_bank_frame,
+)
+
+
+def legacy_investment_bank(month: str, transactions: List[Dict[str, Any]], limit: int) -> float:
+    """Построчная реализация до перехода на колонки — эталон для сравнения."""
+    filtered = filter(lambda t: t.get("Дата операции", "").startswith(month), transactions)
+
+    def rounding_diff(amount: float) -> float:
+        if amount >= 0:
+            return 0.0
+        abs_amount = abs(amount)
+        return ((abs_amount + limit - 1) // limit) * limit - abs_amount
+
+    return round(sum(map(lambda t: rounding_diff(t["Сумма операции"]), filtered)), 2)
+
+
+def legacy_find_phone(transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    pattern = re.compile(PHONE_PATTERN)
+    return [t for t in transactions if pattern.search(str(t.get("Описание", "")))]
+
+
+def legacy_cashback(data: List[Dict[str, Any]], year: int, month: int) -> Dict[str, float]:
+    result: Dict[str, float] = {}
+    for tx in data:
+        date = datetime.strptime(tx["Дата операции"], "%Y-%m-%d")
+        if date.year == year and date.month == month and tx["Сумма операции"] < 0:
+            result[tx["Категория"]] = result.get(tx["Категория"], 0) + abs(tx["Сумма операции"])
+    return result
+
+
+def timed(function: Callable[[], Any]) -> float:
+    started = time.perf_counter()
+    function()
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    frame = synthetic_frame(args.rows)
+    transactions = synthetic_transactions(frame)
+
+    # публичные функции на списке замеряются целиком, вместе с сериализацией в JSON
+    cases = {
+        "investment_bank": (
+            lambda: legacy_investment_bank("2020-06", transactions, 50),
+            lambda: investment_bank("2020-06", transactions, 50),
+            lambda: investment_bank_frame(frame, "2020-06", 50),
+        ),
+        "find_phone_transactions": (
+            lambda: legacy_find_phone(transactions),
+            lambda: find_phone_transactions(transactions),
+            lambda: find_phone_frame(frame),
+        ),
+        "analyze_cashback_categories": (
+            lambda: legacy_cashback(transactions, 2020, 6),
+            lambda: analyze_cashback_categories(transactions, 2020, 6),
+            lambda: cashback_categories_frame(frame, 2020, 6),
+        ),
+    }
+    print(f"{'функция':<30}{'построчно, с':>14}{'список, с':>14}{'колонки, с':>14}{'ускорение':>12}")
+    for name, (legacy, public, columnar) in cases.items():
+        legacy_time, public_time, columnar_time = timed(legacy), timed(public), timed(columnar)
+        print(
+            f"{name:<30}{legacy_time:>14.4f}{public_time:>14.4f}{columnar_time:>14.4f}"
+            f"{legacy_time / columnar_time:>11.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+Бенчмарки функций проекта на синтетических выгрузках 10k/1M/10M строк.
+
+Для каждого размера генерируется (один раз, в benchmarks/data/) выгрузка в формате data/operations.csv,
+после чего замеряются загрузка хранилища, функции главной страницы (сетевые запросы подменены заглушками),
+сервисы и отчёты. Для каждой функции пишется лучшее и медианное время и пик памяти по tracemalloc.
+
+Запуск:    python -m benchmarks.run --sizes 10k 1M --output benchmarks/results/current.json
+Сравнение: python -m benchmarks.run --compare benchmarks/results/base.json benchmarks/results/current.json
+"""
+
+import argparse
+import json
+import logging
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import replace
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import SIZES, write_export
+from src import config, views
+from src.aggregates import AggregateCube
+from src.cache import clear_response_cache
+from src.cashback import CashbackProgram, CashbackRule, SpendMatrix, compare_programs, optimize_cashback
+from src.investment import roundup_grid
+from src.recurring import RecurringDetector
+from src.reports import spending_by_hour, spending_by_weekday, spending_by_weekday_batch, spending_by_weekday_type
+from src.services import (
+    analyze_cashback_categories,
+    cashback_categories_frame,
+    find_phone_store,
+    find_phone_transactions,
+    investment_bank,
+    investment_bank_store,
+    rank_cashback_categories,
+)
+from src.sql_backend import OperationsDatabase
+from src.store import cache_path_for, clear_stores, load_store, to_transactions
+from src.streaming import stream_reports
+from src.transactions import TransactionBatch
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+DEFAULT_REPEAT = 3
+CASHBACK_CATEGORIES = ("Супермаркеты", "Фастфуд", "Рестораны", "Транспорт", "Аптеки", "Связь", "Каршеринг")
+# 5 значений pick × 200 базовых ставок — 1000 вариантов условий кешбэка
+CASHBACK_RATES = tuple(round(rate / 10_000, 4) for rate in range(1, 201))
+# построчные адаптеры services.py принимают список словарей; на 10M строк он не помещается в память
+LIST_ROWS_LIMIT = 1_000_000
+REGRESSION_THRESHOLD = 1.2
+
+STUB_RATES = [{"currency": "USD", "rate": 100.0}, {"currency": "EUR", "rate": 110.0}]
+STUB_PRICES = [{"stock": "AAPL", "price": 150.0}]
+
+
+def export_path(rows: int, seed: int) -> Path:
+    """Синтетическая выгрузка нужного размера; генерируется при первом обращении."""
+    path = DATA_DIR / f"operations_{rows}_{seed}.csv"
+    if not path.exists():
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        started = time.perf_counter()
+        write_export(path, rows, seed)
+        logging.warning("Сгенерирована выгрузка %s за %.1f с", path.name, time.perf_counter() - started)
+    return path
+
+
+def measure(function: Callable[[], Any], repeat: int = DEFAULT_REPEAT) -> Dict[str, float]:
+    """Лучшее и медианное время из repeat запусков и пик памяти отдельного запуска под tracemalloc."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "best_s": round(min(times), 6),
+        "median_s": round(statistics.median(times), 6),
+        "peak_mb": round(peak / 2**20, 2),
+    }
+
+
+def _cold_load(path: Path, use_cache: bool) -> Callable[[], Any]:
+    def load() -> Any:
+        clear_stores()
+        return load_store(path, use_cache=use_cache)
+
+    return load
+
+
+def _with_response_cache(function: Callable[[], Any]) -> Callable[[], Any]:
+    """Запуск с включённым кешем ответов: первый повтор — промах, остальные — попадания."""
+
+    def run() -> Any:
+        previous = config.get_config()
+        config.configure(replace(previous, response_cache=True))
+        try:
+            return function()
+        finally:
+            config.configure(previous)
+
+    return run
+
+
+def benchmark_cases(path: Path) -> Dict[str, Callable[[], Any]]:
+    """Замеряемые функции для выгрузки path; дата отчётов — последний день выгрузки."""
+    store = load_store(path)
+    last = store.frame["date"].max()
+    date, month = last.strftime("%Y-%m-%d %H:%M:%S"), last.strftime("%Y-%m")
+    month_frame = store.month_to_date(last)
+
+    cases: Dict[str, Callable[[], Any]] = {
+        "load_store_csv": _cold_load(path, use_cache=False),
+        "load_store_cache": _cold_load(path, use_cache=True),
+        "aggregates_build": lambda: AggregateCube.build(store.frame),
+        "filter_operations_by_date": lambda: views.filter_operations_by_date(date, str(path)),
+        "get_card_stats": lambda: views.get_card_stats(month_frame),
+        "get_top_transactions": lambda: views.get_top_transactions(month_frame),
+        "generate_main_page_data": lambda: views.generate_main_page_data(date, filepath=path),
+        "generate_main_page_data_cached": _with_response_cache(
+            lambda: views.generate_main_page_data(date, filepath=path)
+        ),
+        "investment_bank_store": lambda: investment_bank_store(store, month, 50),
+        "find_phone_store": lambda: find_phone_store(store),
+        "cashback_categories_frame": lambda: cashback_categories_frame(store.frame, last.year, last.month),
+        "rank_cashback_categories": lambda: rank_cashback_categories(store, last.year, last.month),
+        "spending_by_weekday": lambda: spending_by_weekday(store.frame, date),
+        "spending_by_weekday_type": lambda: spending_by_weekday_type(store.frame, date),
+        "spending_by_hour": lambda: spending_by_hour(store.frame, date),
+        "spending_by_weekday_batch_12": lambda: spending_by_weekday_batch(
+            store.frame, pd.date_range(end=last, periods=12, freq="MS")
+        ),
+        "stream_reports": lambda: stream_reports(path, date),
+    }
+    matrix = SpendMatrix.build(store.frame)
+    rules = tuple(CashbackRule(category, 0.05, categories=(category,), cap=1000) for category in CASHBACK_CATEGORIES)
+    programs = {
+        f"{pick}-{rate}": CashbackProgram(rules, rate, pick) for pick in range(1, 6) for rate in CASHBACK_RATES
+    }
+    cases["cashback_matrix_build"] = lambda: SpendMatrix.build(store.frame)
+    cases["optimize_cashback"] = lambda: optimize_cashback(matrix, programs["3-0.01"])
+    cases["compare_cashback_programs_1000"] = lambda: compare_programs(matrix, programs)
+    batch = TransactionBatch.from_frame(store.frame)
+    cases["transaction_batch_from_frame"] = lambda: TransactionBatch.from_frame(store.frame)
+    cases["investment_bank_batch"] = lambda: investment_bank(month, batch, 50)
+    # сетка 3 шага × 12 месяцев с построением журнала трат (без запомненных префиксов хранилища)
+    cases["roundup_grid_batch_3x12"] = lambda: roundup_grid(batch)
+    cases["recurring_detect"] = lambda: RecurringDetector.build(store.frame).series()
+    cases["find_phone_transactions_batch"] = lambda: find_phone_transactions(batch)
+    cases["analyze_cashback_categories_batch"] = lambda: analyze_cashback_categories(batch, last.year, last.month)
+    cases["spending_by_weekday_transaction_batch"] = lambda: spending_by_weekday(batch, date)
+    database = OperationsDatabase()
+    database.import_frame(store.frame)
+    cases["sql_import"] = lambda: OperationsDatabase().import_frame(store.frame)
+    cases["sql_card_stats"] = lambda: database.card_stats(date)
+    cases["sql_top_transactions"] = lambda: database.top_transactions(date)
+    cases["sql_category_totals"] = lambda: database.category_totals(last.year, last.month)
+    cases["sql_spending_by_weekday"] = lambda: database.spending_by_weekday(date)
+    if len(store) <= LIST_ROWS_LIMIT:
+        transactions = to_transactions(store.frame)
+        cases["investment_bank"] = lambda: investment_bank(month, transactions, 50)
+        cases["find_phone_transactions"] = lambda: find_phone_transactions(transactions)
+        cases["analyze_cashback_categories"] = lambda: analyze_cashback_categories(transactions, last.year, last.month)
+    return cases
+
+
+def run_benchmarks(sizes: Iterable[str], seed: int = 42, repeat: int = DEFAULT_REPEAT) -> Dict[str, Any]:
+    """
+    Прогоняет все бенчмарки для указанных размеров ('10k', '1M', '10M' или число строк).
+
+    Кеш ответов выключен, чтобы повторы замеряли расчёт, а не попадания; кроме случаев *_cached.
+    """
+    results: Dict[str, Any] = {}
+    clear_response_cache()
+    with (
+        patch.object(views, "get_currency_rates", lambda: STUB_RATES),
+        patch.object(views, "get_stock_prices", lambda api_key=None: STUB_PRICES),
+        patch.object(config, "_config", replace(config.get_config(), response_cache=False)),
+    ):
+        for size in sizes:
+            rows = SIZES.get(size) or int(size)
+            path = export_path(rows, seed)
+            cache_path_for(path).unlink(missing_ok=True)
+            clear_stores()
+            cases = {}
+            for name, function in benchmark_cases(path).items():
+                cases[name] = measure(function, repeat)
+                logging.warning(
+                    "%5s %-32s%10.4f с%10.1f МБ", size, name, cases[name]["median_s"], cases[name]["peak_mb"]
+                )
+            results[size] = {"rows": rows, "cases": cases}
+            clear_stores()
+            clear_response_cache()
+    return {"meta": _environment(seed, repeat), "results": results}
+
+
+def _environment(seed: int, repeat: int) -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "seed": seed,
+        "repeat": repeat,
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def compare(base: Dict[str, Any], current: Dict[str, Any], threshold: float = REGRESSION_THRESHOLD) -> list[dict]:
+    """Отношение медианного времени current/base для функций, замеренных в обоих прогонах."""
+    rows = []
+    for size, result in current["results"].items():
+        before = base["results"].get(size, {}).get("cases", {})
+        for name, case in result["cases"].items():
+            if name not in before or not before[name]["median_s"]:
+                continue
+            ratio = case["median_s"] / before[name]["median_s"]
+            rows.append(
+                {
+                    "size": size,
+                    "case": name,
+                    "base_s": before[name]["median_s"],
+                    "current_s": case["median_s"],
+                    "ratio": round(ratio, 3),
+                    "regression": ratio > threshold,
+                }
+            )
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарки на синтетических выгрузках")
+    parser.add_argument("--sizes", nargs="+", default=["10k"], help="10k, 1M, 10M или число строк")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--output", help="JSON с результатами (по умолчанию benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "CURRENT"), help="сравнить два JSON с результатами")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as f, open(args.compare[1], encoding="utf-8") as g:
+            rows = compare(json.load(f), json.load(g), args.threshold)
+        for row in rows:
+            mark = "  РЕГРЕССИЯ" if row["regression"] else ""
+            print(
+                f"{row['size']:>5} {row['case']:<32}{row['base_s']:>10.4f}{row['current_s']:>10.4f}"
+                f"{row['ratio']:>8.2f}x{mark}"
+            )
+        sys.exit(1 if any(row["regression"] for row in rows) else 0)
+
+    report = run_benchmarks(args.sizes, args.seed, args.repeat)
+    output = Path(args.output or RESULTS_DIR / f"{report['meta']['commit'] or 'results'}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
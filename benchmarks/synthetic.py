@@ -0,0 +1,139 @@
+"""
+Синтетические выгрузки операций для бенчмарков.
+
+Генератор детерминирован (seed) и повторяет формат data/operations.csv: 15 колонок, десятичная запятая,
+даты 'dd.mm.yyyy HH:MM:SS', строки от новых к старым. Распределения карт, категорий, MCC и сумм
+подобраны по реальной выгрузке.
+"""
+
+import argparse
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from src.store import coerce_operations
+
+# категория: (MCC, доля операций, медиана траты в рублях, описания)
+CATEGORY_PROFILES = {
+    "Супермаркеты": (5411, 0.38, 250.0, ["Колхоз", "Магнит", "Пятёрочка", "Перекрёсток", "Лента"]),
+    "Фастфуд": (5814, 0.12, 180.0, ["Kfc", "Mouse Tail", "Бургер Кинг", "Вкусно и точка"]),
+    "Местный транспорт": (4111, 0.1, 60.0, ["Метро Санкт-Петербург", "Transport"]),
+    "Такси": (4121, 0.06, 350.0, ["Яндекс Такси", "Ситимобил"]),
+    "Рестораны": (5812, 0.05, 1200.0, ["Pintxos", "Sushi Master", "Теремок"]),
+    "Аптеки": (5912, 0.04, 450.0, ["Аптека 36,6", "Ригла"]),
+    "Одежда и обувь": (5651, 0.03, 2500.0, ["Uniqlo", "Спортмастер"]),
+    "Связь": (4814, 0.04, 300.0, ["МТС +7 921 111-22-33", "Тинькофф Мобайл +7 995 555-55-55", "Билайн"]),
+    "Цифровые товары": (5815, 0.03, 299.0, ["Яндекс Плюс", "Google Play", "Ivi"]),
+    "Переводы": (None, 0.08, 3000.0, ["Иван С.", "Светлана Т.", "Перевод Кредитная карта. ТП 10.2 RUR"]),
+    "Пополнения": (None, 0.04, 10000.0, ["Пополнение через Газпромбанк", "Внесение наличных через банкомат"]),
+    "Каршеринг": (7512, 0.03, 700.0, ["Ситидрайв", "Делимобиль"]),
+}
+CARDS = (["*7197", "*4556", "*1112", "*5091", "*5507", "*6002"], [0.45, 0.25, 0.12, 0.1, 0.05, 0.03])
+CURRENCIES = (["RUB", "USD", "EUR"], [0.97, 0.02, 0.01])
+STATUSES = (["OK", "FAILED"], [0.985, 0.015])
+INCOME_CATEGORIES = {"Пополнения"}
+
+SIZES = {"10k": 10_000, "1M": 1_000_000, "10M": 10_000_000}
+
+
+def _chunk(rows: int, rng: np.random.Generator, start_ns: int, end_ns: int) -> pd.DataFrame:
+    names = list(CATEGORY_PROFILES)
+    weights = np.array([profile[1] for profile in CATEGORY_PROFILES.values()])
+    category_codes = rng.choice(len(names), size=rows, p=weights / weights.sum())
+
+    medians = np.array([profile[2] for profile in CATEGORY_PROFILES.values()])
+    amounts = np.round(rng.lognormal(np.log(medians[category_codes]), 0.7), 2)
+    income = np.isin(category_codes, [names.index(name) for name in INCOME_CATEGORIES])
+    amounts = np.where(income, amounts, -amounts)
+
+    mcc = np.array([np.nan if profile[0] is None else profile[0] for profile in CATEGORY_PROFILES.values()])
+    description_offsets = np.cumsum([0] + [len(profile[3]) for profile in CATEGORY_PROFILES.values()])
+    descriptions = [description for profile in CATEGORY_PROFILES.values() for description in profile[3]]
+    counts = np.diff(description_offsets)
+    description_codes = description_offsets[category_codes] + (rng.random(rows) * counts[category_codes]).astype(int)
+
+    dates = np.sort(rng.integers(start_ns, end_ns, rows))[::-1].view("datetime64[ns]")
+    cashback = np.floor(np.abs(amounts) / 100)
+    rounding = np.where(amounts < 0, np.ceil(-amounts / 10) * 10 + amounts, 0.0)
+
+    def choice(values: tuple[list[str], list[float]]) -> pd.Categorical:
+        return pd.Categorical.from_codes(rng.choice(len(values[0]), size=rows, p=values[1]), values[0])
+
+    currency = choice(CURRENCIES)
+    return pd.DataFrame(
+        {
+            "Дата операции": dates,
+            "Дата платежа": pd.DatetimeIndex(dates).normalize(),
+            "Номер карты": choice(CARDS),
+            "Статус": choice(STATUSES),
+            "Сумма операции": amounts,
+            "Валюта операции": currency,
+            "Сумма платежа": amounts,
+            "Валюта платежа": pd.Categorical(["RUB"] * rows),
+            "Кэшбэк": np.where(amounts < 0, cashback, np.nan),
+            "Категория": pd.Categorical.from_codes(category_codes, names),
+            "MCC": mcc[category_codes],
+            "Описание": pd.Categorical.from_codes(description_codes, descriptions),
+            "Бонусы (включая кэшбэк)": cashback,
+            "Округление на инвесткопилку": np.round(rounding, 2),
+            "Сумма операции с округлением": np.abs(amounts),
+        }
+    )
+
+
+def iter_export_chunks(
+    rows: int, seed: int = 42, start: str = "2018-01-01", years: int = 4, chunk_rows: int = 500_000
+) -> Iterator[pd.DataFrame]:
+    """Части синтетической выгрузки в колонках банка; вся выгрузка упорядочена от новых операций к старым."""
+    rng = np.random.default_rng(seed)
+    start_ns = pd.Timestamp(start).value
+    end_ns = start_ns + pd.Timedelta(days=365 * years).value
+    chunks = max(1, -(-rows // chunk_rows))
+    bounds = np.linspace(end_ns, start_ns, chunks + 1).astype(np.int64)
+    for index in range(chunks):
+        size = min(chunk_rows, rows - index * chunk_rows)
+        yield _chunk(size, rng, int(bounds[index + 1]), int(bounds[index]))
+
+
+def write_export(path: str | Path, rows: int, seed: int = 42, chunk_rows: int = 500_000) -> Path:
+    """Записывает синтетическую выгрузку в CSV в формате data/operations.csv."""
+    path = Path(path)
+    for index, chunk in enumerate(iter_export_chunks(rows, seed, chunk_rows=chunk_rows)):
+        chunk = chunk.copy()
+        chunk["Дата операции"] = chunk["Дата операции"].dt.strftime("%d.%m.%Y %H:%M:%S")
+        chunk["Дата платежа"] = chunk["Дата платежа"].dt.strftime("%d.%m.%Y")
+        chunk["MCC"] = chunk["MCC"].astype("Int64")
+        chunk.to_csv(
+            path, mode="w" if index == 0 else "a", header=index == 0, index=False, decimal=",", float_format="%.2f"
+        )
+    return path
+
+
+def synthetic_frame(rows: int, seed: int = 42, start: str = "2018-01-01", years: int = 4) -> pd.DataFrame:
+    """Синтетическая история сразу в типизированном виде хранилища (src/store.py), отсортированная по дате."""
+    chunks = iter_export_chunks(rows, seed, start, years, chunk_rows=max(rows, 1))
+    return coerce_operations(pd.concat(chunks, ignore_index=True))
+
+
+def synthetic_transactions(frame: pd.DataFrame) -> list[dict]:
+    """Тот же набор операций в формате списка словарей для функций src/services.py."""
+    return [
+        {"Дата операции": date, "Сумма операции": amount, "Категория": category, "Описание": description}
+        for date, amount, category, description in zip(
+            frame["date"].dt.strftime("%Y-%m-%d"),
+            frame["amount"].tolist(),
+            frame["category"].astype(str),
+            frame["description"].astype(str),
+        )
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Генератор синтетической выгрузки операций")
+    parser.add_argument("output")
+    parser.add_argument("--rows", default="10k", help="число строк или 10k/1M/10M")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    write_export(args.output, SIZES.get(args.rows) or int(args.rows), args.seed)
@@ -1,8 +1,12 @@
-import pandas as pd
-from src.services import investment_bank, find_phone_transactions, analyze_cashback_categories
-from src.reports import spending_by_weekday
+from src.config import setup_logging
+
 
 def main():
+    # Расчётные модули (и pandas) загружаются только при запуске примера, а не при импорте main
+    from src.reports import spending_by_weekday
+    from src.services import analyze_cashback_categories, find_phone_transactions, investment_bank
+    from src.transactions import TransactionBatch
+
     # Пример данных
     transactions = [
         {"Дата операции": "2024-06-01", "Сумма операции": -1712, "Категория": "Продукты", "Описание": "Покупка"},
@@ -11,25 +15,26 @@ def main():
         {"Дата операции": "2024-06-10", "Сумма операции": 500, "Категория": "Доход", "Описание": "Зарплата"},
         {"Дата операции": "2024-06-03", "Сумма операции": -350, "Категория": "Продукты", "Описание": "Магазин"},
     ]
+    # Один компактный набор операций для всех расчётов вместо повторного разбора списка словарей
+    batch = TransactionBatch.from_transactions(transactions)
 
     print("=== Инвесткопилка ===")
-    invested = investment_bank("2024-06", transactions, 50)
+    invested = investment_bank("2024-06", batch, 50)
     print(f"Отложено: {invested} ₽\n")
 
     print("=== Поиск транзакций с телефонами ===")
-    phones_json = find_phone_transactions(transactions)
+    phones_json = find_phone_transactions(batch)
     print(phones_json, "\n")
 
     print("=== Анализ кешбэка по категориям ===")
-    cashback_json = analyze_cashback_categories(transactions, 2024, 6)
+    cashback_json = analyze_cashback_categories(batch, 2024, 6)
     print(cashback_json, "\n")
 
     print("=== Траты по дням недели ===")
-    # Для отчета создадим DataFrame
-    df = pd.DataFrame(transactions)
-    spend_by_day_df = spending_by_weekday(df, "2024-06-30")
+    spend_by_day_df = spending_by_weekday(batch, "2024-06-30")
     print(spend_by_day_df)
 
 
 if __name__ == "__main__":
+    setup_logging()
     main()
\ No newline at end of file
@@ -0,0 +1,168 @@
+import logging
+from datetime import timedelta
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from src import metrics
+from src.store import DateLike, OperationsStore, month_start, rub_column
+
+AGGREGATE_KEYS = ("card", "category", "mcc")
+TOP_K = 5
+ROUNDUP_LIMITS = (10, 50, 100)
+
+
+class AggregateCube:
+    """
+    Материализованные агрегаты по операциям.
+
+    Для каждого дня хранятся суммы и количество расходов в разрезе карты, категории и MCC,
+    округления «Инвесткопилки» для стандартных шагов ROUNDUP_LIMITS (в копейках, как в RoundupLedger),
+    а также top-K строк по модулю суммы платежа. Суммы берутся в рублях на дату операции
+    (amount_rub, payment_amount_rub), если хранилище посчитало их по таблице курсов. Месячные показатели
+    и значения «с начала месяца» собираются из дневных частичных сумм, не трогая сырые операции.
+    """
+
+    def __init__(self, top_k: int = TOP_K):
+        self.top_k = top_k
+        self.daily: Dict[str, pd.DataFrame] = {}
+        self.daily_roundups = pd.DataFrame(columns=list(ROUNDUP_LIMITS), dtype="int64")
+        self.daily_top = pd.DataFrame({"label": pd.Series(dtype="int64"), "weight": pd.Series(dtype="float64")})
+        self.daily_top.index = pd.DatetimeIndex([], name="day")
+
+    @classmethod
+    def build(cls, frame: pd.DataFrame, top_k: int = TOP_K) -> "AggregateCube":
+        """Строит агрегаты по всем операциям хранилища."""
+        cube = cls(top_k)
+        cube.append(frame)
+        logging.info("Агрегаты построены по %s операциям", len(frame))
+        return cube
+
+    def append(self, rows: pd.DataFrame) -> None:
+        """
+        Добавляет новые операции: пересчитываются только дни, в которые они попали.
+
+        Индекс rows должен совпадать с метками строк в хранилище — по ним top-K ссылается на операции.
+        """
+        if rows.empty:
+            return
+
+        expenses = rows[rows["amount"] < 0]
+        days = expenses["date"].dt.normalize()
+        values = pd.DataFrame({"spent": -expenses[rub_column(rows)], "count": 1}, index=expenses.index)
+        for key in AGGREGATE_KEYS:
+            if key not in rows:
+                continue
+            partial = values.groupby([days.to_numpy(), expenses[key].to_numpy()]).sum()
+            partial.index.names = ["day", key]
+            current = self.daily.get(key)
+            if current is not None:
+                partial = current.add(partial, fill_value=0).sort_index().astype({"count": "int64"})
+            self.daily[key] = partial
+
+        spent = np.round(-expenses["amount"].to_numpy() * 100).astype(np.int64)
+        roundups = pd.DataFrame({limit: -spent % (limit * 100) for limit in ROUNDUP_LIMITS}, index=days.to_numpy())
+        roundups = roundups.groupby(level=0).sum()
+        if not self.daily_roundups.empty:
+            roundups = self.daily_roundups.add(roundups, fill_value=0).astype("int64")
+        self.daily_roundups = roundups.sort_index()
+
+        if "payment_amount" in rows:
+            payments = rows[rub_column(rows, "payment_amount")].dropna()
+            candidates = pd.DataFrame(
+                {"label": payments.index.to_numpy(), "weight": payments.abs().to_numpy()},
+                index=pd.DatetimeIndex(rows.loc[payments.index, "date"].dt.normalize(), name="day"),
+            )
+            affected = self.daily_top.index.isin(candidates.index.unique())
+            merged = pd.concat([self.daily_top[affected], candidates])
+            merged = merged.sort_values("weight", ascending=False, kind="stable")
+            merged = merged.groupby(level="day").head(self.top_k)
+            self.daily_top = pd.concat([self.daily_top[~affected], merged]).sort_index(kind="stable")
+
+    def totals(self, key: str, start: DateLike, end: DateLike) -> pd.Series:
+        """Суммы расходов по ключу за дни [start, end] включительно."""
+        daily = self.daily.get(key)
+        if daily is None or daily.empty:
+            return pd.Series(dtype="float64", name="spent")
+        days = daily.index.get_level_values("day")
+        left, right = days.searchsorted(pd.Timestamp(start)), days.searchsorted(pd.Timestamp(end), side="right")
+        return daily.iloc[left:right].groupby(level=key)["spent"].sum()
+
+    def counts(self, key: str, start: DateLike, end: DateLike) -> pd.Series:
+        """Количество расходных операций по ключу за дни [start, end] включительно."""
+        daily = self.daily.get(key)
+        if daily is None or daily.empty:
+            return pd.Series(dtype="int64", name="count")
+        days = daily.index.get_level_values("day")
+        left, right = days.searchsorted(pd.Timestamp(start)), days.searchsorted(pd.Timestamp(end), side="right")
+        return daily.iloc[left:right].groupby(level=key)["count"].sum().astype("int64")
+
+    def roundup_total(self, limit: int, start: DateLike, end: DateLike) -> float:
+        """Сумма округлений в «Инвесткопилку» с шагом limit (из ROUNDUP_LIMITS) за дни [start, end]."""
+        return round(int(self.daily_roundups.loc[pd.Timestamp(start) : pd.Timestamp(end), limit].sum()) / 100, 2)
+
+    def month_totals(self, key: str, month: DateLike) -> pd.Series:
+        """Суммы расходов по ключу за календарный месяц."""
+        start = month_start(month)
+        return self.totals(key, start, start + pd.offsets.MonthEnd(0))
+
+    def top_labels(self, start: DateLike, end: DateLike, k: Optional[int] = None) -> pd.Index:
+        """Метки top-k операций по модулю суммы платежа за дни [start, end] включительно."""
+        top = self.daily_top.loc[pd.Timestamp(start) : pd.Timestamp(end)]
+        top = top.sort_values("weight", ascending=False, kind="stable").head(k or self.top_k)
+        return pd.Index(top["label"].to_numpy())
+
+    def month_top_labels(self, month: DateLike, k: Optional[int] = None) -> pd.Index:
+        """Метки top-k операций по модулю суммы платежа за календарный месяц."""
+        start = month_start(month)
+        return self.top_labels(start, start + pd.offsets.MonthEnd(0), k)
+
+
+def get_cube(store: OperationsStore) -> AggregateCube:
+    """Агрегаты хранилища; строятся один раз при первом обращении."""
+    return store.derived("aggregates", AggregateCube.build)
+
+
+def _split_month_to_date(date: DateLike) -> tuple[pd.Timestamp, Optional[pd.Timestamp], pd.Timestamp, pd.Timestamp]:
+    """Разбивает период «с начала месяца» на полные дни [start, last_full_day] и текущий неполный день."""
+    current = pd.Timestamp(date)
+    day_start = current.normalize()
+    start = month_start(current)
+    last_full_day = day_start - timedelta(days=1) if day_start > start else None
+    return start, last_full_day, day_start, current
+
+
+def month_to_date_totals(store: OperationsStore, key: str, date: DateLike) -> pd.Series:
+    """
+    Суммы расходов по ключу с начала месяца по указанный момент.
+
+    Полные дни берутся из агрегатов, операции текущего дня до указанного времени досчитываются по сырым строкам.
+    """
+    start, last_full_day, day_start, current = _split_month_to_date(date)
+    totals = get_cube(store).totals(key, start, last_full_day) if last_full_day is not None else None
+
+    with metrics.span("group", stage="month_to_date_totals"):
+        today = store.between(day_start, current)
+        expenses = today[today["amount"] < 0]
+        partial = (-expenses[rub_column(expenses)]).groupby(expenses[key].to_numpy()).sum()
+    metrics.rows_scanned(len(today), "month_to_date_totals")
+    if totals is None or totals.empty:
+        return partial.sort_index()
+    return totals.add(partial, fill_value=0).sort_index()
+
+
+def month_to_date_top(store: OperationsStore, date: DateLike) -> pd.DataFrame:
+    """
+    Кандидаты в top-K операций с начала месяца по указанный момент.
+
+    Возвращает не более TOP_K строк за каждый полный день и все строки текущего дня — окончательный
+    отбор делает вызывающий код, сортируя эту небольшую выборку.
+    """
+    start, last_full_day, day_start, current = _split_month_to_date(date)
+    cube = get_cube(store)
+    today = store.between(day_start, current)
+    if last_full_day is None:
+        return today
+    full_days = np.sort(cube.daily_top.loc[start:last_full_day, "label"].to_numpy())
+    return pd.concat([store.frame.loc[full_days], today])
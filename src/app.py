@@ -0,0 +1,303 @@
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import pandas as pd
+from flask import Flask, Response, jsonify, request
+from werkzeug.exceptions import BadRequest, HTTPException
+
+from src import metrics, views
+from src.cache import cached_call, dataset_version
+from src.cashback import cashback_plan_table, load_program, optimize_cashback
+from src.config import configure, get_config, setup_logging
+from src.ingest import ingest_export
+from src.investment import roundup_grid, roundup_grid_table
+from src.recurring import find_recurring, recurring_table
+from src.reports import spending_by_hour, spending_by_weekday, spending_by_weekday_type
+from src.search import search_operations
+from src.services import (
+    cashback_categories_frame,
+    find_phone_store,
+    investment_bank_store,
+    rank_cashback_categories,
+)
+from src.sql_backend import QUERY_LIMIT, get_database
+from src.store import OperationsStore, file_signature, load_store
+
+DEFAULT_PAGE_SIZE = 100
+
+
+def frame_to_records(df: pd.DataFrame) -> list[dict]:
+    """Строки DataFrame хранилища в виде JSON-совместимых словарей (даты — ISO-строки, пропуски — null)."""
+    records = df.copy()
+    for column in records.columns:
+        if pd.api.types.is_datetime64_any_dtype(records[column]):
+            records[column] = records[column].dt.strftime("%Y-%m-%dT%H:%M:%S")
+    return records.astype(object).where(records.notna(), None).to_dict(orient="records")
+
+
+def _etag(*parts: Any) -> str:
+    return hashlib.sha1(json.dumps(parts, ensure_ascii=False, default=str).encode()).hexdigest()
+
+
+def _arg(name: str, convert: Callable[[str], Any] = str, default: Any = None) -> Any:
+    value = request.args.get(name)
+    if value is None:
+        if default is None:
+            raise BadRequest(f"Не указан параметр {name}")
+        return default
+    try:
+        return convert(value)
+    except ValueError:
+        raise BadRequest(f"Некорректное значение параметра {name}: {value}")
+
+
+def _list(convert: Callable[[str], Any]) -> Callable[[str], list]:
+    """Разбор списка через запятую: '10,50,100' -> [10, 50, 100]."""
+    return lambda value: [convert(item.strip()) for item in value.split(",") if item.strip()]
+
+
+def _range(value: str) -> tuple[str, str]:
+    """Разбор периода 'YYYY-MM-DD..YYYY-MM-DD'."""
+    start, separator, end = value.partition("..")
+    if not separator:
+        raise ValueError(value)
+    return _date(start), _date(end)
+
+
+def _date(value: str) -> str:
+    """Проверяет, что строка разбирается как дата, и возвращает её без изменений."""
+    pd.Timestamp(value)
+    return value
+
+
+def _month(value: str) -> int:
+    """Разбор номера месяца 1..12."""
+    month = int(value)
+    if not 1 <= month <= 12:
+        raise ValueError(value)
+    return month
+
+
+def _serialize(data: Any) -> Response:
+    with metrics.span("json_serialize", function=request.endpoint or "unknown"):
+        return jsonify(data)
+
+
+def create_app(
+    data_path: Optional[str | Path] = None,
+    settings_path: Optional[str | Path] = None,
+    metrics_enabled: Optional[bool] = None,
+) -> Flask:
+    """
+    HTTP API поверх функций проекта.
+
+    Хранилище операций, агрегаты и кеш рыночных данных живут в процессе и переиспользуются между
+    запросами. Ответы снабжаются ETag: для расчётов по операциям он зависит только от параметров
+    запроса и версии данных, поэтому при If-None-Match повторный запрос получает 304 без пересчёта.
+    metrics_enabled включает сбор метрик (src/metrics.py), которые отдаются на /metrics.
+    """
+    if metrics_enabled is not None:
+        metrics.enable(metrics_enabled)
+    app = Flask(__name__)
+    app.json.ensure_ascii = False  # type: ignore[attr-defined]
+    app.json.sort_keys = False  # type: ignore[attr-defined]
+    config = get_config()
+    data_file = Path(data_path or config.data_path)
+    settings_file = Path(settings_path or config.settings_path)
+
+    def store() -> OperationsStore:
+        return load_store(data_file)
+
+    def settings() -> Dict[str, Any]:
+        if not settings_file.exists():
+            return {}
+        return json.loads(settings_file.read_text(encoding="utf-8"))  # type: ignore[no-any-return]
+
+    def data_version() -> Any:
+        """Версия операций (файл, дозагрузки, таблица курсов) и файла настроек."""
+        return [dataset_version(store()), file_signature(settings_file) if settings_file.exists() else None]
+
+    def cached_by_version(compute: Callable[[OperationsStore], Any]) -> Response:
+        """
+        Отдаёт 304, если клиент уже видел ответ на этот запрос для текущей версии данных.
+
+        Иначе тело ответа берётся из кеша ответов (src/cache.py) по тому же ключу и считается только при промахе.
+        """
+        etag = _etag(request.path, sorted(request.args.items(multi=True)), data_version())
+        if etag in request.if_none_match:
+            metrics.cache_lookup("etag", hit=True)
+            return Response(status=304, headers={"ETag": f'"{etag}"'})
+        metrics.cache_lookup("etag", hit=False)
+        with metrics.span("compute", endpoint=request.endpoint or "unknown"):
+            data = cached_call("app", etag, lambda: compute(store()))
+        response = _serialize(data)
+        response.set_etag(etag)
+        return response
+
+    @app.errorhandler(HTTPException)
+    def handle_http_error(error: HTTPException) -> Response:
+        response = jsonify({"error": error.description})
+        response.status_code = error.code or 500
+        return response
+
+    @app.get("/api/main")
+    def main_page() -> Response:
+        date = _arg("date", _date)
+        data = views.generate_main_page_data(date, filepath=data_file)
+        body = {key: value for key, value in data.items() if key != "meta"}
+        etag = _etag(body)
+        if etag in request.if_none_match:
+            return Response(status=304, headers={"ETag": f'"{etag}"'})
+        response = _serialize(data)
+        response.set_etag(etag)
+        return response
+
+    @app.get("/metrics")
+    def metrics_snapshot() -> Response:
+        """Метрики процесса: текст Prometheus, или JSON-снимок при ?format=json."""
+        if request.args.get("format") == "json":
+            return jsonify(metrics.snapshot())
+        return Response(metrics.to_prometheus(), mimetype="text/plain; version=0.0.4")
+
+    @app.get("/api/services/investment-bank")
+    def investment_bank() -> Response:
+        month, limit = _arg("month", _date), _arg("limit", int, 50)
+        if limit <= 0:
+            raise BadRequest("Шаг округления должен быть положительным")
+        return cached_by_version(
+            lambda operations: {
+                "month": month,
+                "limit": limit,
+                "invested": investment_bank_store(operations, month, limit),
+            }
+        )
+
+    @app.get("/api/services/investment-bank/grid")
+    def investment_bank_grid() -> Response:
+        """Сетка «Инвесткопилки»: шаги limits × месяцы months и периоды ranges (по умолчанию — 12 месяцев)."""
+        limits = _arg("limits", _list(int), [10, 50, 100])
+        month_list = _arg("months", _list(_date)) if "months" in request.args else None
+        range_list = _arg("ranges", _list(_range)) if "ranges" in request.args else None
+        if any(limit <= 0 for limit in limits):
+            raise BadRequest("Шаги округления должны быть положительными")
+        return cached_by_version(
+            lambda operations: roundup_grid_table(roundup_grid(operations, limits, month_list, range_list))
+        )
+
+    @app.get("/api/services/phones")
+    def phones() -> Response:
+        offset, limit = _arg("offset", int, 0), _arg("limit", int, DEFAULT_PAGE_SIZE)
+        if offset < 0:
+            raise BadRequest("Параметр offset не может быть отрицательным")
+        if limit <= 0:
+            raise BadRequest("Параметр limit должен быть положительным")
+
+        def compute(operations: OperationsStore) -> Dict[str, Any]:
+            found = find_phone_store(operations)
+            return {"total": len(found), "items": frame_to_records(found.iloc[offset : offset + limit])}
+
+        return cached_by_version(compute)
+
+    @app.get("/api/services/cashback")
+    def cashback() -> Response:
+        year, month = _arg("year", int), _arg("month", _month)
+        return cached_by_version(lambda operations: cashback_categories_frame(operations.frame, year, month))
+
+    @app.get("/api/services/cashback/ranking")
+    def cashback_ranking() -> Response:
+        year, month = _arg("year", int), _arg("month", _month)
+        return cached_by_version(lambda operations: json.loads(rank_cashback_categories(operations, year, month)))
+
+    @app.get("/api/services/cashback/optimize")
+    def cashback_optimize() -> Response:
+        """Лучший выбор категорий кешбэка по месяцам по условиям из настроек; pick и months переопределяются."""
+        pick = _arg("pick", int, -1)
+        months = _arg("months", _list(_date)) if "months" in request.args else None
+        try:
+            program = load_program(settings())
+        except (TypeError, ValueError) as error:
+            raise BadRequest(f"Некорректные условия кешбэка в настройках: {error}")
+        if pick != -1:
+            if pick < 0:
+                raise BadRequest("Параметр pick не может быть отрицательным")
+            program = replace(program, pick=pick)
+        return cached_by_version(
+            lambda operations: cashback_plan_table(optimize_cashback(operations, program, months))
+        )
+
+    @app.get("/api/services/recurring")
+    def recurring() -> Response:
+        """Регулярные платежи (подписки, связь, аренда); active=1 — только не прерванные на дату date."""
+        as_of = _arg("date", _date) if "date" in request.args else None
+        active_only = bool(_arg("active", int, 0))
+        return cached_by_version(lambda operations: recurring_table(find_recurring(operations, as_of, active_only)))
+
+    @app.get("/api/search")
+    def search() -> Response:
+        mcc = _arg("mcc", int, -1)
+        page, per_page = _arg("page", int, 1), _arg("per_page", int, DEFAULT_PAGE_SIZE)
+        if page <= 0 or per_page <= 0:
+            raise BadRequest("Параметры page и per_page должны быть положительными")
+
+        def compute(operations: OperationsStore) -> Dict[str, Any]:
+            found = search_operations(
+                operations,
+                phone=request.args.get("phone"),
+                merchant=request.args.get("merchant"),
+                keyword=request.args.get("q"),
+                mcc=None if mcc == -1 else mcc,
+                page=page,
+                per_page=per_page,
+            )
+            return {**found, "rows": frame_to_records(found["rows"])}
+
+        return cached_by_version(compute)
+
+    @app.post("/api/ingest")
+    def ingest() -> Response:
+        """Принимает CSV новой выгрузки в теле запроса и дописывает в хранилище только новые операции."""
+        if not request.data:
+            raise BadRequest("Пустое тело запроса: ожидается CSV с выгрузкой")
+        with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as export:
+            export.write(request.data)
+        try:
+            return jsonify(ingest_export(export.name, data_file))
+        finally:
+            os.unlink(export.name)
+
+    @app.get("/api/sql")
+    def sql_query() -> Response:
+        """Произвольный запрос только на чтение к таблице operations встроенной базы SQLite."""
+        sql, limit = _arg("q"), _arg("limit", int, QUERY_LIMIT)
+        if not 0 < limit <= QUERY_LIMIT:
+            raise BadRequest(f"Параметр limit должен быть от 1 до {QUERY_LIMIT}")
+
+        def compute(operations: OperationsStore) -> Dict[str, Any]:
+            try:
+                return get_database(operations).query(sql, limit=limit)
+            except ValueError as error:
+                raise BadRequest(f"Ошибка SQL-запроса: {error}")
+
+        return cached_by_version(compute)
+
+    reports = {"weekday": spending_by_weekday, "weekday-type": spending_by_weekday_type, "hour": spending_by_hour}
+
+    @app.get("/api/reports/<name>")
+    def report(name: str) -> Response:
+        if name not in reports:
+            raise BadRequest(f"Неизвестный отчёт: {name}")
+        date = _arg("date", _date)
+        return cached_by_version(lambda operations: json.loads(reports[name](operations.frame, date)))
+
+    return app
+
+
+if __name__ == "__main__":
+    app_config = configure()
+    setup_logging(app_config)
+    create_app(metrics_enabled=app_config.metrics_enabled).run(threaded=True)
@@ -0,0 +1,280 @@
+"""
+Кеш готовых ответов: данные главной страницы, JSON сервисов и HTTP API.
+
+Ключ — имя функции, нормализованные аргументы, версия набора операций и хеш пользовательских настроек,
+поэтому при изменении выгрузки или user_settings.json старые записи просто перестают находиться.
+Записи вытесняются по LRU и TTL; у рыночных данных свои, более короткие TTL. Необязательный дисковый
+уровень (response_cache_dir настроек) переживает перезапуск процесса. Модуль не тянет pandas и numpy
+и импортируется из src.views без заметной задержки.
+"""
+
+import hashlib
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache, wraps
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+from src import metrics
+from src.config import get_config
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL = 600.0
+# рыночные данные устаревают быстрее расчётов по операциям
+MARKET_TTLS = {"currency_rates": 60.0, "stock_prices": 300.0}
+
+
+@lru_cache(maxsize=1)
+def _orjson() -> Any:
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson
+
+
+def dumps(value: Any, compact: bool = False, indent: Optional[int] = None) -> str:
+    """
+    JSON без экранирования кириллицы.
+
+    compact=True — без отступов и пробелов, через orjson, если он установлен (иначе стандартный json);
+    иначе json.dumps с отступом indent, как раньше.
+    """
+    if not compact:
+        return json.dumps(value, ensure_ascii=False, indent=indent)
+    orjson = _orjson()
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:
+            pass
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def make_key(
+    function: str, arguments: Any, version: Any = None, settings: Optional[str] = None, compact: bool = False
+) -> str:
+    """
+    Ключ записи: sha1 от имени функции, аргументов (в каноническом JSON), версии данных и хеша настроек.
+
+    compact — режим сериализации JSON (compact_json): готовый JSON в разных режимах кешируется раздельно.
+    """
+    payload = json.dumps(
+        [function, arguments, version, settings, compact], ensure_ascii=False, sort_keys=True, default=str
+    )
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+_settings_hashes: Dict[Tuple[str, int, int], str] = {}
+
+
+def settings_hash(path: Optional[str | Path] = None) -> Optional[str]:
+    """Хеш содержимого файла настроек (по умолчанию settings_path настроек); файл перечитывается при изменении."""
+    path = Path(path or get_config().settings_path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    signature = (str(path), stat.st_mtime_ns, stat.st_size)
+    digest = _settings_hashes.get(signature)
+    if digest is None:
+        digest = hashlib.sha1(path.read_bytes()).hexdigest()
+        _settings_hashes[signature] = digest
+    return digest
+
+
+def dataset_version(data: Any) -> Any:
+    """
+    Версия набора операций для ключа кеша или None, если данные не версионируются.
+
+    У хранилища это источник, сигнатура файла, номер ревизии (дозагрузки) и версия таблицы курсов,
+    у TransactionBatch — хеш массивов.
+    Список словарей не версионируется: его хеширование стоит столько же, сколько сам расчёт.
+    """
+    if hasattr(data, "fingerprint"):
+        return data.fingerprint()
+    if hasattr(data, "revision") and getattr(data, "signature", None) is not None:
+        return [str(data.source), list(data.signature), data.revision, getattr(data, "fx_version", None)]
+    return None
+
+
+class ResponseCache:
+    """
+    LRU-кеш с TTL и необязательным дисковым уровнем.
+
+    В памяти держится не больше max_entries записей; запись с истёкшим TTL считается промахом.
+    На диске каждая запись — JSON-файл <ключ>.json в disk_path со временем истечения; значения,
+    которые не сериализуются в JSON, хранятся только в памяти.
+    """
+
+    def __init__(
+        self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL, disk_path: Optional[str | Path] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_path = Path(disk_path) if disk_path else None
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _disk_file(self, key: str) -> Optional[Path]:
+        return self.disk_path / f"{key}.json" if self.disk_path is not None else None
+
+    def _read_disk(self, key: str) -> Tuple[bool, Any, float]:
+        path = self._disk_file(key)
+        if path is None or not path.exists():
+            return False, None, 0.0
+        try:
+            expires_at, value = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError, TypeError):
+            logging.warning("Не удалось прочитать запись кеша ответов: %s", path)
+            return False, None, 0.0
+        if time.time() >= expires_at:
+            return False, None, 0.0
+        return True, value, float(expires_at)
+
+    def _write_disk(self, key: str, expires_at: float, value: Any) -> None:
+        path = self._disk_file(key)
+        if path is None:
+            return
+        try:
+            payload = dumps([expires_at, value], compact=True)
+        except (TypeError, ValueError):
+            return
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_text(payload, encoding="utf-8")
+            os.replace(tmp_path, path)
+        except OSError:
+            logging.warning("Не удалось сохранить запись кеша ответов: %s", path)
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """(найдено, значение); при промахе в памяти проверяется дисковый уровень."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if time.time() < expires_at:
+                    self._entries.move_to_end(key)
+                    metrics.cache_lookup("response", hit=True)
+                    return True, value
+                del self._entries[key]
+        metrics.cache_lookup("response", hit=False)
+        if self.disk_path is None:
+            return False, None
+        found, value, expires_at = self._read_disk(key)
+        metrics.cache_lookup("response_disk", hit=found)
+        if found:
+            self._remember(key, expires_at, value)
+        return found, value
+
+    def _remember(self, key: str, expires_at: float, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        self._remember(key, expires_at, value)
+        self._write_disk(key, expires_at, value)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Значение из кеша или результат compute(), который запоминается на ttl секунд; исключения не кешируются."""
+        found, value = self.get(key)
+        if found:
+            return value
+        value = compute()
+        self.set(key, value, ttl)
+        return value
+
+    def clear(self) -> None:
+        """Очищает записи в памяти и на диске."""
+        with self._lock:
+            self._entries.clear()
+        if self.disk_path is not None and self.disk_path.exists():
+            for path in self.disk_path.glob("*.json"):
+                path.unlink(missing_ok=True)
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Общий кеш ответов процесса по настройкам (None, если кеш выключен через RESPONSE_CACHE=0)."""
+    global _response_cache
+    config = get_config()
+    if not config.response_cache:
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(disk_path=config.response_cache_dir)
+        return _response_cache
+
+
+def clear_response_cache() -> None:
+    """Сбрасывает общий кеш ответов; следующий get_response_cache() создаст его заново по текущим настройкам."""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is not None:
+            _response_cache.clear()
+        _response_cache = None
+
+
+def cached_call(
+    function: str, arguments: Any, compute: Callable[[], Any], version: Any = None, ttl: Optional[float] = None
+) -> Any:
+    """
+    Результат compute() через общий кеш ответов.
+
+    Ключ строится из function, arguments, version, хеша настроек и режима compact_json.
+    Без кеша (RESPONSE_CACHE=0) compute() вызывается напрямую.
+    """
+    cache = get_response_cache()
+    if cache is None:
+        return compute()
+    key = make_key(function, arguments, version, settings_hash(), get_config().compact_json)
+    return cache.get_or_compute(key, compute, ttl)
+
+
+def cached_response(data_arg: str, ttl: Optional[float] = None) -> Callable[[F], F]:
+    """
+    Декоратор для JSON-функций сервисов: ответ кешируется по аргументам и версии данных из аргумента data_arg.
+
+    Если данные не версионируются (список словарей), функция вызывается без кеша.
+    """
+
+    def decorator(function: F) -> F:
+        signature = inspect.signature(function)
+
+        @wraps(function)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            version = dataset_version(arguments.pop(data_arg))
+            if version is None:
+                return function(*args, **kwargs)
+            return cached_call(
+                f"{function.__module__}.{function.__qualname__}",
+                arguments,
+                lambda: function(*args, **kwargs),
+                version,
+                ttl=ttl,
+            )
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
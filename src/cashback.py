@@ -0,0 +1,306 @@
+import logging
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from src import metrics
+from src.cache import dumps
+from src.config import DEFAULT_CASHBACK_RATE, get_config
+from src.services import NO_CATEGORY
+from src.store import DateLike, OperationsStore, month_start, rub_column
+from src.transactions import TransactionBatch, transactions_to_frame
+
+NO_MCC = -1
+
+
+@dataclass(frozen=True)
+class CashbackRule:
+    """Повышенный кешбэк rate на траты категорий categories или MCC mccs, не больше cap рублей в месяц."""
+
+    name: str
+    rate: float
+    categories: Tuple[str, ...] = ()
+    mccs: Tuple[int, ...] = ()
+    cap: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class CashbackProgram:
+    """
+    Условия кешбэка: базовая ставка на все траты, кроме excluded, и правила с повышенной ставкой.
+
+    pick — сколько правил можно выбрать на месяц (None — действуют все), monthly_cap — общий лимит
+    кешбэка за месяц. Трата попадает в первое подходящее правило по порядку rules.
+    """
+
+    rules: Tuple[CashbackRule, ...] = ()
+    base_rate: float = DEFAULT_CASHBACK_RATE
+    pick: Optional[int] = None
+    monthly_cap: Optional[float] = None
+    excluded: Tuple[str, ...] = ()
+
+
+def _rate(value: Any, name: str) -> float:
+    rate = float(value)
+    if not 0 <= rate <= 1:
+        raise ValueError(f"Ставка кешбэка {name} должна быть от 0 до 1: {value}")
+    return rate
+
+
+def load_program(settings: Mapping[str, Any]) -> CashbackProgram:
+    """
+    Условия кешбэка из раздела "cashback" пользовательских настроек.
+
+    Без раздела возвращается программа с базовой ставкой DEFAULT_CASHBACK_RATE и без правил.
+    Некорректные ставки, лимиты и pick приводят к ValueError.
+    """
+    section = settings.get("cashback") or {}
+    rules = []
+    for index, item in enumerate(section.get("rules", [])):
+        name = str(item.get("name") or ", ".join(item.get("categories", [])) or f"rule-{index + 1}")
+        cap = item.get("cap")
+        if cap is not None and float(cap) < 0:
+            raise ValueError(f"Лимит правила {name} не может быть отрицательным: {cap}")
+        rules.append(
+            CashbackRule(
+                name=name,
+                rate=_rate(item.get("rate", 0), name),
+                categories=tuple(str(category) for category in item.get("categories", [])),
+                mccs=tuple(int(mcc) for mcc in item.get("mcc", [])),
+                cap=float(cap) if cap is not None else None,
+            )
+        )
+    pick = section.get("pick")
+    if pick is not None and int(pick) < 0:
+        raise ValueError(f"Число выбираемых категорий не может быть отрицательным: {pick}")
+    monthly_cap = section.get("monthly_cap")
+    return CashbackProgram(
+        rules=tuple(rules),
+        base_rate=_rate(section.get("base_rate", DEFAULT_CASHBACK_RATE), "base_rate"),
+        pick=int(pick) if pick is not None else None,
+        monthly_cap=float(monthly_cap) if monthly_cap is not None else None,
+        excluded=tuple(str(category) for category in section.get("excluded_categories", [])),
+    )
+
+
+class SpendMatrix:
+    """
+    Расходы по календарным месяцам в разрезе пар (категория, MCC).
+
+    Строится по операциям один раз (производная структура хранилища) и дополняется при дозагрузке.
+    Траты правил за каждый месяц получаются одним умножением матрицы на разметку пар по правилам;
+    разметка запоминается для набора правил, поэтому перебор тысяч вариантов ставок, лимитов и pick
+    с теми же правилами не трогает операции.
+    """
+
+    def __init__(self, table: pd.DataFrame):
+        self.table = table
+        self._values: Optional[np.ndarray] = None
+        self._rule_spend: Dict[Tuple[Tuple[CashbackRule, ...], Tuple[str, ...]], np.ndarray] = {}
+
+    @staticmethod
+    def _partial(frame: pd.DataFrame) -> pd.DataFrame:
+        dates = frame["date"].to_numpy(dtype="datetime64[ns]")
+        amounts = frame[rub_column(frame)].to_numpy(dtype=np.float64)
+        mask = (frame["amount"].to_numpy(dtype=np.float64) < 0) & ~np.isnat(dates)
+        if "category" in frame:
+            categories = frame["category"].to_numpy(dtype=object)[mask]
+            categories = np.where(pd.isna(categories), NO_CATEGORY, categories)
+        else:
+            categories = np.full(mask.sum(), NO_CATEGORY, dtype=object)
+        if "mcc" in frame:
+            mccs = pd.to_numeric(frame["mcc"], errors="coerce").to_numpy(dtype=np.float64)[mask]
+            mccs = np.nan_to_num(mccs, nan=NO_MCC).astype(np.int64)
+        else:
+            mccs = np.full(mask.sum(), NO_MCC, dtype=np.int64)
+        expenses = pd.DataFrame(
+            {
+                "month": dates[mask].astype("datetime64[M]").astype("datetime64[ns]"),
+                "category": categories,
+                "mcc": mccs,
+                "spent": -amounts[mask],
+            }
+        )
+        table = expenses.groupby(["month", "category", "mcc"])["spent"].sum().unstack(["category", "mcc"])
+        return table.fillna(0.0)
+
+    @classmethod
+    def build(cls, frame: pd.DataFrame) -> "SpendMatrix":
+        """Матрица по DataFrame с колонками хранилища (date, amount, category, mcc)."""
+        matrix = cls(cls._partial(frame))
+        logging.info("Матрица трат для кешбэка: %s месяцев × %s пар категория/MCC", *matrix.table.shape)
+        return matrix
+
+    def append(self, rows: pd.DataFrame) -> None:
+        """Добавляет траты новых операций; запомненные разметки правил сбрасываются."""
+        partial = self._partial(rows)
+        if partial.empty:
+            return
+        self.table = self.table.add(partial, fill_value=0).fillna(0.0).sort_index()
+        self._values = None
+        self._rule_spend = {}
+
+    @property
+    def months(self) -> pd.DatetimeIndex:
+        return pd.DatetimeIndex(self.table.index)
+
+    @property
+    def values(self) -> np.ndarray:
+        """Траты как массив float64 (месяцы × пары)."""
+        if self._values is None:
+            self._values = self.table.to_numpy(dtype=np.float64)
+        return self._values
+
+    def _keys(self) -> Tuple[np.ndarray, np.ndarray]:
+        columns = self.table.columns
+        if not len(columns):
+            return np.empty(0, dtype=object), np.empty(0, dtype=np.int64)
+        return columns.get_level_values("category").to_numpy(), columns.get_level_values("mcc").to_numpy()
+
+    def eligible_spend(self, excluded: Tuple[str, ...] = ()) -> np.ndarray:
+        """Траты каждого месяца, на которые начисляется кешбэк (все категории, кроме excluded)."""
+        categories, _ = self._keys()
+        return self.values[:, ~np.isin(categories, excluded)].sum(axis=1)
+
+    def rule_spend(self, rules: Tuple[CashbackRule, ...], excluded: Tuple[str, ...] = ()) -> np.ndarray:
+        """Траты по правилам (месяцы × правила); пара категория/MCC относится к первому подходящему правилу."""
+        key = (rules, excluded)
+        spend = self._rule_spend.get(key)
+        if spend is None:
+            categories, mccs = self._keys()
+            owner = np.full(len(categories), -1)
+            owner[np.isin(categories, excluded)] = len(rules)
+            for index, rule in enumerate(rules):
+                match = np.isin(categories, rule.categories) | np.isin(mccs, rule.mccs)
+                owner[(owner == -1) & match] = index
+            spend = self.values @ (owner[:, None] == np.arange(len(rules))).astype(np.float64)
+            self._rule_spend[key] = spend
+            metrics.rows_scanned(self.values.size, "cashback_matrix")
+        return spend
+
+
+def get_spend_matrix(store: OperationsStore) -> SpendMatrix:
+    """Матрица трат хранилища; строится один раз и дополняется при дозагрузке."""
+    return store.derived("cashback_spend", SpendMatrix.build)
+
+
+def _matrix_for(source: Union[OperationsStore, SpendMatrix, TransactionBatch, List[Dict[str, Any]]]) -> SpendMatrix:
+    if isinstance(source, SpendMatrix):
+        return source
+    if isinstance(source, OperationsStore):
+        return get_spend_matrix(source)
+    if isinstance(source, TransactionBatch):
+        return SpendMatrix.build(source.to_frame(("date", "amount", "category", "mcc")))
+    return SpendMatrix.build(transactions_to_frame(source))
+
+
+def _evaluate(matrix: SpendMatrix, program: CashbackProgram) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Кешбэк по месяцам при лучшем выборе правил: (кешбэк, базовый кешбэк, маска выбранных правил)."""
+    spend = matrix.rule_spend(program.rules, program.excluded)
+    base = matrix.eligible_spend(program.excluded) * program.base_rate
+    rates = np.array([rule.rate for rule in program.rules], dtype=np.float64)
+    caps = np.array([np.inf if rule.cap is None else rule.cap for rule in program.rules], dtype=np.float64)
+    bonus = np.minimum(spend * rates, caps) - spend * program.base_rate
+
+    selected = bonus > 0
+    if program.pick is not None and program.pick < len(program.rules):
+        best = np.argsort(-bonus, axis=1, kind="stable")[:, : program.pick]
+        chosen = np.zeros_like(selected)
+        np.put_along_axis(chosen, best, True, axis=1)
+        selected &= chosen
+    cashback = base + np.where(selected, bonus, 0.0).sum(axis=1)
+    if program.monthly_cap is not None:
+        cashback = np.minimum(cashback, program.monthly_cap)
+    return cashback, base, selected
+
+
+def _month_positions(matrix: SpendMatrix, months: Optional[Iterable[DateLike]]) -> np.ndarray:
+    if months is None:
+        return np.arange(len(matrix.months))
+    wanted = pd.DatetimeIndex([month_start(month) for month in months])
+    return np.flatnonzero(matrix.months.isin(wanted))
+
+
+def optimize_cashback(
+    source: Union[OperationsStore, SpendMatrix, TransactionBatch, List[Dict[str, Any]]],
+    program: CashbackProgram,
+    months: Optional[Iterable[DateLike]] = None,
+) -> pd.DataFrame:
+    """
+    Лучший выбор правил кешбэка на каждый месяц истории и прогноз кешбэка.
+
+    Возвращает DataFrame с индексом 'YYYY-MM' и колонками spent (траты с кешбэком), selected
+    (имена выбранных правил), cashback и base_cashback (только базовая ставка), суммы в рублях.
+    months ограничивает расчёт указанными месяцами, по умолчанию — вся история.
+    """
+    matrix = _matrix_for(source)
+    with metrics.span("cashback_optimize"):
+        cashback, base, selected = _evaluate(matrix, program)
+    positions = _month_positions(matrix, months)
+    names = np.array([rule.name for rule in program.rules], dtype=object)
+    logging.info("Оптимизация кешбэка: %s месяцев, %s правил", len(positions), len(program.rules))
+    return pd.DataFrame(
+        {
+            "spent": matrix.eligible_spend(program.excluded)[positions].round(2),
+            "selected": [list(names[selected[position]]) for position in positions],
+            "cashback": cashback[positions].round(2),
+            "base_cashback": base[positions].round(2),
+        },
+        index=pd.Index(matrix.months[positions].strftime("%Y-%m"), name="month"),
+    )
+
+
+def compare_programs(
+    source: Union[OperationsStore, SpendMatrix, TransactionBatch, List[Dict[str, Any]]],
+    programs: Mapping[str, CashbackProgram],
+) -> pd.DataFrame:
+    """
+    Прогноз кешбэка за всю историю для многих вариантов условий, по убыванию итога.
+
+    Колонки: total (сумма за историю) и monthly (в среднем за месяц). Матрица трат строится один раз,
+    варианты с одинаковыми правилами переиспользуют их разметку.
+    """
+    matrix = _matrix_for(source)
+    totals = {}
+    with metrics.span("cashback_compare"):
+        for name, program in programs.items():
+            totals[name] = float(_evaluate(matrix, program)[0].sum())
+    months = max(len(matrix.months), 1)
+    result = pd.DataFrame({"total": totals}).rename_axis("program")
+    result["monthly"] = result["total"] / months
+    return result.sort_values("total", ascending=False, kind="stable").round(2)
+
+
+def pick_variants(program: CashbackProgram, picks: Iterable[int]) -> Dict[str, CashbackProgram]:
+    """Варианты программы с разным числом выбираемых правил: {'pick=1': ..., 'pick=2': ...}."""
+    return {f"pick={pick}": replace(program, pick=pick) for pick in picks}
+
+
+def cashback_plan_table(plan: pd.DataFrame) -> Dict[str, Any]:
+    """JSON-совместимое представление результата optimize_cashback."""
+    return {
+        "total_cashback": round(float(plan["cashback"].sum()), 2),
+        "months": [
+            {
+                "month": month,
+                "spent": float(row["spent"]),
+                "selected": row["selected"],
+                "cashback": float(row["cashback"]),
+                "base_cashback": float(row["base_cashback"]),
+            }
+            for month, row in plan.iterrows()
+        ],
+    }
+
+
+def optimize_cashback_json(
+    source: Union[OperationsStore, SpendMatrix, TransactionBatch, List[Dict[str, Any]]],
+    settings: Mapping[str, Any],
+    months: Optional[Iterable[DateLike]] = None,
+) -> str:
+    """План кешбэка по условиям из пользовательских настроек в JSON; при compact_json настроек — без отступов."""
+    plan = optimize_cashback(source, load_program(settings), months)
+    with metrics.span("json_serialize", function="optimize_cashback_json"):
+        return dumps(cashback_plan_table(plan), compact=get_config().compact_json, indent=2)
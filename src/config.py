@@ -0,0 +1,96 @@
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Mapping, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_DATA_PATH = ROOT / "data" / "operations.csv"
+DEFAULT_SETTINGS_PATH = ROOT / "user_settings.json"
+DEFAULT_MARKET_CACHE_PATH = ROOT / "data" / "market_cache.json"
+DEFAULT_FX_RATES_PATH = ROOT / "data" / "fx_rates.csv"
+DEFAULT_TENANTS_PATH = ROOT / "data" / "tenants"
+DEFAULT_ENV_PATH = ROOT / ".env"
+# базовая ставка кешбэка, если в user_settings.json нет раздела "cashback"
+DEFAULT_CASHBACK_RATE = 0.01
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+
+@dataclass(frozen=True)
+class Config:
+    """Настройки приложения: пути к данным и настройкам пользователя, ключ API, метрики, логирование и кеш ответов."""
+
+    data_path: Path = DEFAULT_DATA_PATH
+    settings_path: Path = DEFAULT_SETTINGS_PATH
+    market_cache_path: Path = DEFAULT_MARKET_CACHE_PATH
+    fx_rates_path: Path = DEFAULT_FX_RATES_PATH
+    tenants_path: Path = DEFAULT_TENANTS_PATH
+    api_key: Optional[str] = None
+    metrics_enabled: bool = False
+    log_level: str = "INFO"
+    response_cache: bool = True
+    response_cache_dir: Optional[Path] = None
+    compact_json: bool = False
+
+
+def _read_env_file(path: Path) -> dict[str, str]:
+    if not path.exists():
+        return {}
+    from dotenv import dotenv_values
+
+    return {key: value for key, value in dotenv_values(path).items() if value is not None}
+
+
+def _flag(value: Optional[str], default: bool) -> bool:
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes")
+
+
+def load_config(env: Optional[Mapping[str, str]] = None, env_file: Optional[str | Path] = DEFAULT_ENV_PATH) -> Config:
+    """
+    Собирает настройки из переменных окружения и файла .env (переменные окружения важнее).
+
+    Ничего не меняет в os.environ. env_file=None отключает чтение .env.
+    """
+    values = _read_env_file(Path(env_file)) if env_file is not None else {}
+    values.update(os.environ if env is None else env)
+    return Config(
+        data_path=Path(values.get("DATA_PATH") or DEFAULT_DATA_PATH),
+        settings_path=Path(values.get("SETTINGS_PATH") or DEFAULT_SETTINGS_PATH),
+        market_cache_path=Path(values.get("MARKET_CACHE_PATH") or DEFAULT_MARKET_CACHE_PATH),
+        fx_rates_path=Path(values.get("FX_RATES_PATH") or DEFAULT_FX_RATES_PATH),
+        tenants_path=Path(values.get("TENANTS_PATH") or DEFAULT_TENANTS_PATH),
+        api_key=values.get("API_KEY") or None,
+        metrics_enabled=_flag(values.get("METRICS_ENABLED"), False),
+        log_level=values.get("LOG_LEVEL", "INFO").upper(),
+        response_cache=_flag(values.get("RESPONSE_CACHE"), True),
+        response_cache_dir=Path(values["RESPONSE_CACHE_DIR"]) if values.get("RESPONSE_CACHE_DIR") else None,
+        compact_json=_flag(values.get("COMPACT_JSON"), False),
+    )
+
+
+_config: Optional[Config] = None
+_config_lock = threading.Lock()
+
+
+def configure(config: Optional[Config] = None) -> Config:
+    """Устанавливает настройки процесса; без аргумента загружает их через load_config()."""
+    global _config
+    with _config_lock:
+        _config = config if config is not None else load_config()
+        return _config
+
+
+def get_config() -> Config:
+    """Текущие настройки процесса; при первом обращении без configure() загружаются из окружения."""
+    if _config is None:
+        return configure()
+    return _config
+
+
+def setup_logging(config: Optional[Config] = None) -> None:
+    """Настраивает корневой логгер; вызывается точками входа, а не при импорте модулей."""
+    level = (config or get_config()).log_level
+    logging.basicConfig(level=getattr(logging, level, logging.INFO), format=LOG_FORMAT)
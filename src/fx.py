@@ -0,0 +1,243 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.config import configure, get_config, setup_logging
+
+BASE_CURRENCY = "RUB"
+FX_COLUMNS = ("date", "currency", "rate")
+# сумма -> валюта суммы; для каждой пары в хранилище появляется колонка <сумма>_rub
+CONVERTED_COLUMNS = {"amount": "currency", "payment_amount": "payment_currency"}
+HISTORY_DAYS = 365
+
+
+class FxTable:
+    """
+    Локальная таблица курсов: сколько рублей стоит единица валюты на дату.
+
+    Хранится в CSV (date, currency, rate), отсортированной по дате, и дополняется из API
+    (refresh_fx_table) или курсами, которые банк применил в самой выгрузке (from_operations).
+    Курс на дату операции ищется as-of соединением: последний известный курс не позже даты.
+    """
+
+    def __init__(self, frame: Optional[pd.DataFrame] = None):
+        if frame is None:
+            frame = pd.DataFrame({column: [] for column in FX_COLUMNS})
+        frame = pd.DataFrame(
+            {
+                "date": pd.to_datetime(frame["date"]).dt.normalize().astype("datetime64[ns]"),
+                "currency": frame["currency"].astype(str).str.upper(),
+                "rate": frame["rate"].astype(np.float64),
+            }
+        )
+        frame = frame[frame["rate"] > 0].drop_duplicates(["date", "currency"], keep="last")
+        self.frame = frame.sort_values(["date", "currency"], kind="stable").reset_index(drop=True)
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    @property
+    def version(self) -> str:
+        """Хеш содержимого таблицы — меняется при любом обновлении курсов."""
+        if self.frame.empty:
+            return "empty"
+        hashes = pd.util.hash_pandas_object(self.frame, index=False).to_numpy()
+        return hashlib.sha1(hashes.tobytes()).hexdigest()[:16]
+
+    @property
+    def currencies(self) -> list[str]:
+        return sorted(self.frame["currency"].unique())
+
+    @classmethod
+    def load(cls, path: str | Path) -> "FxTable":
+        """Таблица из CSV; отсутствующий файл — пустая таблица."""
+        path = Path(path)
+        if not path.exists():
+            return cls()
+        return cls(pd.read_csv(path, dtype={"currency": str}))
+
+    def save(self, path: str | Path) -> None:
+        """Атомарно записывает таблицу в CSV."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        self.frame.assign(date=self.frame["date"].dt.strftime("%Y-%m-%d")).to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def from_operations(cls, frame: pd.DataFrame) -> "FxTable":
+        """
+        Курсы, применённые банком: для операций в валюте, списанных в рублях, курс = платёж / сумма.
+
+        За каждый день берётся медиана по операциям этой валюты.
+        """
+        if not {"amount", "currency", "payment_amount", "payment_currency"} <= set(frame.columns):
+            return cls()
+        currency = frame["currency"].astype(object)
+        mask = (
+            (currency != BASE_CURRENCY)
+            & currency.notna()
+            & (frame["payment_currency"].astype(object) == BASE_CURRENCY)
+            & (frame["amount"] != 0)
+            & frame["date"].notna()
+        )
+        rows = frame[mask]
+        implied = pd.DataFrame(
+            {
+                "date": rows["date"].dt.normalize(),
+                "currency": currency[mask].astype(str),
+                "rate": (rows["payment_amount"] / rows["amount"]).abs(),
+            }
+        )
+        return cls(implied.groupby(["date", "currency"], as_index=False)["rate"].median())
+
+    def update(self, rows: Iterable[Dict[str, Any]] | pd.DataFrame) -> "FxTable":
+        """Новая таблица с добавленными курсами; курс на ту же дату и валюту заменяется новым."""
+        incoming = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(list(rows), columns=list(FX_COLUMNS))
+        if incoming.empty:
+            return self
+        return FxTable(pd.concat([self.frame, incoming[list(FX_COLUMNS)]], ignore_index=True))
+
+    def rates(self, dates: np.ndarray, currencies: np.ndarray) -> np.ndarray:
+        """
+        Курсы к рублю для пар (дата, валюта) одним as-of соединением.
+
+        Рубль и пустая валюта — 1.0. Для даты раньше первого известного курса берётся ближайший следующий;
+        для валюты, которой нет в таблице, и для пустой даты — NaN.
+        """
+        dates = np.asarray(dates, dtype="datetime64[ns]")
+        currencies = pd.Series(currencies, dtype=object).fillna(BASE_CURRENCY).astype(str).str.upper().to_numpy()
+        result = np.full(len(dates), np.nan)
+        result[currencies == BASE_CURRENCY] = 1.0
+        positions = np.flatnonzero((currencies != BASE_CURRENCY) & ~np.isnat(dates))
+        if not len(positions) or self.frame.empty:
+            return result
+
+        left = pd.DataFrame({"date": dates[positions], "currency": currencies[positions], "position": positions})
+        left = left.sort_values("date", kind="stable", ignore_index=True)
+        matched = pd.merge_asof(left, self.frame, on="date", by="currency", direction="backward")
+        rates = matched["rate"].to_numpy()
+        missing = np.isnan(rates)
+        if missing.any():
+            ahead = pd.merge_asof(left[missing], self.frame, on="date", by="currency", direction="forward")
+            rates[missing] = ahead["rate"].to_numpy()
+        result[matched["position"].to_numpy()] = rates
+        return result
+
+
+def add_rub_amounts(frame: pd.DataFrame, table: FxTable) -> pd.DataFrame:
+    """
+    Добавляет к операциям суммы в рублях на дату операции: amount_rub и payment_amount_rub.
+
+    Суммы переводятся по курсу таблицы; если курса нет, для суммы операции берётся платёж в рублях,
+    а в крайнем случае сумма остаётся как есть (с предупреждением в лог). Колонки пишутся в frame.
+    """
+    dates = frame["date"].to_numpy(dtype="datetime64[ns]")
+    for amount_column, currency_column in CONVERTED_COLUMNS.items():
+        if amount_column not in frame:
+            continue
+        amounts = frame[amount_column].to_numpy(dtype=np.float64)
+        if currency_column not in frame:
+            frame[f"{amount_column}_rub"] = amounts
+            continue
+        converted = amounts * table.rates(dates, frame[currency_column].to_numpy(dtype=object))
+        missing = np.isnan(converted) & ~np.isnan(amounts)
+        if missing.any() and amount_column == "amount" and {"payment_amount", "payment_currency"} <= set(frame):
+            in_rub = (frame["payment_currency"].astype(object) == BASE_CURRENCY).to_numpy() & missing
+            converted[in_rub] = frame["payment_amount"].to_numpy(dtype=np.float64)[in_rub]
+            missing &= ~in_rub
+        if missing.any():
+            logging.warning("Нет курса для %s операций (%s), суммы не пересчитаны", missing.sum(), amount_column)
+            converted[missing] = amounts[missing]
+        frame[f"{amount_column}_rub"] = converted
+    return frame
+
+
+_tables: Dict[Path, Tuple[Tuple[int, int], FxTable]] = {}
+_tables_lock = threading.Lock()
+
+
+def get_fx_table(path: Optional[str | Path] = None) -> FxTable:
+    """Таблица курсов из fx_rates_path настроек; перечитывается, когда файл изменился."""
+    path = Path(path or get_config().fx_rates_path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return FxTable()
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _tables_lock:
+        cached = _tables.get(path)
+        if cached is None or cached[0] != signature:
+            cached = signature, FxTable.load(path)
+            _tables[path] = cached
+            logging.info("Загружена таблица курсов %s: %s строк", path, len(cached[1]))
+        return cached[1]
+
+
+def refresh_fx_table(
+    currencies: Iterable[str],
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    path: Optional[str | Path] = None,
+) -> FxTable:
+    """
+    Дополняет таблицу курсов из API за [start, end] и сохраняет её.
+
+    По умолчанию запрашиваются дни после последнего известного курса (или последние HISTORY_DAYS дней)
+    по сегодняшний. Если API недоступно, таблица остаётся прежней.
+    """
+    from src.views import get_market_client
+
+    path = Path(path or get_config().fx_rates_path)
+    table = FxTable.load(path)
+    if start is None:
+        last = table.frame["date"].max() if len(table) else None
+        first = last.date() + timedelta(days=1) if last is not None else date.today() - timedelta(days=HISTORY_DAYS)
+        start = first.isoformat()
+    end = end or date.today().isoformat()
+    if start > end:
+        return table
+    rows = get_market_client().currency_history(currencies, start, end, base=BASE_CURRENCY)
+    logging.info("Получено исторических курсов: %s", len(rows))
+    if rows:
+        table = table.update(rows)
+        table.save(path)
+    return table
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Обновление локальной таблицы курсов валют")
+    parser.add_argument("--currencies", help="валюты через запятую (по умолчанию — валюты из выгрузки)")
+    parser.add_argument("--start", help="первая дата, YYYY-MM-DD")
+    parser.add_argument("--end", help="последняя дата, YYYY-MM-DD")
+    parser.add_argument("--implied", action="store_true", help="добавить курсы, применённые банком в выгрузке")
+    args = parser.parse_args()
+    config = configure()
+    setup_logging(config)
+
+    from src.store import read_operations
+
+    operations = read_operations(config.data_path)
+    if args.currencies:
+        currencies = [currency.strip().upper() for currency in args.currencies.split(",")]
+    else:
+        present = pd.concat([operations[column].astype(object) for column in CONVERTED_COLUMNS.values()])
+        currencies = sorted(set(present.dropna().astype(str)) - {BASE_CURRENCY})
+    table = refresh_fx_table(currencies, args.start, args.end)
+    if args.implied:
+        table = FxTable.from_operations(operations).update(table.frame)
+        table.save(config.fx_rates_path)
+    print(json.dumps({"rows": len(table), "currencies": table.currencies}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import argparse
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.config import configure, setup_logging
+from src.fx import add_rub_amounts, get_fx_table
+from src.store import (
+    CATEGORY_COLUMNS,
+    DATETIME_COLUMNS,
+    FLOAT_COLUMNS,
+    append_cache,
+    cache_path_for,
+    coerce_operations,
+    file_signature,
+    load_store,
+)
+
+# копейки для пустой суммы в хеше строки: NaN нельзя привести к int64
+MISSING_CENTS = np.iinfo(np.int64).min
+
+
+def state_path_for(filepath: str | Path) -> Path:
+    """Файл состояния инкрементальной загрузки рядом с выгрузкой: operations.csv -> operations.ingest.json."""
+    path = Path(filepath)
+    return path.with_name(f"{path.stem}.ingest.json")
+
+
+def row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """
+    Хеш содержимого каждой операции (uint64) для поиска повторов между выгрузками.
+
+    Суммы приводятся к копейкам, а категориальные значения — к строкам, поэтому хеш не зависит
+    от того, как строка была разобрана и в какой набор категорий попала.
+    """
+    parts: Dict[str, Any] = {}
+    for column in df.columns:
+        values = df[column]
+        if column in DATETIME_COLUMNS:
+            parts[column] = values.to_numpy(dtype="datetime64[ns]").view(np.int64)
+        elif column in FLOAT_COLUMNS:
+            cents = np.round(values.to_numpy(dtype=np.float64) * 100)
+            parts[column] = np.where(np.isnan(cents), MISSING_CENTS, cents).astype(np.int64)
+        elif column in CATEGORY_COLUMNS:
+            parts[column] = values.astype(object).fillna("").astype(str).to_numpy()
+        else:
+            parts[column] = values.to_numpy()
+    if not parts:
+        return np.zeros(len(df), dtype=np.uint64)
+    return pd.util.hash_pandas_object(pd.DataFrame(parts), index=False).to_numpy()
+
+
+def load_state(filepath: str | Path) -> Dict[str, Any]:
+    path = state_path_for(filepath)
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)  # type: ignore[no-any-return]
+
+
+def save_state(filepath: str | Path, state: Dict[str, Any]) -> None:
+    with open(state_path_for(filepath), "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+
+
+def new_rows_mask(existing: pd.DataFrame, incoming: pd.DataFrame, watermark: Optional[pd.Timestamp]) -> np.ndarray:
+    """
+    Маска строк incoming, которых ещё нет в хранилище.
+
+    Строки новее watermark (последней загруженной даты) заведомо новые. Остальные сравниваются по хешу
+    с операциями хранилища начиная с самой ранней даты среди них, строки без даты — с операциями хранилища
+    без даты; одинаковые строки считаются как мультимножество, чтобы законные повторы (две одинаковые покупки)
+    не терялись.
+    """
+    mask = np.ones(len(incoming), dtype=bool)
+    if watermark is None or incoming.empty:
+        return mask
+    overlap = ((incoming["date"] <= watermark) | incoming["date"].isna()).to_numpy()
+    if not overlap.any():
+        return mask
+
+    candidates = incoming[overlap]
+    first = candidates["date"].min()
+    start = existing["date"].searchsorted(first) if pd.notna(first) else len(existing)
+    columns = [column for column in candidates.columns if column in existing.columns]
+    existing_hashes = [row_hashes(existing.iloc[start:][columns])]
+    if candidates["date"].isna().any():
+        head = existing.iloc[:start]
+        existing_hashes.append(row_hashes(head.loc[head["date"].isna(), columns]))
+    seen = pd.Series(np.concatenate(existing_hashes)).value_counts()
+    hashes = pd.Series(row_hashes(candidates[columns]))
+    occurrence = hashes.groupby(hashes).cumcount().to_numpy()
+    already = hashes.map(seen).fillna(0).to_numpy()
+    mask[overlap] = occurrence >= already
+    return mask
+
+
+def _ensure_trailing_newline(path: Path) -> None:
+    if path.stat().st_size == 0:
+        return
+    with open(path, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+
+_ingest_locks: Dict[Path, threading.Lock] = {}
+_ingest_locks_lock = threading.Lock()
+
+
+def _ingest_lock(target: Path) -> threading.Lock:
+    """Блокировка загрузок в выгрузку target, общая для всех потоков процесса."""
+    with _ingest_locks_lock:
+        return _ingest_locks.setdefault(target.resolve(), threading.Lock())
+
+
+def ingest_export(export_path: str | Path, target_path: str | Path) -> Dict[str, Any]:
+    """
+    Дописывает в выгрузку target_path только новые операции из export_path.
+
+    Повторы между пересекающимися выгрузками отбрасываются, новые строки дописываются в конец CSV
+    в исходном формате, хранилище в памяти, его агрегаты и бинарный кеш обновляются только по новым строкам.
+    Водяной знак (последняя загруженная дата и хеш строки) сохраняется в operations.ingest.json.
+    Загрузки в одну выгрузку выполняются по очереди: иначе две одновременные загрузки отберут одни и те же
+    новые строки и допишут их дважды.
+    """
+    target = Path(target_path)
+    with _ingest_lock(target):
+        store = load_store(target)
+        state = load_state(target)
+
+        header = pd.read_csv(target, sep=",", nrows=0).columns
+        raw = pd.read_csv(export_path, sep=",", dtype=str).reindex(columns=header)
+        incoming = coerce_operations(raw.assign(_position=np.arange(len(raw))))
+        raw = raw.iloc[incoming.pop("_position").to_numpy()]
+
+        watermark = pd.Timestamp(state["watermark"]) if state.get("watermark") else None
+        if watermark is None and len(store):
+            watermark = store.frame["date"].max()
+        mask = new_rows_mask(store.frame, incoming, watermark)
+        fresh_raw, fresh = raw[mask], incoming[mask].reset_index(drop=True)
+        logging.info("Новых операций в %s: %s из %s", export_path, len(fresh), len(incoming))
+
+        if not fresh.empty:
+            _ensure_trailing_newline(target)
+            fresh_raw.to_csv(target, mode="a", header=False, index=False)
+            store.append(add_rub_amounts(fresh.copy(), get_fx_table()))
+            previous, store.signature = store.signature, file_signature(target)
+            try:
+                append_cache(store.frame, fresh, cache_path_for(target), previous, store.signature)
+            except OSError:
+                logging.warning("Не удалось обновить кеш операций рядом с %s", target)
+
+            last = store.frame["date"].max()
+            state = {
+                "watermark": last.isoformat(),
+                "row_hash": format(int(row_hashes(fresh.iloc[[-1]])[0]), "016x"),
+                "rows": len(store),
+            }
+            save_state(target, state)
+
+        return {"received": len(incoming), "added": len(fresh), "skipped": len(incoming) - len(fresh), **state}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Инкрементальная загрузка новой выгрузки операций")
+    parser.add_argument("export", help="CSV с новой выгрузкой банка")
+    parser.add_argument("--target", help="выгрузка, в которую дописываются операции (по умолчанию DATA_PATH)")
+    args = parser.parse_args()
+    config = configure()
+    setup_logging(config)
+    print(json.dumps(ingest_export(args.export, args.target or config.data_path), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from src import metrics
+from src.aggregates import ROUNDUP_LIMITS
+from src.store import DateLike, OperationsStore, month_start
+from src.transactions import MISSING_DAY, TransactionBatch, transactions_to_frame
+
+NS_PER_DAY = 86_400 * 1_000_000_000
+GRID_MONTHS = 12
+Period = Tuple[str, pd.Timestamp, pd.Timestamp]
+
+
+def day_number(date: DateLike) -> int:
+    """Номер дня от 1970-01-01 для даты (время отбрасывается)."""
+    return int(pd.Timestamp(date).normalize().value // NS_PER_DAY)
+
+
+class RoundupLedger:
+    """
+    Траты в копейках, упорядоченные по дню, для расчёта «Инвесткопилки» по сетке шагов и периодов.
+
+    Для каждого шага округления остатки до кратного шагу считаются одним векторным проходом по всем тратам
+    в целых копейках, складываются по дням и превращаются в префиксные суммы. Итог за любой период —
+    разность двух префиксов, поэтому сетка «шаги × месяцы» стоит один проход на шаг, а не на ячейку.
+    Префиксы запоминаются и сбрасываются при дозагрузке операций.
+    """
+
+    def __init__(self, days: np.ndarray, spent: np.ndarray):
+        self.days = days
+        self.spent = spent
+        self._prefixes: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+
+    @staticmethod
+    def _expenses(frame: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        dates = frame["date"].to_numpy(dtype="datetime64[ns]")
+        amounts = frame["amount"].to_numpy(dtype=np.float64)
+        mask = (amounts < 0) & ~np.isnat(dates)
+        days = dates[mask].view(np.int64) // NS_PER_DAY
+        return days, np.round(-amounts[mask] * 100).astype(np.int64)
+
+    @classmethod
+    def build(cls, frame: pd.DataFrame) -> "RoundupLedger":
+        """Журнал по DataFrame с колонками хранилища (date, amount)."""
+        ledger = cls(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+        ledger._extend(*cls._expenses(frame))
+        return ledger
+
+    @classmethod
+    def from_batch(cls, batch: TransactionBatch) -> "RoundupLedger":
+        """Журнал по компактному набору операций: суммы уже в копейках."""
+        mask = (batch.amount < 0) & (batch.day != MISSING_DAY)
+        ledger = cls(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+        ledger._extend(batch.day[mask].astype(np.int64), -batch.amount[mask])
+        return ledger
+
+    def _extend(self, days: np.ndarray, spent: np.ndarray) -> None:
+        days, spent = np.concatenate([self.days, days]), np.concatenate([self.spent, spent])
+        if len(days) > 1 and (np.diff(days) < 0).any():
+            order = np.argsort(days, kind="stable")
+            days, spent = days[order], spent[order]
+        self.days, self.spent = days, spent
+        self._prefixes = {}
+
+    def append(self, rows: pd.DataFrame) -> None:
+        """Добавляет траты из новых операций хранилища; запомненные префиксы пересчитаются при следующем запросе."""
+        self._extend(*self._expenses(rows))
+
+    def _prefix(self, limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        prefix = self._prefixes.get(limit)
+        if prefix is None:
+            step = int(round(limit * 100))
+            if step <= 0:
+                raise ValueError(f"Шаг округления должен быть положительным: {limit}")
+            days, starts = np.unique(self.days, return_index=True)
+            remainders = -self.spent % step
+            daily = np.add.reduceat(remainders, starts) if len(starts) else np.empty(0, dtype=np.int64)
+            prefix = days, np.concatenate([[0], np.cumsum(daily)])
+            self._prefixes[limit] = prefix
+            metrics.rows_scanned(len(self.spent), "roundup_ledger")
+        return prefix
+
+    def totals(self, limit: int, periods: Sequence[Tuple[int, int]]) -> np.ndarray:
+        """Суммы округлений в копейках (int64) с шагом limit за периоды [первый день, последний день]."""
+        days, cumulative = self._prefix(limit)
+        bounds = np.asarray(periods, dtype=np.int64).reshape(-1, 2)
+        left = np.searchsorted(days, bounds[:, 0], side="left")
+        right = np.searchsorted(days, bounds[:, 1], side="right")
+        return cumulative[right] - cumulative[left]
+
+
+def get_ledger(store: OperationsStore) -> RoundupLedger:
+    """Журнал трат хранилища; строится один раз и дополняется при дозагрузке."""
+    return store.derived("roundup_ledger", RoundupLedger.build)
+
+
+def month_periods(months: Iterable[DateLike]) -> List[Period]:
+    """Периоды календарных месяцев: ('YYYY-MM', первый день, последний день)."""
+    periods = []
+    for month in months:
+        start = month_start(month)
+        periods.append((start.strftime("%Y-%m"), start, start + pd.offsets.MonthEnd(0)))
+    return periods
+
+
+def last_months(date: DateLike, count: int = GRID_MONTHS) -> List[pd.Timestamp]:
+    """count календарных месяцев, заканчивая месяцем даты date."""
+    return list(pd.date_range(end=month_start(date), periods=count, freq="MS"))
+
+
+def range_periods(ranges: Iterable[Tuple[DateLike, DateLike]]) -> List[Period]:
+    """Произвольные периоды [start, end] (даты включительно) с подписью 'YYYY-MM-DD..YYYY-MM-DD'."""
+    periods = []
+    for start, end in ranges:
+        first, last = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+        periods.append((f"{first:%Y-%m-%d}..{last:%Y-%m-%d}", first, last))
+    return periods
+
+
+def _ledger_for(source: Union[OperationsStore, TransactionBatch, List[Dict[str, Any]]]) -> RoundupLedger:
+    if isinstance(source, OperationsStore):
+        return get_ledger(source)
+    if isinstance(source, TransactionBatch):
+        return RoundupLedger.from_batch(source)
+    return RoundupLedger.build(transactions_to_frame(source))
+
+
+def roundup_grid(
+    source: Union[OperationsStore, TransactionBatch, List[Dict[str, Any]]],
+    limits: Sequence[int] = ROUNDUP_LIMITS,
+    months: Optional[Iterable[DateLike]] = None,
+    ranges: Optional[Iterable[Tuple[DateLike, DateLike]]] = None,
+) -> pd.DataFrame:
+    """
+    Суммы «Инвесткопилки» для сетки шагов округления × периодов.
+
+    Строки — периоды (месяцы 'YYYY-MM' и произвольные диапазоны), столбцы — шаги limits, значения в рублях,
+    посчитанные в целых копейках. Без months и ranges берутся последние GRID_MONTHS месяцев
+    до последней траты.
+    """
+    ledger = _ledger_for(source)
+    periods: List[Period] = []
+    if months is not None:
+        periods += month_periods(months)
+    if ranges is not None:
+        periods += range_periods(ranges)
+    if months is None and ranges is None and len(ledger.days):
+        last = pd.Timestamp(int(ledger.days[-1]) * NS_PER_DAY)
+        periods = month_periods(last_months(last))
+
+    bounds = [(day_number(start), day_number(end)) for _, start, end in periods]
+    with metrics.span("roundup_grid"):
+        columns = {limit: ledger.totals(limit, bounds) / 100 if bounds else np.empty(0) for limit in limits}
+    logging.info("Сетка «Инвесткопилки»: %s шагов × %s периодов", len(limits), len(periods))
+    grid = pd.DataFrame(columns, index=pd.Index([label for label, _, _ in periods], name="period"))
+    return grid.round(2)
+
+
+def roundup_grid_json(
+    source: Union[OperationsStore, TransactionBatch, List[Dict[str, Any]]],
+    limits: Sequence[int] = ROUNDUP_LIMITS,
+    months: Optional[Iterable[DateLike]] = None,
+    ranges: Optional[Iterable[Tuple[DateLike, DateLike]]] = None,
+) -> str:
+    """Таблица roundup_grid в JSON: {"limits": [...], "rows": [{"period": ..., "invested": {"10": ..., ...}}]}."""
+    return json.dumps(roundup_grid_table(roundup_grid(source, limits, months, ranges)), ensure_ascii=False)
+
+
+def roundup_grid_table(grid: pd.DataFrame) -> Dict[str, Any]:
+    """JSON-совместимое представление сетки: список шагов и строки по периодам."""
+    return {
+        "limits": [int(limit) for limit in grid.columns],
+        "rows": [
+            {"period": period, "invested": {str(limit): float(value) for limit, value in row.items()}}
+            for period, row in grid.iterrows()
+        ],
+    }
@@ -0,0 +1,215 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src import metrics
+
+STOCK_URL = "https://www.alphavantage.co/query"
+CURRENCY_URL = "https://api.exchangerate.host/latest"
+HISTORY_URL = "https://api.exchangerate.host/timeseries"
+
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_TTL = 300.0
+DEFAULT_WORKERS = 8
+
+
+class MarketDataClient:
+    """
+    Клиент котировок акций (Alpha Vantage) и курсов валют (exchangerate.host).
+
+    Запросы идут через общий пул соединений requests.Session, котировки по нескольким акциям
+    запрашиваются параллельно, у каждого запроса есть таймаут. Ответы кешируются в памяти на ttl секунд
+    и дублируются в JSON-файл cache_path: после перезапуска свежие значения берутся из файла, а при
+    недоступности API отдаются последние сохранённые значения, даже устаревшие.
+    """
+
+    def __init__(
+        self,
+        session: Optional[requests.Session] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        ttl: float = DEFAULT_TTL,
+        cache_path: Optional[str | Path] = None,
+        max_workers: int = DEFAULT_WORKERS,
+        stock_url: str = STOCK_URL,
+        currency_url: str = CURRENCY_URL,
+        history_url: str = HISTORY_URL,
+    ):
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        self.timeout = timeout
+        self.ttl = ttl
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.max_workers = max_workers
+        self.stock_url = stock_url
+        self.currency_url = currency_url
+        self.history_url = history_url
+        self._cache: Dict[str, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        # запись файла кеша: stock_prices и currency_rates сохраняют его из разных потоков
+        self._save_lock = threading.Lock()
+        self._load_disk_cache()
+
+    def _load_disk_cache(self) -> None:
+        if self.cache_path is None or not self.cache_path.exists():
+            return
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            self._cache = {key: (float(saved_at), value) for key, (saved_at, value) in entries.items()}
+        except (OSError, ValueError, TypeError):
+            logging.warning("Не удалось прочитать кеш рыночных данных: %s", self.cache_path)
+
+    def _save_disk_cache(self) -> None:
+        """
+        Атомарно перезаписывает файл кеша снимком кеша в памяти.
+
+        Каждая запись идёт в свой временный файл, а записи из разных потоков выполняются по очереди,
+        поэтому файл не перемешивается и не откатывается к более старому снимку.
+        """
+        if self.cache_path is None:
+            return
+        with self._save_lock:
+            with self._lock:
+                entries = {key: [saved_at, value] for key, (saved_at, value) in self._cache.items()}
+            tmp_name = None
+            try:
+                self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+                with tempfile.NamedTemporaryFile(
+                    "w", encoding="utf-8", dir=self.cache_path.parent, suffix=".tmp", delete=False
+                ) as f:
+                    tmp_name = f.name
+                    json.dump(entries, f, ensure_ascii=False)
+                os.replace(tmp_name, self.cache_path)
+            except OSError:
+                logging.warning("Не удалось сохранить кеш рыночных данных: %s", self.cache_path)
+                if tmp_name is not None:
+                    Path(tmp_name).unlink(missing_ok=True)
+
+    def _cached(self, key: str, fresh_only: bool = True) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._cache.get(key)
+        if entry is None:
+            return False, None
+        saved_at, value = entry
+        if fresh_only and time.time() - saved_at > self.ttl:
+            return False, None
+        return True, value
+
+    def _store(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._cache[key] = (time.time(), value)
+
+    def clear(self) -> None:
+        """Очищает кеш в памяти (файл на диске не трогается)."""
+        with self._lock:
+            self._cache.clear()
+
+    def _get_json(self, service: str, url: str, params: Dict[str, str]) -> Any:
+        ok = False
+        try:
+            with metrics.span("external_fetch", service=service):
+                response = self.session.get(url, params=params, timeout=self.timeout)
+                data = response.json()
+            ok = True
+            return data
+        finally:
+            metrics.external_call(service, ok)
+
+    def _fetch_stock(self, symbol: str, api_key: str) -> Optional[float]:
+        key = f"stock:{symbol}"
+        found, price = self._cached(key)
+        metrics.cache_lookup("market", hit=found)
+        if found:
+            return price  # type: ignore[no-any-return]
+        try:
+            params = {"function": "GLOBAL_QUOTE", "symbol": symbol, "apikey": api_key}
+            data = self._get_json("stock", self.stock_url, params)
+            price = round(float(data["Global Quote"]["05. price"]), 2)
+        except (KeyError, ValueError, TypeError, requests.RequestException):
+            found, price = self._cached(key, fresh_only=False)
+            if found:
+                logging.warning("API недоступно, для акции %s взята последняя сохранённая цена", symbol)
+                return price  # type: ignore[no-any-return]
+            logging.warning("Не удалось получить цену для акции: %s", symbol)
+            return None
+        self._store(key, price)
+        return price  # type: ignore[no-any-return]
+
+    def stock_prices(self, symbols: Iterable[str], api_key: str) -> list[dict]:
+        """Цены акций; символы, которых нет в кеше, запрашиваются параллельно."""
+        symbols = list(symbols)
+        if not symbols:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(symbols))) as executor:
+            prices = list(executor.map(lambda symbol: self._fetch_stock(symbol, api_key), symbols))
+        self._save_disk_cache()
+        return [{"stock": symbol, "price": price} for symbol, price in zip(symbols, prices)]
+
+    def _fetch_rates(self, base: str) -> Dict[str, float]:
+        key = f"rates:{base}"
+        found, rates = self._cached(key)
+        metrics.cache_lookup("market", hit=found)
+        if found:
+            return rates  # type: ignore[no-any-return]
+        try:
+            rates = self._get_json("currency", self.currency_url, {"base": base}).get("rates", {})
+        except (ValueError, AttributeError, requests.RequestException):
+            rates = {}
+        if not rates:
+            found, rates = self._cached(key, fresh_only=False)
+            if found:
+                logging.warning("API курсов недоступно, взяты последние сохранённые курсы")
+                return rates  # type: ignore[no-any-return]
+            return {}
+        self._store(key, rates)
+        self._save_disk_cache()
+        return rates  # type: ignore[no-any-return]
+
+    def currency_rates(self, currencies: Iterable[str], base: str = "RUB") -> list[dict]:
+        """Стоимость единицы каждой валюты в base, одним запросом на все валюты."""
+        rates = self._fetch_rates(base)
+        result = []
+        for currency in currencies:
+            rate = rates.get(currency)
+            if rate:
+                result.append({"currency": currency, "rate": round(1 / rate, 2)})
+            else:
+                logging.warning("Курс для валюты %s не найден", currency)
+                result.append({"currency": currency, "rate": None})
+        return result
+
+    def currency_history(self, currencies: Iterable[str], start: str, end: str, base: str = "RUB") -> list[dict]:
+        """
+        Исторические курсы за даты [start, end] ('YYYY-MM-DD') одним запросом: стоимость единицы валюты в base.
+
+        Возвращает строки {"date", "currency", "rate"}; при недоступности API — пустой список.
+        История не кешируется клиентом: её хранит локальная таблица курсов (src/fx.py).
+        """
+        currencies = [currency for currency in currencies if currency != base]
+        if not currencies:
+            return []
+        params = {"start_date": start, "end_date": end, "base": base, "symbols": ",".join(currencies)}
+        try:
+            days = self._get_json("currency_history", self.history_url, params).get("rates", {})
+        except (ValueError, AttributeError, requests.RequestException):
+            logging.warning("API исторических курсов недоступно")
+            return []
+        rows = []
+        for date, rates in sorted(days.items()):
+            for currency, rate in rates.items():
+                if currency in currencies and rate:
+                    rows.append({"date": date, "currency": currency, "rate": round(1 / rate, 6)})
+        return rows
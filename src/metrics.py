@@ -0,0 +1,202 @@
+import threading
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+F = TypeVar("F", bound=Callable[..., Any])
+Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class _NullSpan:
+    """Пустой контекст: возвращается вместо замера, когда метрики выключены."""
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("registry", "key", "started")
+
+    def __init__(self, registry: "Metrics", key: Key):
+        self.registry = registry
+        self.key = key
+        self.started = 0.0
+
+    def __enter__(self) -> "_Span":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.registry._observe(self.key, time.perf_counter() - self.started)
+
+
+def _key(name: str, labels: Dict[str, Any]) -> Key:
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{label}="{value}"' for (label, _), value in zip(pairs, escaped)) + "}"
+
+
+class Metrics:
+    """
+    Реестр метрик процесса: счётчики и замеры времени (span) с необязательными метками.
+
+    Пока реестр выключен, span() возвращает общий пустой контекст, а incr() сразу выходит,
+    поэтому инструментирование горячих участков почти ничего не стоит. Снимок отдаётся
+    как словарь (JSON) или как текст в формате Prometheus.
+    """
+
+    def __init__(self, enabled: bool = False, prefix: str = "course_work"):
+        self.enabled = enabled
+        self.prefix = prefix
+        self._counters: Dict[Key, float] = {}
+        self._spans: Dict[Key, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def span(self, name: str, **labels: Any) -> Any:
+        """Контекстный менеджер, замеряющий время блока."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, _key(name, labels))
+
+    def timed(self, name: str, **labels: Any) -> Callable[[F], F]:
+        """Декоратор: каждый вызов функции замеряется как span name."""
+
+        def decorator(function: F) -> F:
+            @wraps(function)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with _Span(self, _key(name, labels)):
+                    return function(*args, **kwargs)
+
+            return wrapper  # type: ignore[return-value]
+
+        return decorator
+
+    def incr(self, name: str, value: float = 1, **labels: Any) -> None:
+        """Увеличивает счётчик name на value."""
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def _observe(self, key: Key, seconds: float) -> None:
+        with self._lock:
+            stats = self._spans.get(key)
+            if stats is None:
+                self._spans[key] = [1, seconds, seconds]
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+                stats[2] = max(stats[2], seconds)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._spans.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Текущие значения: счётчики и для каждого span — число вызовов, суммарное и максимальное время."""
+        with self._lock:
+            counters = dict(self._counters)
+            spans = {key: list(stats) for key, stats in self._spans.items()}
+        return {
+            "enabled": self.enabled,
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value} for (name, labels), value in counters.items()
+            ],
+            "spans": [
+                {"name": name, "labels": dict(labels), "count": int(count), "sum_s": total, "max_s": longest}
+                for (name, labels), (count, total, longest) in spans.items()
+            ],
+        }
+
+    def to_prometheus(self) -> str:
+        """Снимок в текстовом формате Prometheus: счётчики как counter, span — как summary в секундах."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            spans = sorted((key, list(stats)) for key, stats in self._spans.items())
+
+        lines = []
+        declared = set()
+        for (name, labels), value in counters:
+            metric = f"{self.prefix}_{name}"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_format_labels(labels)} {value:g}")
+        for (name, labels), (count, total, longest) in spans:
+            metric = f"{self.prefix}_{name}_seconds"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} summary")
+            lines.append(f"{metric}_count{_format_labels(labels)} {int(count)}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {total:.6f}")
+            lines.append(f'{metric}{_format_labels(labels, (("quantile", "1"),))} {longest:.6f}')
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+def span(name: str, **labels: Any) -> Any:
+    return METRICS.span(name, **labels)
+
+
+def timed(name: str, **labels: Any) -> Callable[[F], F]:
+    return METRICS.timed(name, **labels)
+
+
+def incr(name: str, value: float = 1, **labels: Any) -> None:
+    METRICS.incr(name, value, **labels)
+
+
+def enable(enabled: bool = True) -> None:
+    """Включает (или выключает) сбор метрик глобального реестра."""
+    METRICS.enabled = enabled
+
+
+def is_enabled() -> bool:
+    return METRICS.enabled
+
+
+def snapshot() -> Dict[str, Any]:
+    return METRICS.snapshot()
+
+
+def to_prometheus() -> str:
+    return METRICS.to_prometheus()
+
+
+def reset() -> None:
+    METRICS.reset()
+
+
+def rows_scanned(rows: int, stage: str) -> None:
+    """Учитывает число строк, просмотренных на этапе stage."""
+    METRICS.incr("rows_scanned_total", rows, stage=stage)
+
+
+def cache_lookup(cache: str, hit: bool, count: int = 1) -> None:
+    """Учитывает попадание или промах кеша cache."""
+    METRICS.incr("cache_hits_total" if hit else "cache_misses_total", count, cache=cache)
+
+
+def external_call(service: str, ok: Optional[bool] = None) -> None:
+    """Учитывает обращение к внешнему API; ok=False — неуспешное."""
+    METRICS.incr("external_calls_total", service=service)
+    if ok is False:
+        METRICS.incr("external_errors_total", service=service)
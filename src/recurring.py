@@ -0,0 +1,256 @@
+"""
+Поиск регулярных платежей: подписки, пополнения связи, аренда.
+
+Траты группируются по нормализованному описанию (получателю) и полосе суммы, затем в каждой группе
+ищется серия с недельным или месячным шагом. Обе стадии — сортировка и один проход: траты сортируются
+по (получатель, сумма) и режутся на полосы там, где сумма выросла больше чем на AMOUNT_TOLERANCE,
+затем по (полоса, день) — и с конца истории берутся платежи, шаг между которыми укладывается в окно
+одного из периодов PERIODS.
+Всего O(n log n) по всей истории. При дозагрузке операций пересчитываются только затронутые получатели.
+"""
+
+import logging
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from src import metrics
+from src.investment import NS_PER_DAY
+from src.search import PHONE_RE
+from src.store import DateLike, OperationsStore, rub_column
+
+# суммы одной серии отличаются от соседней по возрастанию не больше чем на 15%
+AMOUNT_TOLERANCE = 0.15
+# серия активна, если со дня последнего платежа прошло не больше ACTIVE_PERIODS периодов
+ACTIVE_PERIODS = 1.5
+DAYS_PER_MONTH = 365.25 / 12
+NOISE_RE = re.compile(r"[\d\W_]+")
+
+
+@dataclass(frozen=True)
+class Period:
+    """Период серии: подпись, номинальная длина в днях, окно шага между платежами и минимум платежей в серии."""
+
+    name: str
+    days: float
+    min_gap: int
+    max_gap: int
+    min_count: int
+
+
+PERIODS = (Period("weekly", 7.0, 6, 8, 4), Period("monthly", DAYS_PER_MONTH, 26, 35, 3))
+
+
+def normalize_merchant(description: Any) -> str:
+    """Описание без номеров телефонов, цифр и знаков, в нижнем регистре: 'Яндекс.Плюс 12' -> 'яндекс плюс'."""
+    if not isinstance(description, str):
+        return ""
+    text = PHONE_RE.sub(" ", description.lower().replace("ё", "е"))
+    return " ".join(NOISE_RE.sub(" ", text).split())
+
+
+class RecurringDetector:
+    """
+    Траты в компактном виде (код получателя, сумма в копейках, номер дня) и найденные по ним серии.
+
+    Серии хранятся по получателям; append() добавляет новые траты и помечает их получателей, так что
+    следующий series() пересчитывает только их. Детектор общий для запросов к хранилищу, поэтому
+    дозагрузка и пересчёт серий выполняются под блокировкой.
+    """
+
+    def __init__(self) -> None:
+        self.merchants: Dict[str, int] = {}
+        self.names: List[str] = []
+        self.categories: List[Optional[str]] = []
+        self.merchant = np.empty(0, dtype=np.int64)
+        self.spent = np.empty(0, dtype=np.int64)
+        self.day = np.empty(0, dtype=np.int64)
+        self._series: Dict[int, List[Dict[str, Any]]] = {}
+        self._dirty: set[int] = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, frame: pd.DataFrame) -> "RecurringDetector":
+        """Детектор по DataFrame с колонками хранилища (date, amount, description, category)."""
+        detector = cls()
+        detector.append(frame)
+        return detector
+
+    def _codes(self, descriptions: pd.Series, categories: pd.Series) -> np.ndarray:
+        """Коды получателей: нормализация выполняется один раз на уникальное описание."""
+        values = descriptions.astype(object).fillna("").astype(str).to_numpy()
+        unique, inverse = np.unique(values, return_inverse=True)
+        codes = np.empty(len(unique), dtype=np.int64)
+        for position, description in enumerate(unique):
+            name = normalize_merchant(description)
+            if not name:
+                codes[position] = -1
+                continue
+            if name not in self.merchants:
+                self.merchants[name] = len(self.names)
+                self.names.append(description)
+                self.categories.append(None)
+            codes[position] = self.merchants[name]
+        result = codes[inverse]
+        # категория получателя — из его последней траты с категорией
+        latest = pd.DataFrame({"code": result, "category": categories.astype(object).to_numpy()})
+        latest = latest[(latest["code"] >= 0) & latest["category"].notna()].drop_duplicates("code", keep="last")
+        for code, category in zip(latest["code"].tolist(), latest["category"].tolist()):
+            self.categories[code] = str(category)
+        return result
+
+    def append(self, rows: pd.DataFrame) -> None:
+        """Добавляет траты из новых операций хранилища (суммы в рублях, если посчитаны)."""
+        dates = rows["date"].to_numpy(dtype="datetime64[ns]")
+        amounts = rows[rub_column(rows)].to_numpy(dtype=np.float64)
+        mask = (amounts < 0) & ~np.isnat(dates)
+        if "description" not in rows or not mask.any():
+            return
+        categories = rows["category"] if "category" in rows else pd.Series(None, index=rows.index)
+        with self._lock:
+            codes = self._codes(rows["description"][mask], categories[mask])
+            known = codes >= 0
+            self.merchant = np.concatenate([self.merchant, codes[known]])
+            self.spent = np.concatenate([self.spent, np.round(-amounts[mask][known] * 100).astype(np.int64)])
+            self.day = np.concatenate([self.day, dates[mask][known].view(np.int64) // NS_PER_DAY])
+            self._dirty.update(np.unique(codes[known]).tolist())
+
+    def _detect(self, merchants: np.ndarray) -> None:
+        positions = np.flatnonzero(np.isin(self.merchant, merchants))
+        merchant, spent, day = self.merchant[positions], self.spent[positions], self.day[positions]
+
+        # полосы сумм: сортировка по (получатель, сумма) и разрез там, где сумма выросла больше допуска
+        order = np.lexsort((spent, merchant))
+        merchant, spent, day = merchant[order], spent[order], day[order]
+        breaks = np.ones(len(order), dtype=bool)
+        breaks[1:] = (merchant[1:] != merchant[:-1]) | (spent[1:] > spent[:-1] * (1 + AMOUNT_TOLERANCE))
+        band = np.cumsum(breaks) - 1
+
+        # внутри полосы — по дням; несколько платежей за день считаются одним
+        order = np.lexsort((day, band))
+        frame = pd.DataFrame({"band": band, "merchant": merchant, "spent": spent, "day": day}).iloc[order]
+        frame = frame.drop_duplicates(["band", "day"])
+
+        for code in merchants.tolist():
+            self._series[code] = []
+        for _, group in frame.groupby("band", sort=False):
+            series = self._series_from(group)
+            if series is not None:
+                self._series[series["merchant_code"]].append(series)
+
+    @staticmethod
+    def _series_from(group: pd.DataFrame) -> Optional[Dict[str, Any]]:
+        """
+        Последняя непрерывная серия полосы: платежи с конца истории, пока шаг между соседними укладывается
+        в окно периода. Так серия находится и после смены даты списания или перерыва в подписке.
+        """
+        gaps = np.diff(group["day"].to_numpy())
+        for period in PERIODS:
+            irregular = np.flatnonzero((gaps < period.min_gap) | (gaps > period.max_gap))
+            start = int(irregular[-1]) + 1 if len(irregular) else 0
+            if len(gaps) - start + 1 >= period.min_count:
+                break
+        else:
+            return None
+        series = group.iloc[start:]
+        return {
+            "merchant_code": int(series["merchant"].iloc[0]),
+            "period": period,
+            "count": len(series),
+            "first_day": int(series["day"].iloc[0]),
+            "last_day": int(series["day"].iloc[-1]),
+            "amount": round(float(np.median(series["spent"].to_numpy())) / 100, 2),
+        }
+
+    def series(self, as_of: Optional[DateLike] = None, active_only: bool = False) -> pd.DataFrame:
+        """
+        Найденные серии, самые дорогие в месяц сначала.
+
+        Колонки: merchant (описание), category, period ('weekly'/'monthly'), count, first_date, last_date,
+        amount (типичный платёж), monthly_cost, next_date (ожидаемый следующий платёж) и active — не пропущен
+        ли платёж на дату as_of (по умолчанию — день последней траты в истории).
+        """
+        with self._lock:
+            if self._dirty:
+                with metrics.span("recurring_detect"):
+                    self._detect(np.fromiter(self._dirty, dtype=np.int64))
+                metrics.rows_scanned(len(self.merchant), "recurring")
+                self._dirty = set()
+            found_series = list(self._series.values())
+            last_day = int(self.day.max()) if len(self.day) else None
+        today = pd.Timestamp(as_of).normalize() if as_of is not None else None
+        if today is None and last_day is not None:
+            today = pd.Timestamp(last_day * NS_PER_DAY)
+
+        rows = []
+        for found in found_series:
+            for series in found:
+                period: Period = series["period"]
+                last = pd.Timestamp(series["last_day"] * NS_PER_DAY)
+                if period.name == "monthly":
+                    next_date = last + pd.DateOffset(months=1)
+                else:
+                    next_date = last + pd.Timedelta(days=period.days)
+                active = today is None or (today - last).days <= period.days * ACTIVE_PERIODS
+                if active_only and not active:
+                    continue
+                rows.append(
+                    {
+                        "merchant": self.names[series["merchant_code"]],
+                        "category": self.categories[series["merchant_code"]],
+                        "period": period.name,
+                        "count": series["count"],
+                        "first_date": pd.Timestamp(series["first_day"] * NS_PER_DAY),
+                        "last_date": last,
+                        "amount": series["amount"],
+                        "monthly_cost": round(series["amount"] * DAYS_PER_MONTH / period.days, 2),
+                        "next_date": next_date,
+                        "active": active,
+                    }
+                )
+        columns = [
+            "merchant",
+            "category",
+            "period",
+            "count",
+            "first_date",
+            "last_date",
+            "amount",
+            "monthly_cost",
+            "next_date",
+            "active",
+        ]
+        result = pd.DataFrame(rows, columns=columns)
+        logging.info("Найдено регулярных платежей: %s", len(result))
+        return result.sort_values(["monthly_cost", "merchant"], ascending=[False, True], ignore_index=True)
+
+
+def get_detector(store: OperationsStore) -> RecurringDetector:
+    """Детектор регулярных платежей хранилища; строится один раз и дополняется при дозагрузке."""
+    return store.derived("recurring", RecurringDetector.build)
+
+
+def find_recurring(
+    source: Union[OperationsStore, pd.DataFrame], as_of: Optional[DateLike] = None, active_only: bool = False
+) -> pd.DataFrame:
+    """Регулярные платежи по хранилищу или DataFrame с колонками хранилища (см. RecurringDetector.series)."""
+    detector = get_detector(source) if isinstance(source, OperationsStore) else RecurringDetector.build(source)
+    return detector.series(as_of, active_only)
+
+
+def recurring_table(series: pd.DataFrame) -> Dict[str, Any]:
+    """JSON-совместимое представление серий: даты 'YYYY-MM-DD' и общая сумма активных платежей в месяц."""
+    records = series.assign(
+        **{
+            column: pd.to_datetime(series[column]).dt.strftime("%Y-%m-%d")
+            for column in ("first_date", "last_date", "next_date")
+        }
+    )
+    return {
+        "monthly_total": round(float(series.loc[series["active"], "monthly_cost"].sum()), 2),
+        "series": records.astype(object).where(records.notna(), None).to_dict(orient="records"),
+    }
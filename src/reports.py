@@ -1,95 +1,114 @@
 import json
+import logging
+from typing import Dict, Iterable, Optional, Union
 
-from src.services import analyze_cashback_categories, find_phone_transactions, investment_bank
+import numpy as np
+import pandas as pd
 
-
-def test_investment_bank_basic() -> None:
-    transactions = [
-        {"Дата операции": "2024-06-01", "Сумма операции": -1712},
-        {"Дата операции": "2024-06-15", "Сумма операции": -2050},
-        {"Дата операции": "2024-05-20", "Сумма операции": -900},
-        {"Дата операции": "2024-06-10", "Сумма операции": 500},
-    ]
-    result = investment_bank("2024-06", transactions, 50)
-    assert result == 38
-
-
-def test_investment_bank_no_transactions() -> None:
-    transactions: list[dict[str, int | str]] = [
-        {"Дата операции": "2024-05-20", "Сумма операции": -900},
-        {"Дата операции": "2024-06-10", "Сумма операции": 500},  # доход
-    ]
-    result = investment_bank("2024-06", transactions, 10)
-    assert result == 0
-
-
-def test_investment_bank_rounding_100() -> None:
-    transactions = [
-        {"Дата операции": "2024-06-01", "Сумма операции": -320},
-        {"Дата операции": "2024-06-05", "Сумма операции": -450},
-    ]
-    result = investment_bank("2024-06", transactions, 100)
-    assert result == 130
-
-
-def test_investment_bank_positive_transactions() -> None:
-    transactions = [
-        {"Дата операции": "2024-06-01", "Сумма операции": 300},
-        {"Дата операции": "2024-06-02", "Сумма операции": -250},
-    ]
-    result = investment_bank("2024-06", transactions, 10)
-    assert result == 0
-
-
-def test_find_phone_transactions() -> None:
-    transactions = [
-        {"Дата операции": "2024-06-01", "Сумма операции": -500, "Описание": "Я МТС +7 921 11-22-33"},
-        {"Дата операции": "2024-06-02", "Сумма операции": -300, "Описание": "Нет номера"},
-        {"Дата операции": "2024-06-03", "Сумма операции": -450, "Описание": "Тинькофф Мобайл +7 995 555-55-55"},
-    ]
-    result = find_phone_transactions(transactions)
-    parsed = json.loads(result)
-
-    assert len(parsed) == 2
-    assert "+7 921 11-22-33" in parsed[0]["Описание"]
-    assert "+7 995 555-55-55" in parsed[1]["Описание"]
-
-
-def test_analyze_cashback_categories_basic() -> None:
-    data = [
-        {"Дата операции": "2024-06-01", "Сумма операции": -1000, "Категория": "Категория 1"},
-        {"Дата операции": "2024-06-02", "Сумма операции": -2000, "Категория": "Категория 2"},
-        {"Дата операции": "2024-06-15", "Сумма операции": -500, "Категория": "Категория 1"},
-        {"Дата операции": "2024-05-30", "Сумма операции": -700, "Категория": "Категория 3"},
-        {"Дата операции": "2024-06-10", "Сумма операции": 300, "Категория": "Категория 1"},  # доход, не учитываем
-    ]
-
-    result_json = analyze_cashback_categories(data, 2024, 6)
-    result = json.loads(result_json)
-
-    assert isinstance(result, dict)
-    assert result.get("Категория 1") == 1500  # 1000 + 500
-    assert result.get("Категория 2") == 2000
-    assert "Категория 3" not in result  # транзакция в мае — игнорируем
-
-
-def test_analyze_cashback_categories_no_transactions() -> None:
-    data = [
-        {"Дата операции": "2024-05-01", "Сумма операции": -1000, "Категория": "Категория 1"},
-    ]
-
-    result_json = analyze_cashback_categories(data, 2024, 6)
-    result = json.loads(result_json)
-    assert result == {}
-
-
-def test_analyze_cashback_categories_positive_amounts_ignored() -> None:
-    data = [
-        {"Дата операции": "2024-06-01", "Сумма операции": 1000, "Категория": "Категория 1"},  # доход
-        {"Дата операции": "2024-06-05", "Сумма операции": -500, "Категория": "Категория 1"},
-    ]
-
-    result_json = analyze_cashback_categories(data, 2024, 6)
-    result = json.loads(result_json)
-
-    assert result.get("Категория 1") == 500
\ No newline at end of file
+from src import metrics
+from src.store import COLUMNS, DateLike, date_bounds, sort_by_date
+from src.transactions import TransactionBatch
+
+Operations = Union[pd.DataFrame, TransactionBatch]
+
+WEEKDAYS = ["понедельник", "вторник", "среда", "четверг", "пятница", "суббота", "воскресенье"]
+WEEKDAY_TYPES = ["рабочий день", "выходной день"]
+REPORT_MONTHS = 3
+
+
+def report_window(date: Optional[DateLike] = None) -> tuple[pd.Timestamp, pd.Timestamp]:
+    """Период отчёта: три месяца, предшествующие дате (по умолчанию — текущему моменту), включительно."""
+    end = pd.Timestamp(date) if date is not None else pd.Timestamp.now()
+    return end - pd.DateOffset(months=REPORT_MONTHS), end
+
+
+def expenses_frame(df: Operations) -> pd.DataFrame:
+    """
+    Расходы (отрицательные суммы) с датой и суммой траты, отсортированные по дате.
+
+    Принимает DataFrame хранилища (date, amount), колонки выгрузки ('Дата операции',
+    'Сумма операции') или TransactionBatch; строковые даты разбираются один раз для всей колонки.
+    """
+    if isinstance(df, TransactionBatch):
+        expenses = df[df.amount < 0]
+        frame = pd.DataFrame({"date": expenses.datetimes(), "spent": -expenses.amounts()})
+        return sort_by_date(frame.dropna(subset=["date"]))
+    frame = df.rename(columns=COLUMNS)
+    dates = frame["date"]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, format="ISO8601", errors="coerce")
+    amounts = pd.to_numeric(frame["amount"], errors="coerce").to_numpy(dtype=np.float64)
+    expenses = pd.DataFrame({"date": dates.to_numpy(), "spent": -amounts})
+    return sort_by_date(expenses[amounts < 0].dropna(subset=["date"]).reset_index(drop=True))
+
+
+def _mean_by(keys: np.ndarray, spent: np.ndarray, size: int) -> np.ndarray:
+    sums = np.bincount(keys, weights=spent, minlength=size)
+    counts = np.bincount(keys, minlength=size)
+    return np.divide(sums, counts, out=np.zeros(size), where=counts > 0)
+
+
+def _window(df: Operations, date: Optional[DateLike]) -> pd.DataFrame:
+    expenses = expenses_frame(df)
+    left, right = date_bounds(expenses, *report_window(date))
+    return expenses.iloc[left:right]
+
+
+def _to_json(labels: Iterable[str], values: np.ndarray) -> str:
+    with metrics.span("json_serialize", function="reports"):
+        return json.dumps({label: round(float(value), 2) for label, value in zip(labels, values)}, ensure_ascii=False)
+
+
+def spending_by_weekday(df: Operations, date: Optional[str] = None) -> str:
+    """
+    Возвращает JSON со средней тратой в каждый из дней недели за три месяца до указанной даты.
+
+    :param df: DataFrame с операциями (хранилища или в колонках выгрузки) или TransactionBatch
+    :param date: дата отчёта, по умолчанию — текущая
+    :return: JSON вида {"понедельник": 1234.5, ...}; дни без трат — 0
+    """
+    logging.info("Отчёт «Траты по дням недели» на дату %s", date)
+    window = _window(df, date)
+    means = _mean_by(window["date"].dt.dayofweek.to_numpy(), window["spent"].to_numpy(), 7)
+    return _to_json(WEEKDAYS, means)
+
+
+def spending_by_weekday_type(df: Operations, date: Optional[str] = None) -> str:
+    """Возвращает JSON со средней тратой в рабочие и выходные дни за три месяца до указанной даты."""
+    logging.info("Отчёт «Траты в рабочий/выходной день» на дату %s", date)
+    window = _window(df, date)
+    weekend = (window["date"].dt.dayofweek.to_numpy() >= 5).astype(np.int64)
+    return _to_json(WEEKDAY_TYPES, _mean_by(weekend, window["spent"].to_numpy(), 2))
+
+
+def spending_by_hour(df: Operations, date: Optional[str] = None) -> str:
+    """Возвращает JSON со средней тратой по часам суток (ключи '0'…'23') за три месяца до указанной даты."""
+    logging.info("Отчёт «Траты по часам» на дату %s", date)
+    window = _window(df, date)
+    means = _mean_by(window["date"].dt.hour.to_numpy(), window["spent"].to_numpy(), 24)
+    return _to_json((str(hour) for hour in range(24)), means)
+
+
+def spending_by_weekday_batch(df: Operations, dates: Iterable[DateLike]) -> Dict[str, Dict[str, float]]:
+    """
+    Средние траты по дням недели сразу для многих дат отчёта.
+
+    Расходы сортируются и раскладываются по дням недели один раз: для каждого дня недели хранятся
+    позиции его трат в общем порядке и префиксные суммы по ним — всего O(n) памяти. Каждое окно
+    считается бинарным поиском за O(log n), без повторного прохода по операциям.
+    """
+    expenses = expenses_frame(df)
+    weekdays, spent = expenses["date"].dt.dayofweek.to_numpy(), expenses["spent"].to_numpy(dtype=np.float64)
+    positions = [np.flatnonzero(weekdays == day) for day in range(7)]
+    sums = [np.concatenate(([0.0], spent[day_positions].cumsum())) for day_positions in positions]
+
+    result = {}
+    for date in dates:
+        left, right = date_bounds(expenses, *report_window(date))
+        window_sums, window_counts = np.zeros(7), np.zeros(7, dtype=np.int64)
+        for day, (day_positions, day_sums) in enumerate(zip(positions, sums)):
+            first, last = np.searchsorted(day_positions, [left, right])
+            window_sums[day], window_counts[day] = day_sums[last] - day_sums[first], last - first
+        means = np.divide(window_sums, window_counts, out=np.zeros(7), where=window_counts > 0)
+        result[str(date)] = {day: round(float(value), 2) for day, value in zip(WEEKDAYS, means)}
+    return result
@@ -0,0 +1,165 @@
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.store import OperationsStore
+
+PHONE_PATTERN = r"\+7[\s\-]?\d{3}[\s\-]?\d{2,3}[\s\-]?\d{2}[\s\-]?\d{2}"
+PHONE_RE = re.compile(PHONE_PATTERN)
+TOKEN_RE = re.compile(r"\w+")
+DEFAULT_PER_PAGE = 50
+
+
+def normalize_phone(phone: str) -> str:
+    """Приводит номер к виду E.164: '+7 921 111-22-33' и '8 921 111 22 33' -> '+79211112233'."""
+    digits = re.sub(r"\D", "", phone)
+    if phone.lstrip().startswith("+") and digits.startswith("7"):
+        digits = digits[1:]
+    elif len(digits) == 11 and digits[0] in "78":
+        digits = digits[1:]
+    return f"+7{digits}"
+
+
+def tokenize(text: str) -> List[str]:
+    """Слова описания в нижнем регистре."""
+    return TOKEN_RE.findall(text.lower())
+
+
+def _merge(arrays: Iterable[np.ndarray]) -> np.ndarray:
+    arrays = list(arrays)
+    if not arrays:
+        return np.empty(0, dtype=np.int64)
+    return np.unique(np.concatenate(arrays))
+
+
+class SearchIndex:
+    """
+    Индекс поиска по операциям.
+
+    Описания обрабатываются один раз на уникальное значение: из них извлекаются нормализованные
+    номера телефонов (хеш-индекс номер -> описания) и слова (инвертированный индекс слово -> описания).
+    Для каждого описания и каждого MCC хранится отсортированный массив меток строк хранилища,
+    поэтому поиск не сканирует историю операций.
+    """
+
+    def __init__(self) -> None:
+        self.rows_by_description: Dict[str, np.ndarray] = {}
+        self.rows_by_mcc: Dict[int, np.ndarray] = {}
+        self.phones: Dict[str, set[str]] = {}
+        self.tokens: Dict[str, set[str]] = {}
+
+    @classmethod
+    def build(cls, frame: pd.DataFrame) -> "SearchIndex":
+        index = cls()
+        index.append(frame)
+        logging.info(
+            "Поисковый индекс построен: %s описаний, %s номеров", len(index.rows_by_description), len(index.phones)
+        )
+        return index
+
+    @staticmethod
+    def _group_labels(labels: np.ndarray, keys: pd.Series) -> Dict[Any, np.ndarray]:
+        codes, uniques = pd.factorize(keys, use_na_sentinel=True)
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+        return {uniques[i]: labels[order[bounds[i] : bounds[i + 1]]] for i in range(len(uniques))}
+
+    def append(self, rows: pd.DataFrame) -> None:
+        """Добавляет операции в индекс; разбираются только описания, которых ещё не было."""
+        labels = rows.index.to_numpy()
+        if "description" in rows:
+            for description, found in self._group_labels(labels, rows["description"].astype(object)).items():
+                description = str(description)
+                if description in self.rows_by_description:
+                    found = np.concatenate([self.rows_by_description[description], found])
+                else:
+                    self._index_description(description)
+                self.rows_by_description[description] = np.sort(found)
+        if "mcc" in rows:
+            for mcc, found in self._group_labels(labels, rows["mcc"]).items():
+                key = int(mcc)
+                previous = self.rows_by_mcc.get(key)
+                self.rows_by_mcc[key] = np.sort(found if previous is None else np.concatenate([previous, found]))
+
+    def _index_description(self, description: str) -> None:
+        for phone in PHONE_RE.findall(description):
+            self.phones.setdefault(normalize_phone(phone), set()).add(description)
+        for token in set(tokenize(description)):
+            self.tokens.setdefault(token, set()).add(description)
+
+    def _rows(self, descriptions: Iterable[str]) -> np.ndarray:
+        return _merge(self.rows_by_description[description] for description in descriptions)
+
+    def by_phone(self, phone: Optional[str] = None) -> np.ndarray:
+        """Метки операций с указанным номером (в любом написании) или с любым номером, если он не задан."""
+        if phone is None:
+            return self._rows(set().union(*self.phones.values()))
+        return self._rows(self.phones.get(normalize_phone(phone), ()))
+
+    def by_keyword(self, text: str) -> np.ndarray:
+        """Метки операций, в описании которых есть все слова из text."""
+        words = tokenize(text)
+        if not words:
+            return np.empty(0, dtype=np.int64)
+        descriptions = set.intersection(*(self.tokens.get(word, set()) for word in words))
+        return self._rows(descriptions)
+
+    def by_merchant(self, substring: str) -> np.ndarray:
+        """Метки операций, описание которых содержит подстроку (без учёта регистра)."""
+        needle = substring.lower()
+        return self._rows(description for description in self.rows_by_description if needle in description.lower())
+
+    def by_mcc(self, mcc: int) -> np.ndarray:
+        """Метки операций с указанным MCC."""
+        return self.rows_by_mcc.get(int(mcc), np.empty(0, dtype=np.int64))
+
+
+def get_search_index(store: OperationsStore) -> SearchIndex:
+    """Поисковый индекс хранилища; строится один раз при первом обращении."""
+    return store.derived("search", SearchIndex.build)
+
+
+def paginate(
+    store: OperationsStore, labels: np.ndarray, page: int = 1, per_page: int = DEFAULT_PER_PAGE
+) -> Dict[str, Any]:
+    """Страница найденных операций: общее число, номер страницы и сами строки хранилища."""
+    page = max(page, 1)
+    selected = labels[(page - 1) * per_page : page * per_page]
+    return {"total": len(labels), "page": page, "per_page": per_page, "rows": store.frame.loc[selected]}
+
+
+def search_operations(
+    store: OperationsStore,
+    phone: Optional[str] = None,
+    merchant: Optional[str] = None,
+    keyword: Optional[str] = None,
+    mcc: Optional[int] = None,
+    page: int = 1,
+    per_page: int = DEFAULT_PER_PAGE,
+) -> Dict[str, Any]:
+    """
+    Поиск операций по номеру телефона, подстроке в описании, словам и MCC.
+
+    Заданные условия объединяются через «и»; результат упорядочен по дате и разбит на страницы.
+    """
+    index = get_search_index(store)
+    conditions = []
+    if phone is not None:
+        conditions.append(index.by_phone(phone))
+    if merchant is not None:
+        conditions.append(index.by_merchant(merchant))
+    if keyword is not None:
+        conditions.append(index.by_keyword(keyword))
+    if mcc is not None:
+        conditions.append(index.by_mcc(mcc))
+    if not conditions:
+        labels = store.frame.index.to_numpy()
+    else:
+        labels = conditions[0]
+        for condition in conditions[1:]:
+            labels = np.intersect1d(labels, condition, assume_unique=True)
+    positions = np.sort(store.frame.index.get_indexer(labels))
+    return paginate(store, store.frame.index.to_numpy()[positions], page, per_page)
@@ -1,13 +1,73 @@
-import json
 import logging
-import re
-from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+import numpy as np
+import pandas as pd
 
+from src import metrics
+from src.aggregates import ROUNDUP_LIMITS, get_cube
+from src.cache import cached_response, dumps
+from src.config import get_config
+from src.investment import day_number, get_ledger
+from src.search import PHONE_RE, get_search_index
+from src.store import OperationsStore, date_slice, month_bounds, rub_column, sort_by_date
+from src.transactions import TransactionBatch, Transactions, transactions_to_frame
 
-def investment_bank(month: str, transactions: List[Dict[str, Any]], limit: int) -> float:
+NO_CATEGORY = "Без категории"
+
+
+def _dumps(value: Any, function: str, indent: Optional[int] = None) -> str:
+    """JSON ответа; при compact_json настроек — без отступов (orjson, если установлен)."""
+    with metrics.span("json_serialize", function=function):
+        return dumps(value, compact=get_config().compact_json, indent=indent)
+
+
+def investment_bank_frame(df: pd.DataFrame, month: str, limit: int) -> float:
+    """
+    Сумма в «Инвесткопилку» за месяц по DataFrame, отсортированному по дате (как в хранилище).
+
+    Каждая трата округляется вверх до кратного limit, разница откладывается.
+    """
+    expenses = date_slice(df, *month_bounds(month))["amount"].to_numpy(dtype=np.float64)
+    metrics.rows_scanned(len(expenses), "investment_bank")
+    spent = -expenses[expenses < 0]
+    diffs = np.ceil(spent / limit) * limit - spent
+    return round(float(diffs.sum()), 2)
+
+
+def investment_bank_store(store: OperationsStore, month: str, limit: int) -> float:
+    """
+    Сумма в «Инвесткопилку» за месяц по хранилищу.
+
+    Для стандартных шагов округления (ROUNDUP_LIMITS) берётся из дневных агрегатов, иначе — из журнала трат
+    в копейках (src/investment.py), общего для всех запросов к хранилищу.
+    """
+    start, end = month_bounds(month)
+    if limit in ROUNDUP_LIMITS:
+        return get_cube(store).roundup_total(limit, start, end.normalize())
+    return round(int(get_ledger(store).totals(limit, [(day_number(start), day_number(end))])[0]) / 100, 2)
+
+
+def investment_bank_batch(batch: TransactionBatch, month: str, limit: int) -> float:
+    """
+    Сумма в «Инвесткопилку» за месяц по компактному набору операций.
+
+    Считается в целых копейках, поэтому результат точен до копейки при любом числе операций.
+    """
+    amounts = batch.amount[batch.month_mask(month)]
+    metrics.rows_scanned(len(amounts), "investment_bank")
+    spent = -amounts[amounts < 0]
+    step = limit * 100
+    diffs = -(-spent // step) * step - spent
+    return round(int(diffs.sum()) / 100, 2)
+
+
+def investment_bank_list(transactions: List[Dict[str, Any]], month: str, limit: int) -> float:
+    """Сумма в «Инвесткопилку» за месяц по списку словарей: через DataFrame с колонками хранилища."""
+    return investment_bank_frame(sort_by_date(transactions_to_frame(transactions)), month, limit)
+
+
+def investment_bank(month: str, transactions: Transactions, limit: int) -> float:
     """
     Рассчитывает сумму отложенных средств в «Инвесткопилку» за указанный месяц.
 
@@ -15,33 +75,23 @@ def investment_bank(month: str, transactions: List[Dict[str, Any]], limit: int)
     :param transactions: список словарей с транзакциями, где есть поля:
         - 'Дата операции' (str, 'YYYY-MM-DD')
         - 'Сумма операции' (число)
+        либо TransactionBatch
     :param limit: шаг округления (например, 10, 50, 100)
     :return: сумма отложенных рублей (float)
     """
-    logging.info(f"Запуск расчёта Инвесткопилки для месяца {month} с лимитом округления {limit} ₽")
-
-    filtered = filter(
-        lambda t: t.get("Дата операции", "").startswith(month),
-        transactions,
-    )
-
-    def rounding_diff(amount: float) -> float:
-        if amount >= 0:
-            return 0.0
-        abs_amount = abs(amount)
-        rounded = ((abs_amount + limit - 1) // limit) * limit
-        diff = rounded - abs_amount
-        logging.debug(f"Трата: {abs_amount}, округление до {rounded}, откладываем {diff}")
-        return diff
+    logging.info("Запуск расчёта Инвесткопилки для месяца %s с лимитом округления %s ₽", month, limit)
 
-    diffs = map(lambda t: rounding_diff(t["Сумма операции"]), filtered)
-    total = round(sum(diffs), 2)
+    if isinstance(transactions, TransactionBatch):
+        total = investment_bank_batch(transactions, month, limit)
+    else:
+        total = investment_bank_list(transactions, month, limit)
 
-    logging.info(f"Итоговая сумма Инвесткопилки за {month}: {total} ₽")
+    logging.info("Итоговая сумма Инвесткопилки за %s: %s ₽", month, total)
     return total
 
 
-def investment_bank_json(month: str, transactions: List[Dict[str, Any]], limit: int) -> str:
+@cached_response("transactions")
+def investment_bank_json(month: str, transactions: Transactions, limit: int) -> str:
     """Возвращает JSON с результатом работы investment_bank"""
     total = investment_bank(month, transactions, limit)
     response = {
@@ -49,59 +99,155 @@ def investment_bank_json(month: str, transactions: List[Dict[str, Any]], limit:
         "limit": limit,
         "invested": total,
     }
-    return json.dumps(response, ensure_ascii=False, indent=2)
+    return _dumps(response, "investment_bank_json", indent=2)
 
 
-def find_phone_transactions(transactions: List[Dict[str, Any]]) -> str:
+def phone_mask(df: pd.DataFrame) -> pd.Series:
+    """
+    Маска операций, в описании которых есть номер телефона.
+
+    Для категориального описания регулярное выражение проверяется один раз на уникальное значение.
+    """
+    descriptions = df["description"] if "description" in df else pd.Series("", index=df.index)
+    if isinstance(descriptions.dtype, pd.CategoricalDtype):
+        matched = descriptions.cat.categories.astype(str).str.contains(PHONE_RE, regex=True)
+        codes = descriptions.cat.codes.to_numpy()
+        return pd.Series(np.append(matched, False)[codes], index=df.index)
+    return descriptions.fillna("").astype(str).str.contains(PHONE_RE, regex=True)
+
+
+def find_phone_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Операции, в описании которых указан номер телефона."""
+    return df[phone_mask(df)]
+
+
+def find_phone_store(store: OperationsStore) -> pd.DataFrame:
+    """Операции хранилища с номером телефона в описании — по поисковому индексу, без регулярных выражений."""
+    return store.frame.loc[get_search_index(store).by_phone()]
+
+
+def find_phone_batch(batch: TransactionBatch) -> TransactionBatch:
+    """Операции компактного набора с номером телефона в описании; выражение проверяется раз на описание."""
+    descriptions = batch.labels["description"]
+    matched = np.append(descriptions.astype(str).str.contains(PHONE_RE, regex=True), False)
+    return batch[matched[batch.codes["description"]]]
+
+
+def find_phone_list(transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Транзакции списка с номером телефона в 'Описание' — исходные словари в исходном порядке."""
+    if not transactions:
+        return []
+    positions = np.flatnonzero(phone_mask(transactions_to_frame(transactions)).to_numpy())
+    return [transactions[position] for position in positions]
+
+
+@cached_response("transactions")
+def find_phone_transactions(transactions: Transactions) -> str:
     """
     Возвращает JSON со всеми транзакциями, в которых в поле 'Описание' указан номер телефона.
     """
-    pattern = re.compile(r"\+7[\s\-]?\d{3}[\s\-]?\d{2,3}[\s\-]?\d{2}[\s\-]?\d{2}")
     logging.info("Начат поиск транзакций с номерами телефонов")
 
-    result = [transaction for transaction in transactions if pattern.search(str(transaction.get("Описание", "")))]
+    result: List[Dict[str, Any]]
+    if isinstance(transactions, TransactionBatch):
+        result = find_phone_batch(transactions).to_transactions()
+    else:
+        result = find_phone_list(transactions)
 
-    logging.info(f"Найдено {len(result)} транзакций с номерами телефонов")
-    return json.dumps(result, ensure_ascii=False, indent=2)
+    logging.info("Найдено %s транзакций с номерами телефонов", len(result))
+    return _dumps(result, "find_phone_transactions", indent=2)
 
 
-logging.basicConfig(level=logging.INFO)
+def cashback_categories_frame(df: pd.DataFrame, year: int, month: int) -> Dict[str, float]:
+    """
+    Расходы по категориям за месяц по DataFrame, отсортированному по дате (как в хранилище).
+
+    Суммы в рублях на дату операции, если в DataFrame есть amount_rub.
+    """
+    period = date_slice(df, *month_bounds(f"{year}-{month:02}"))
+    metrics.rows_scanned(len(period), "cashback_categories")
+    expenses = period[period["amount"] < 0]
+    categories = expenses["category"] if "category" in expenses else pd.Series(np.nan, index=expenses.index)
+    categories = categories.astype(object).fillna(NO_CATEGORY)
+    totals = (-expenses[rub_column(expenses)]).groupby(categories.to_numpy(), sort=False).sum()
+    return totals.to_dict()
 
 
-def analyze_cashback_categories(data: List[Dict[str, Any]], year: int, month: int) -> str:
+def cashback_categories_batch(batch: TransactionBatch, year: int, month: int) -> Dict[str, float]:
+    """
+    Расходы по категориям за месяц по компактному набору операций.
+
+    Суммы копятся в копейках по кодам категорий; категории идут в порядке первой траты,
+    как в cashback_categories_frame.
+    """
+    positions = np.flatnonzero(batch.month_mask(f"{year}-{month:02}"))
+    metrics.rows_scanned(len(positions), "cashback_categories")
+    positions = positions[batch.amount[positions] < 0]
+    positions = positions[np.argsort(batch.moments()[positions], kind="stable")]
+
+    labels = batch.labels["category"]
+    codes = batch.codes["category"][positions].astype(np.int64) + 1
+    totals = np.bincount(codes, weights=-batch.amount[positions], minlength=len(labels) + 1)
+    seen, first = np.unique(codes, return_index=True)
+    names = [NO_CATEGORY, *labels.astype(str)]
+    return {names[code]: int(totals[code]) / 100 for code in seen[np.argsort(first)]}
+
+
+def cashback_categories_list(data: List[Dict[str, Any]], year: int, month: int) -> Dict[str, Any]:
+    """
+    Расходы по категориям за месяц по списку словарей — один проход без перевода в DataFrame.
+
+    В отличие от двух других адаптеров списка, не сводится к cashback_categories_frame: для списка
+    ответ сохраняет прежний формат — категории в порядке появления в списке, а суммы в типе исходных
+    (целые остаются целыми), тогда как по DataFrame категории идут по дате, а суммы — float.
+    """
+    prefix = f"{year:04}-{month:02}"
+    totals: Dict[str, Any] = {}
+    for transaction in data:
+        date, amount = transaction.get("Дата операции"), transaction.get("Сумма операции") or 0
+        if amount < 0 and isinstance(date, str) and date.startswith(prefix):
+            category = transaction.get("Категория")
+            category = category if isinstance(category, str) else NO_CATEGORY
+            totals[category] = totals.get(category, 0) - amount
+    metrics.rows_scanned(len(data), "cashback_categories")
+    return totals
+
+
+@cached_response("data")
+def analyze_cashback_categories(data: Transactions, year: int, month: int) -> str:
     """
     Анализирует транзакции по категориям и возвращает JSON с суммой расходов по каждой категории
     для заданного месяца и года.
     """
-    logging.info(f"Старт анализа кешбэка за {year}-{month:02}")
+    logging.info("Старт анализа кешбэка за %s-%02d", year, month)
 
-    filtered = filter(
-        lambda transaction: isinstance(transaction.get("Дата операции"), str)
-        and datetime.strptime(transaction["Дата операции"], "%Y-%m-%d").year == year
-        and datetime.strptime(transaction["Дата операции"], "%Y-%m-%d").month == month,
-        data,
-    )
+    if isinstance(data, TransactionBatch):
+        cashback_by_category = cashback_categories_batch(data, year, month)
+    else:
+        cashback_by_category = cashback_categories_list(data, year, month)
 
-    cashback_by_category: Dict[str, float] = {}
+    logging.info("Кешбэк по категориям: %s", cashback_by_category)
 
-    for tx in filtered:
-        amount = tx.get("Сумма операции", 0)
-        category = tx.get("Категория", "Без категории")
+    return _dumps(cashback_by_category, "analyze_cashback_categories")
 
-        if amount < 0:  # Учитываем только расходы
-            cashback_by_category[category] = cashback_by_category.get(category, 0) + abs(amount)
 
-    logging.info(f"Кешбэк по категориям: {cashback_by_category}")
+@cached_response("store")
+def rank_cashback_categories(store: OperationsStore, year: int, month: int) -> str:
+    """
+    Возвращает JSON с расходами по категориям за месяц, упорядоченными по убыванию суммы.
 
-    return json.dumps(cashback_by_category, ensure_ascii=False)
+    Считается по предрассчитанным агрегатам хранилища, без прохода по операциям.
+    """
+    logging.info("Рейтинг категорий кешбэка за %s-%02d по агрегатам", year, month)
+    totals = get_cube(store).month_totals("category", f"{year}-{month:02}-01")
+    ranking = totals.sort_values(ascending=False, kind="stable").round(2)
+    return _dumps(ranking.to_dict(), "rank_cashback_categories")
 
 
 if __name__ == "__main__":
-    example_transactions = [
-        {"Дата операции": "2024-06-01", "Сумма операции": -1712},
-        {"Дата операции": "2024-06-02", "Сумма операции": -349},
-        {"Дата операции": "2024-06-03", "Сумма операции": -489},
-        {"Дата операции": "2024-07-01", "Сумма операции": -2100},
-        {"Дата операции": "2024-06-15", "Сумма операции": 500},
-    ]
-    print(investment_bank_json("2024-06", example_transactions, 50))
\ No newline at end of file
+    from src.config import setup_logging
+    from src.store import load_operations, to_transactions
+
+    setup_logging()
+    operations = load_operations(get_config().data_path)
+    print(investment_bank_json("2021-12", to_transactions(operations), 50))
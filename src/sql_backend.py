@@ -0,0 +1,305 @@
+"""
+Встроенная база SQLite с операциями для индексированных и произвольных запросов.
+
+Операции хранилища (src/store.py) импортируются в таблицу operations с индексами по дате, карте,
+категории и MCC. Выборки главной страницы (операции с начала месяца, блок карт, топ транзакций),
+расходы по категориям за месяц и средние траты по дням недели/часам считаются SQL-запросами
+по этим индексам и совпадают с расчётом на pandas. Произвольные запросы выполняются только на чтение.
+
+База хранится рядом с выгрузкой (<имя>.cache.sqlite) и импортируется заново, только когда меняется
+версия операций (файл, его сигнатура, дозагрузки, таблица курсов).
+"""
+
+import argparse
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src import metrics
+from src.cache import dataset_version
+from src.config import DEFAULT_CASHBACK_RATE, configure, get_config, setup_logging
+from src.reports import WEEKDAY_TYPES, WEEKDAYS, report_window
+from src.services import NO_CATEGORY
+from src.store import CATEGORY_COLUMNS, DateLike, OperationsStore, load_store, month_bounds, month_start
+from src.views import card_stats_from_totals, get_top_transactions
+
+TABLE = "operations"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+INDEXES = {
+    "idx_operations_date": ("date",),
+    "idx_operations_card": ("card", "date"),
+    "idx_operations_category": ("category", "date"),
+    "idx_operations_mcc": ("mcc", "date"),
+}
+IMPORT_CHUNK = 10_000
+QUERY_LIMIT = 1000
+QUERY_TIMEOUT = 5.0
+# день недели SQLite (%w: 0 — воскресенье) в нумерацию pandas (0 — понедельник)
+WEEKDAY_SQL = "(CAST(strftime('%w', date) AS INTEGER) + 6) % 7"
+HOUR_SQL = "CAST(strftime('%H', date) AS INTEGER)"
+# действия, разрешённые произвольному запросу: чтение таблиц и вызов функций
+READ_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+
+
+def _sql_type(values: pd.Series) -> str:
+    if pd.api.types.is_float_dtype(values):
+        return "REAL"
+    if pd.api.types.is_integer_dtype(values):
+        return "INTEGER"
+    return "TEXT"
+
+
+def _timestamp(value: DateLike) -> str:
+    return pd.Timestamp(value).strftime(DATE_FORMAT)
+
+
+def _rows(frame: pd.DataFrame) -> Iterator[tuple]:
+    """Строки DataFrame хранилища как кортежи для executemany: даты — текст DATE_FORMAT, пропуски — NULL."""
+    columns = {}
+    for column in frame.columns:
+        values = frame[column]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            values = values.dt.strftime(DATE_FORMAT)
+        columns[column] = values.astype(object).where(values.notna(), None)
+    return zip(range(len(frame)), *(columns[column] for column in frame.columns))
+
+
+class OperationsDatabase:
+    """
+    Таблица операций в SQLite с индексами по дате, карте, категории и MCC.
+
+    Колонка row — позиция операции в хранилище (упорядоченном по дате): по ней порядок строк
+    при равных ключах совпадает с устойчивой сортировкой pandas. Соединение общее для потоков
+    и защищено блокировкой.
+    """
+
+    def __init__(self, path: str | Path = ":memory:"):
+        self.path = str(path)
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._columns = {row[1] for row in self._connection.execute(f"PRAGMA table_info({TABLE})")}
+
+    def close(self) -> None:
+        self._connection.close()
+
+    @property
+    def version(self) -> Optional[str]:
+        """Версия импортированных операций (JSON от dataset_version хранилища) или None для пустой базы."""
+        row = self._connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return row[0] if row else None
+
+    def _rub(self, column: str) -> str:
+        """Колонка суммы в рублях (<column>_rub), если она есть в таблице, иначе сама column (как store.rub_column)."""
+        converted = f"{column}_rub"
+        return converted if converted in self._columns else column
+
+    def import_frame(self, frame: pd.DataFrame, version: Optional[str] = None) -> None:
+        """Заменяет таблицу операций содержимым DataFrame хранилища и строит индексы."""
+        columns = ", ".join(f'"{column}" {_sql_type(frame[column])}' for column in frame.columns)
+        placeholders = ", ".join("?" * (len(frame.columns) + 1))
+        rows = _rows(frame)
+        with self._lock, metrics.span("sql_import"), self._connection:
+            self._connection.execute(f"DROP TABLE IF EXISTS {TABLE}")
+            self._connection.execute(f"CREATE TABLE {TABLE} (row INTEGER PRIMARY KEY, {columns})")
+            while chunk := [row for _, row in zip(range(IMPORT_CHUNK), rows)]:
+                self._connection.executemany(f"INSERT INTO {TABLE} VALUES ({placeholders})", chunk)
+            for name, keys in INDEXES.items():
+                if set(keys) <= set(frame.columns):
+                    self._connection.execute(f"CREATE INDEX {name} ON {TABLE} ({', '.join(keys)})")
+            self._connection.execute("ANALYZE")
+            self._connection.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (version,))
+            self._columns = {"row", *frame.columns}
+        metrics.rows_scanned(len(frame), "sql_import")
+        logging.info("В SQLite импортировано операций: %s (%s)", len(frame), self.path)
+
+    def execute(self, sql: str, params: Sequence[Any] = ()) -> List[tuple]:
+        with self._lock, metrics.span("sql_query"):
+            return self._connection.execute(sql, params).fetchall()
+
+    def _frame(self, sql: str, params: Sequence[Any] = ()) -> pd.DataFrame:
+        """Результат запроса к operations в типах хранилища: даты — datetime64, текстовые колонки — category."""
+        with self._lock, metrics.span("sql_query"):
+            cursor = self._connection.execute(sql, params)
+            names = [description[0] for description in cursor.description]
+            frame = pd.DataFrame.from_records(cursor.fetchall(), columns=names)
+        for column in names:
+            if column in ("date", "payment_date"):
+                frame[column] = pd.to_datetime(frame[column], format=DATE_FORMAT)
+            elif column in CATEGORY_COLUMNS:
+                frame[column] = frame[column].astype("category")
+            elif column != "row":
+                frame[column] = frame[column].astype(np.float64)
+        return frame.set_index("row").rename_axis(None)
+
+    def between(self, start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> pd.DataFrame:
+        """Операции в отрезке [start, end] по индексу даты; без границ — все операции с датой."""
+        return self._frame(
+            f"SELECT * FROM {TABLE} WHERE date >= ? AND date <= ? ORDER BY row",
+            (_timestamp(start) if start is not None else "", _timestamp(end) if end is not None else "9999"),
+        )
+
+    def month_to_date(self, date: DateLike) -> pd.DataFrame:
+        """Операции с начала месяца по указанный момент включительно (как OperationsStore.month_to_date)."""
+        return self.between(month_start(date), date)
+
+    def card_stats(self, date: DateLike, cashback_rate: float = DEFAULT_CASHBACK_RATE) -> list[dict]:
+        """Блок карт главной страницы: расходы в рублях по картам с начала месяца по дату и кешбэк."""
+        rows = self.execute(
+            f"SELECT card, SUM(-{self._rub('amount')}) FROM {TABLE}"
+            " WHERE date >= ? AND date <= ? AND amount < 0 AND card IS NOT NULL GROUP BY card ORDER BY card",
+            (_timestamp(month_start(date)), _timestamp(date)),
+        )
+        return card_stats_from_totals(pd.Series(dict(rows), dtype=np.float64), cashback_rate)
+
+    def top_transactions(self, date: DateLike, limit: int = 5) -> list[dict]:
+        """Топ операций с начала месяца по дату по модулю платежа в рублях; равные — в порядке хранилища."""
+        payment = self._rub("payment_amount")
+        top = self._frame(
+            f"SELECT * FROM {TABLE} WHERE date >= ? AND date <= ?"
+            f" ORDER BY {payment} IS NULL, ABS({payment}) DESC, row LIMIT ?",
+            (_timestamp(month_start(date)), _timestamp(date), limit),
+        )
+        return get_top_transactions(top)
+
+    def category_totals(self, year: int, month: int) -> Dict[str, float]:
+        """Расходы в рублях по категориям за месяц в порядке первой траты (как cashback_categories_frame)."""
+        start, end = month_bounds(f"{year}-{month:02}")
+        rows = self.execute(
+            f"SELECT COALESCE(category, ?), SUM(-{self._rub('amount')}), MIN(row) AS first FROM {TABLE}"
+            " WHERE date >= ? AND date <= ? AND amount < 0 GROUP BY 1 ORDER BY first",
+            (NO_CATEGORY, _timestamp(start), _timestamp(end)),
+        )
+        return {category: total for category, total, _ in rows}
+
+    def mean_spending(self, key: str, size: int, date: Optional[DateLike] = None) -> np.ndarray:
+        """Средняя трата по ключу key (SQL-выражение со значениями 0..size-1) за окно отчёта src/reports.py."""
+        start, end = report_window(date)
+        rows = self.execute(
+            f"SELECT {key}, AVG(-amount) FROM {TABLE} WHERE date >= ? AND date <= ? AND amount < 0 GROUP BY 1",
+            (_timestamp(start), _timestamp(end)),
+        )
+        means = np.zeros(size)
+        for position, mean in rows:
+            means[position] = mean
+        return means
+
+    def spending_by_weekday(self, date: Optional[DateLike] = None) -> Dict[str, float]:
+        return _rounded(WEEKDAYS, self.mean_spending(WEEKDAY_SQL, 7, date))
+
+    def spending_by_weekday_type(self, date: Optional[DateLike] = None) -> Dict[str, float]:
+        return _rounded(WEEKDAY_TYPES, self.mean_spending(f"{WEEKDAY_SQL} >= 5", 2, date))
+
+    def spending_by_hour(self, date: Optional[DateLike] = None) -> Dict[str, float]:
+        return _rounded([str(hour) for hour in range(24)], self.mean_spending(HOUR_SQL, 24, date))
+
+    def query(
+        self, sql: str, params: Sequence[Any] = (), limit: int = QUERY_LIMIT, timeout: float = QUERY_TIMEOUT
+    ) -> Dict[str, Any]:
+        """
+        Произвольный запрос только на чтение: {"columns": [...], "rows": [[...]], "truncated": bool}.
+
+        Разрешено одно выражение SELECT/WITH; запись, PRAGMA и ATTACH запрещает авторизатор SQLite.
+        Запрос дольше timeout секунд прерывается. Ошибки запроса — ValueError.
+        """
+        deadline = time.monotonic() + timeout
+
+        def authorize(action: int, *_: Any) -> int:
+            return sqlite3.SQLITE_OK if action in READ_ACTIONS else sqlite3.SQLITE_DENY
+
+        with self._lock, metrics.span("sql_adhoc"):
+            self._connection.set_authorizer(authorize)
+            self._connection.set_progress_handler(lambda: int(time.monotonic() > deadline), 10_000)
+            try:
+                cursor = self._connection.execute(sql, params)
+                rows = cursor.fetchmany(limit + 1)
+                columns = [description[0] for description in cursor.description or ()]
+            except (sqlite3.DatabaseError, sqlite3.ProgrammingError, sqlite3.Warning) as error:
+                raise ValueError(str(error)) from error
+            finally:
+                self._connection.set_authorizer(None)
+                self._connection.set_progress_handler(None, 0)
+        logging.info("Произвольный SQL-запрос вернул строк: %s", min(len(rows), limit))
+        return {"columns": columns, "rows": [list(row) for row in rows[:limit]], "truncated": len(rows) > limit}
+
+
+def _rounded(labels: Sequence[str], values: np.ndarray) -> Dict[str, float]:
+    return {label: round(float(value), 2) for label, value in zip(labels, values)}
+
+
+def database_path_for(filepath: str | Path) -> Path:
+    """Путь к базе SQLite рядом с выгрузкой: operations.csv -> operations.cache.sqlite."""
+    path = Path(filepath)
+    return path.with_name(f"{path.stem}.cache.sqlite")
+
+
+_databases: Dict[str, OperationsDatabase] = {}
+_databases_lock = threading.Lock()
+
+
+def get_database(store: OperationsStore, path: Optional[str | Path] = None) -> OperationsDatabase:
+    """
+    База SQLite для хранилища; операции импортируются заново, только если изменилась их версия.
+
+    По умолчанию база лежит рядом с источником хранилища, для хранилища без файла — в памяти.
+    """
+    if path is None:
+        path = database_path_for(store.source) if store.source is not None else ":memory:"
+    version = json.dumps(dataset_version(store), default=str)
+    with _databases_lock:
+        database = _databases.get(str(path))
+        if database is None:
+            database = OperationsDatabase(path)
+            _databases[str(path)] = database
+        hit = database.version == version and version != "null"
+        metrics.cache_lookup("sqlite", hit=hit)
+        if not hit:
+            database.import_frame(store.frame, version)
+        return database
+
+
+def load_database(filepath: Optional[str | Path] = None) -> OperationsDatabase:
+    """База SQLite для выгрузки filepath (по умолчанию data_path настроек)."""
+    return get_database(load_store(filepath or get_config().data_path))
+
+
+def close_databases() -> None:
+    """Закрывает соединения, открытые get_database()."""
+    with _databases_lock:
+        for database in _databases.values():
+            database.close()
+        _databases.clear()
+
+
+def filter_operations_by_date(date_str: str, filepath: Optional[str | Path] = None) -> pd.DataFrame:
+    """SQL-вариант views.filter_operations_by_date: операции с начала месяца по указанную дату."""
+    filtered_df = load_database(filepath).month_to_date(date_str)
+    logging.info("Найдено операций в периоде: %s", len(filtered_df))
+    return filtered_df
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Запросы к операциям через встроенную базу SQLite")
+    parser.add_argument("sql", nargs="?", help=f"запрос SELECT к таблице {TABLE}; без него — только импорт")
+    parser.add_argument("--data", help="файл выгрузки (по умолчанию DATA_PATH)")
+    parser.add_argument("--limit", type=int, default=QUERY_LIMIT, help="максимум строк в ответе")
+    args = parser.parse_args()
+    setup_logging(configure())
+
+    database = load_database(args.data)
+    if args.sql is None:
+        count = database.execute(f"SELECT COUNT(*) FROM {TABLE}")[0][0]
+        print(json.dumps({"database": database.path, "rows": count}, ensure_ascii=False))
+        return
+    print(json.dumps(database.query(args.sql, limit=args.limit), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
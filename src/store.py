@@ -0,0 +1,479 @@
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from src import metrics
+from src.fx import add_rub_amounts, get_fx_table
+
+CACHE_FORMAT_VERSION = 2
+# после стольких файлов дозагрузок бинарный кеш переписывается целиком
+CACHE_MAX_DELTAS = 16
+
+COLUMNS = {
+    "Дата операции": "date",
+    "Дата платежа": "payment_date",
+    "Номер карты": "card",
+    "Статус": "status",
+    "Сумма операции": "amount",
+    "Валюта операции": "currency",
+    "Сумма платежа": "payment_amount",
+    "Валюта платежа": "payment_currency",
+    "Кэшбэк": "cashback",
+    "Категория": "category",
+    "MCC": "mcc",
+    "Описание": "description",
+    "Бонусы (включая кэшбэк)": "bonuses",
+    "Округление на инвесткопилку": "investment_rounding",
+    "Сумма операции с округлением": "amount_rounded",
+}
+
+DATETIME_COLUMNS = ("date", "payment_date")
+FLOAT_COLUMNS = ("amount", "payment_amount", "cashback", "mcc", "bonuses", "investment_rounding", "amount_rounded")
+CATEGORY_COLUMNS = ("card", "status", "currency", "payment_currency", "category", "description")
+
+DATE_FORMATS = ("%d.%m.%Y %H:%M:%S", "%d.%m.%Y")
+XLSX_SUFFIXES = (".xlsx", ".xlsm")
+XLSX_CHUNK_ROWS = 50_000
+
+Signature = Tuple[int, int]
+DateLike = str | datetime | pd.Timestamp
+T = TypeVar("T")
+
+
+def _parse_dates(values: pd.Series) -> pd.Series:
+    """Разбирает даты выгрузки, сначала по точному формату, затем в свободном режиме (dayfirst)."""
+    for fmt in DATE_FORMATS:
+        try:
+            return pd.to_datetime(values, format=fmt)
+        except (ValueError, TypeError):
+            continue
+    return pd.to_datetime(values, dayfirst=True, format="mixed")
+
+
+def coerce_operations(raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    Приводит сырую выгрузку к типизированным колонкам хранилища.
+
+    Колонки переименовываются в английские имена из COLUMNS, даты становятся datetime64,
+    суммы — float64, карты/категории/статусы/валюты/описания — category.
+    Отсутствующие в выгрузке колонки просто пропускаются.
+    """
+    df = raw.rename(columns=COLUMNS)
+    for column in DATETIME_COLUMNS:
+        if column in df and not pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = _parse_dates(df[column])
+    for column in FLOAT_COLUMNS:
+        if column in df and df[column].dtype != np.float64:
+            if df[column].dtype == object:
+                # в XLSX в одной колонке бывают и числа, и строки с запятой
+                df[column] = df[column].astype(str).str.replace(",", ".", regex=False)
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype(np.float64)
+    for column in CATEGORY_COLUMNS:
+        if column in df and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype("category")
+    return sort_by_date(df)
+
+
+def sort_by_date(df: pd.DataFrame) -> pd.DataFrame:
+    """Сортирует операции по дате (устойчиво, пустые даты в конце) — на этом держится индекс по времени."""
+    if "date" not in df or df["date"].is_monotonic_increasing:
+        return df
+    return df.sort_values("date", kind="stable", na_position="last", ignore_index=True)
+
+
+def date_bounds(df: pd.DataFrame, start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> Tuple[int, int]:
+    """
+    Позиции [left, right) строк с датой в отрезке [start, end] для DataFrame, отсортированного по дате.
+
+    Использует бинарный поиск, поэтому стоит O(log n) независимо от длины истории.
+    """
+    dates = df["date"].to_numpy()
+    left = 0 if start is None else int(dates.searchsorted(np.datetime64(pd.Timestamp(start)), side="left"))
+    if end is None:
+        right = int(dates.searchsorted(np.datetime64("NaT"), side="left"))
+    else:
+        right = int(dates.searchsorted(np.datetime64(pd.Timestamp(end)), side="right"))
+    return left, max(left, right)
+
+
+def date_slice(df: pd.DataFrame, start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> pd.DataFrame:
+    """Операции с датой в отрезке [start, end] из DataFrame, отсортированного по дате (O(log n + k))."""
+    left, right = date_bounds(df, start, end)
+    return df.iloc[left:right]
+
+
+def month_start(date: DateLike) -> pd.Timestamp:
+    """Начало месяца для указанной даты."""
+    return pd.Timestamp(date).normalize().replace(day=1)
+
+
+def month_bounds(month: DateLike) -> Tuple[pd.Timestamp, pd.Timestamp]:
+    """Первый и последний момент календарного месяца ('YYYY-MM', дата или Timestamp)."""
+    start = month_start(month)
+    return start, start + pd.offsets.MonthBegin(1) - pd.Timedelta(1, "ns")
+
+
+def read_operations_csv(filepath: str | Path) -> pd.DataFrame:
+    """Читает CSV-выгрузку банка (запятая как десятичный разделитель) в типизированный DataFrame."""
+    logging.info("Чтение данных операций из: %s", filepath)
+    with metrics.span("csv_load"):
+        raw = pd.read_csv(filepath, sep=",", decimal=",", dtype={"MCC": "float64"})
+        frame = coerce_operations(raw)
+    metrics.rows_scanned(len(frame), "csv_load")
+    return frame
+
+
+def concat_operations(frames: Sequence[pd.DataFrame], ignore_index: bool = False) -> pd.DataFrame:
+    """Склеивает типизированные операции; категории объединяются (pd.concat превратил бы разные в object)."""
+    frame = pd.concat(frames, ignore_index=ignore_index)
+    if len(frames) > 1:
+        for column in CATEGORY_COLUMNS:
+            if all(column in part and isinstance(part[column].dtype, pd.CategoricalDtype) for part in frames):
+                categorical = union_categoricals([part[column] for part in frames])
+                frame[column] = pd.Series(categorical, index=frame.index)
+    return frame
+
+
+def iter_xlsx_chunks(filepath: str | Path, chunksize: int = XLSX_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Строки первого листа XLSX порциями по chunksize, с заголовком из первой строки.
+
+    Книга открывается openpyxl в режиме read_only: строки читаются потоком из XML листа, без построения
+    всех ячеек в памяти. Пустые строки пропускаются; для листа без данных возвращается одна пустая порция.
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [
+            str(name).strip() if name is not None else f"column_{index}" for index, name in enumerate(next(rows, ()))
+        ]
+        chunk: List[tuple] = []
+        emitted = False
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            chunk.append(row[: len(header)])
+            if len(chunk) >= chunksize:
+                yield pd.DataFrame.from_records(chunk, columns=header)
+                chunk, emitted = [], True
+        if chunk or not emitted:
+            yield pd.DataFrame.from_records(chunk, columns=header)
+    finally:
+        workbook.close()
+
+
+def read_operations_xlsx(filepath: str | Path, chunksize: int = XLSX_CHUNK_ROWS) -> pd.DataFrame:
+    """
+    Читает XLSX-выгрузку банка в типизированный DataFrame.
+
+    Каждая порция iter_xlsx_chunks сразу приводится к колонкам хранилища (даты-ячейки Excel и строки
+    'ДД.ММ.ГГГГ', числа и суммы с запятой, категории), поэтому в памяти не копятся сырые строки всего листа.
+    """
+    logging.info("Чтение данных операций из XLSX: %s", filepath)
+    with metrics.span("xlsx_load"):
+        chunks = [coerce_operations(raw) for raw in iter_xlsx_chunks(filepath, chunksize)]
+        frame = sort_by_date(concat_operations(chunks, ignore_index=True))
+    metrics.rows_scanned(len(frame), "xlsx_load")
+    return frame
+
+
+def read_operations(filepath: str | Path) -> pd.DataFrame:
+    """Читает выгрузку в типизированный DataFrame: XLSX по расширению файла, иначе CSV."""
+    if Path(filepath).suffix.lower() in XLSX_SUFFIXES:
+        return read_operations_xlsx(filepath)
+    return read_operations_csv(filepath)
+
+
+def cache_path_for(filepath: str | Path) -> Path:
+    """
+    Путь бинарного кеша рядом с исходным файлом: operations.csv -> operations.cache.npz,
+    operations.xlsx -> operations.xlsx.cache.npz (чтобы кеши CSV и XLSX с одним именем не пересекались).
+    """
+    path = Path(filepath)
+    name = path.stem if path.suffix.lower() == ".csv" else path.name
+    return path.with_name(f"{name}.cache.npz")
+
+
+def file_signature(filepath: str | Path) -> Signature:
+    """Сигнатура файла для инвалидации кеша: (mtime в наносекундах, размер)."""
+    stat = os.stat(filepath)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def cache_delta_path(cache_path: str | Path, number: int) -> Path:
+    """Файл дозагрузки к бинарному кешу: operations.cache.npz -> operations.cache.delta<number>.npz."""
+    path = Path(cache_path)
+    return path.with_name(f"{path.stem}.delta{number}.npz")
+
+
+def _cache_deltas(cache_path: str | Path) -> List[Path]:
+    """Файлы дозагрузок кеша по возрастанию номера."""
+    path = Path(cache_path)
+    numbered = []
+    for delta in path.parent.glob(f"{path.stem}.delta*.npz"):
+        number = delta.name[len(path.stem) + len(".delta") : -len(".npz")]
+        if number.isdigit():
+            numbered.append((int(number), delta))
+    return [delta for _, delta in sorted(numbered)]
+
+
+def _write_npz(df: pd.DataFrame, path: Path, header: Dict[str, np.ndarray]) -> None:
+    arrays: Dict[str, np.ndarray] = {
+        "__version__": np.array(CACHE_FORMAT_VERSION),
+        "__columns__": np.array(list(df.columns), dtype=str),
+        **header,
+    }
+    for column in df.columns:
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            arrays[f"codes:{column}"] = series.cat.codes.to_numpy()
+            arrays[f"categories:{column}"] = np.asarray(series.cat.categories.astype(str), dtype=str)
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            arrays[f"datetime:{column}"] = series.to_numpy(dtype="datetime64[ns]").view(np.int64)
+        else:
+            arrays[f"values:{column}"] = series.to_numpy()
+    tmp_path = path.with_suffix(".tmp.npz")
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+def _read_npz(data: Any) -> pd.DataFrame:
+    columns: Dict[str, Any] = {}
+    for column in data["__columns__"].tolist():
+        if f"codes:{column}" in data:
+            columns[column] = pd.Categorical.from_codes(
+                data[f"codes:{column}"], categories=data[f"categories:{column}"].astype(object)
+            )
+        elif f"datetime:{column}" in data:
+            columns[column] = data[f"datetime:{column}"].view("datetime64[ns]")
+        else:
+            columns[column] = data[f"values:{column}"]
+    return pd.DataFrame(columns)
+
+
+def _signature_of(data: Any, key: str) -> Signature:
+    return tuple(int(value) for value in data[key])  # type: ignore[return-value]
+
+
+def save_cache(df: pd.DataFrame, cache_path: str | Path, signature: Signature) -> None:
+    """
+    Сохраняет типизированный DataFrame в .npz (без pickle) вместе с сигнатурой исходника.
+
+    Файлы дозагрузок прежнего кеша удаляются: полный кеш их заменяет.
+    """
+    _write_npz(df, Path(cache_path), {"__signature__": np.array(signature, dtype=np.int64)})
+    for delta in _cache_deltas(cache_path):
+        delta.unlink(missing_ok=True)
+    logging.info("Бинарный кеш операций сохранён: %s", cache_path)
+
+
+def append_cache(
+    df: pd.DataFrame,
+    rows: pd.DataFrame,
+    cache_path: str | Path,
+    previous: Optional[Signature],
+    signature: Signature,
+) -> None:
+    """
+    Дописывает к бинарному кешу новые строки rows отдельным файлом дозагрузки.
+
+    Файл хранит сигнатуры исходника до и после дозагрузки, поэтому стоимость обновления кеша зависит
+    от числа новых строк, а не от всей истории. После CACHE_MAX_DELTAS дозагрузок кеш переписывается
+    целиком из df (всех операций).
+    """
+    deltas = _cache_deltas(cache_path)
+    if previous is None or len(deltas) >= CACHE_MAX_DELTAS:
+        save_cache(df, cache_path, signature)
+        return
+    header = {
+        "__previous__": np.array(previous, dtype=np.int64),
+        "__signature__": np.array(signature, dtype=np.int64),
+    }
+    path = cache_delta_path(cache_path, len(deltas) + 1)
+    _write_npz(rows, path, header)
+    logging.info("Дозагрузка бинарного кеша сохранена: %s (%s строк)", path, len(rows))
+
+
+def load_cache(cache_path: str | Path, signature: Signature) -> Optional[pd.DataFrame]:
+    """
+    Загружает DataFrame из .npz-кеша, если он создан той же версией формата из того же файла.
+
+    Файлы дозагрузок применяются по цепочке сигнатур: каждый продолжает версию исходника, на которой
+    остановился предыдущий, и последний должен совпасть с signature.
+    """
+    try:
+        with np.load(cache_path, allow_pickle=False) as data:
+            if int(data["__version__"]) != CACHE_FORMAT_VERSION:
+                return None
+            current = _signature_of(data, "__signature__")
+            if current == signature:
+                return _read_npz(data)
+            deltas = _cache_deltas(cache_path)
+            if not deltas:
+                return None
+            frames = [_read_npz(data)]
+        for delta in deltas:
+            if current == signature:
+                break
+            with np.load(delta, allow_pickle=False) as data:
+                if int(data["__version__"]) != CACHE_FORMAT_VERSION or _signature_of(data, "__previous__") != current:
+                    return None
+                frames.append(_read_npz(data))
+                current = _signature_of(data, "__signature__")
+    except (OSError, KeyError, ValueError):
+        return None
+    if current != signature:
+        return None
+    return sort_by_date(concat_operations(frames, ignore_index=True))
+
+
+class OperationsStore:
+    """Загруженные один раз и типизированные операции пользователя."""
+
+    def __init__(self, frame: pd.DataFrame, source: Optional[Path] = None, signature: Optional[Signature] = None):
+        self.frame = frame
+        self.source = source
+        self.signature = signature
+        # номер дозагрузки: вместе с source и signature задаёт версию данных для кеша ответов
+        self.revision = 0
+        # версия таблицы курсов, по которой посчитаны колонки *_rub
+        self.fx_version: Optional[str] = None
+        self._derived: Dict[str, Any] = {}
+        self._derived_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def between(self, start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> pd.DataFrame:
+        """Операции в отрезке [start, end]; границу можно не указывать."""
+        return date_slice(self.frame, start, end)
+
+    def month_to_date(self, date: DateLike) -> pd.DataFrame:
+        """Операции с начала месяца по указанный момент включительно."""
+        return date_slice(self.frame, month_start(date), date)
+
+    def last_n_days(self, date: DateLike, days: int) -> pd.DataFrame:
+        """Операции за последние days дней, заканчивая указанным моментом."""
+        end = pd.Timestamp(date)
+        return date_slice(self.frame, end - timedelta(days=days), end)
+
+    def derived(self, name: str, builder: Callable[[pd.DataFrame], T]) -> T:
+        """
+        Производная структура (агрегаты, индексы), построенная по операциям один раз на хранилище.
+
+        builder вызывается при первом обращении; дальше возвращается уже построенный объект.
+        """
+        with self._derived_lock:
+            if name not in self._derived:
+                self._derived[name] = builder(self.frame)
+            return self._derived[name]  # type: ignore[no-any-return]
+
+    def append(self, rows: pd.DataFrame) -> pd.DataFrame:
+        """
+        Добавляет типизированные операции в хранилище и обновляет уже построенные производные структуры.
+
+        Новым строкам выдаются метки после последней существующей, старые метки не меняются — на них
+        ссылаются агрегаты. Производные объекты с методом append() получают только новые строки.
+        Возвращает добавленные строки с присвоенными метками.
+        """
+        if rows.empty:
+            return rows
+        start = int(self.frame.index.max()) + 1 if len(self.frame) else 0
+        rows = rows.set_axis(pd.RangeIndex(start, start + len(rows)))
+        frame = concat_operations([self.frame, rows])
+        existing, added = self.frame["date"], rows["date"]
+        # пустые даты держатся в конце, поэтому сравнивать нужно с последней непустой датой
+        if existing.hasnans or added.hasnans or not added.is_monotonic_increasing or added.min() < existing.max():
+            frame = frame.sort_values("date", kind="stable", na_position="last")
+
+        with self._derived_lock:
+            self.frame = frame
+            self.revision += 1
+            for structure in self._derived.values():
+                if hasattr(structure, "append"):
+                    structure.append(rows)
+        logging.info("В хранилище добавлено операций: %s", len(rows))
+        return rows
+
+
+_stores: Dict[Path, OperationsStore] = {}
+_stores_lock = threading.Lock()
+
+
+def load_store(filepath: str | Path, use_cache: bool = True) -> OperationsStore:
+    """
+    Возвращает хранилище операций для файла выгрузки.
+
+    В пределах процесса хранилище держится в памяти и переиспользуется, пока у файла не изменились
+    mtime/размер и таблица курсов. При первой загрузке сначала пробуется бинарный кеш рядом с файлом, и только
+    если он устарел — выгрузка (CSV или XLSX) разбирается заново, а кеш перезаписывается. Суммы в рублях
+    на дату операции (amount_rub, payment_amount_rub) досчитываются по таблице курсов src/fx.py после загрузки.
+    """
+    path = Path(filepath).resolve()
+    signature = file_signature(path)
+    fx_table = get_fx_table()
+
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is not None and store.signature == signature and store.fx_version == fx_table.version:
+            metrics.cache_lookup("store", hit=True)
+            return store
+        metrics.cache_lookup("store", hit=False)
+
+        frame = None
+        if use_cache:
+            with metrics.span("cache_load"):
+                frame = load_cache(cache_path_for(path), signature)
+            metrics.cache_lookup("operations_npz", hit=frame is not None)
+        if frame is None:
+            frame = read_operations(path)
+            if use_cache:
+                try:
+                    save_cache(frame, cache_path_for(path), signature)
+                except OSError:
+                    logging.warning("Не удалось сохранить кеш операций рядом с %s", path)
+        else:
+            logging.info("Операции загружены из бинарного кеша: %s", cache_path_for(path))
+
+        with metrics.span("fx_convert"):
+            frame = add_rub_amounts(frame, fx_table)
+        store = OperationsStore(frame, source=path, signature=signature)
+        store.fx_version = fx_table.version
+        _stores[path] = store
+        return store
+
+
+def rub_column(frame: pd.DataFrame, column: str = "amount") -> str:
+    """Колонка с суммой в рублях (<column>_rub), если она посчитана по курсам, иначе сама column."""
+    converted = f"{column}_rub"
+    return converted if converted in frame else column
+
+
+def load_operations(filepath: str | Path) -> pd.DataFrame:
+    """Типизированный DataFrame всех операций из файла. Возвращаемый объект общий — не изменяйте его."""
+    return load_store(filepath).frame
+
+
+def clear_stores() -> None:
+    """Сбрасывает хранилища, закешированные в памяти процесса."""
+    with _stores_lock:
+        _stores.clear()
+
+
+def to_transactions(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Список словарей в формате функций из src/services.py ('Дата операции' как 'YYYY-MM-DD')."""
+    columns = {"date": "Дата операции", "amount": "Сумма операции", "category": "Категория", "description": "Описание"}
+    present = [column for column in columns if column in df]
+    records = df[present].rename(columns=columns)
+    if "Дата операции" in records:
+        records["Дата операции"] = records["Дата операции"].dt.strftime("%Y-%m-%d")
+    return records.astype(object).where(records.notna(), None).to_dict(orient="records")
@@ -0,0 +1,148 @@
+import logging
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+from src.config import DEFAULT_CASHBACK_RATE
+from src.fx import add_rub_amounts, get_fx_table
+from src.reports import WEEKDAYS, report_window
+from src.store import DateLike, coerce_operations, date_slice, month_bounds, month_start, rub_column
+from src.views import card_stats_from_totals, get_cashback_rate
+
+DEFAULT_CHUNKSIZE = 100_000
+
+
+def iter_operation_chunks(filepath: str | Path, chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+    """
+    Читает выгрузку частями по chunksize строк и отдаёт их в типизированном виде хранилища.
+
+    Каждая часть отсортирована по дате, но части между собой не упорядочены. Суммы в рублях на дату
+    операции (amount_rub, payment_amount_rub) досчитываются по таблице курсов, как в load_store.
+    """
+    logging.info("Потоковое чтение операций из %s частями по %s строк", filepath, chunksize)
+    fx_table = get_fx_table()
+    with pd.read_csv(filepath, sep=",", decimal=",", dtype={"MCC": "float64"}, chunksize=chunksize) as reader:
+        for raw in reader:
+            yield add_rub_amounts(coerce_operations(raw), fx_table)
+
+
+class Reducer(ABC):
+    """Инкрементальная агрегация: update() вызывается на каждую часть выгрузки, result() — в конце."""
+
+    @abstractmethod
+    def update(self, chunk: pd.DataFrame) -> None:
+        """Добавляет часть выгрузки к накопленному состоянию."""
+
+    @abstractmethod
+    def result(self) -> Any:
+        """Итог агрегации по всем переданным частям."""
+
+
+def _add_totals(totals: Dict[Any, float], partial: pd.Series) -> None:
+    for key, value in partial.items():
+        totals[key] = totals.get(key, 0) + value
+
+
+class CardStatsReducer(Reducer):
+    """
+    Расходы в рублях по картам с начала месяца по указанную дату и кешбэк по ставке cashback_rate —
+    как get_card_stats(filter_operations_by_date(...), cashback_rate).
+    """
+
+    def __init__(self, date: DateLike, cashback_rate: float = DEFAULT_CASHBACK_RATE):
+        self.start, self.end = month_start(date), pd.Timestamp(date)
+        self.cashback_rate = cashback_rate
+        self.totals: Dict[str, float] = {}
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        period = date_slice(chunk, self.start, self.end)
+        expenses = period[period["amount"] < 0]
+        _add_totals(self.totals, (-expenses[rub_column(expenses)]).groupby(expenses["card"].to_numpy()).sum())
+
+    def result(self) -> List[dict]:
+        return card_stats_from_totals(pd.Series(self.totals, dtype="float64").sort_index(), self.cashback_rate)
+
+
+class CashbackReducer(Reducer):
+    """Расходы в рублях по категориям за месяц — как cashback_categories_frame."""
+
+    def __init__(self, year: int, month: int):
+        self.start, self.end = month_bounds(f"{year}-{month:02}")
+        self.totals: Dict[str, float] = {}
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        period = date_slice(chunk, self.start, self.end)
+        expenses = period[period["amount"] < 0]
+        categories = expenses["category"].astype(object).fillna("Без категории")
+        _add_totals(self.totals, (-expenses[rub_column(expenses)]).groupby(categories.to_numpy()).sum())
+
+    def result(self) -> Dict[str, float]:
+        return self.totals
+
+
+class InvestmentBankReducer(Reducer):
+    """Сумма в «Инвесткопилку» за месяц — как investment_bank_frame."""
+
+    def __init__(self, month: str, limit: int):
+        self.start, self.end = month_bounds(month)
+        self.limit = limit
+        self.total = 0.0
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        amounts = date_slice(chunk, self.start, self.end)["amount"].to_numpy(dtype=np.float64)
+        spent = -amounts[amounts < 0]
+        self.total += float((np.ceil(spent / self.limit) * self.limit - spent).sum())
+
+    def result(self) -> float:
+        return round(self.total, 2)
+
+
+class WeekdayReducer(Reducer):
+    """Средняя трата по дням недели за три месяца до даты — как spending_by_weekday."""
+
+    def __init__(self, date: DateLike):
+        self.start, self.end = report_window(date)
+        self.sums = np.zeros(7)
+        self.counts = np.zeros(7, dtype=np.int64)
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        period = date_slice(chunk, self.start, self.end)
+        expenses = period[period["amount"] < 0]
+        weekdays = expenses["date"].dt.dayofweek.to_numpy()
+        self.sums += np.bincount(weekdays, weights=-expenses["amount"].to_numpy(), minlength=7)
+        self.counts += np.bincount(weekdays, minlength=7)
+
+    def result(self) -> Dict[str, float]:
+        means = np.divide(self.sums, self.counts, out=np.zeros(7), where=self.counts > 0)
+        return {day: round(float(value), 2) for day, value in zip(WEEKDAYS, means)}
+
+
+def run_reducers(chunks: Iterable[pd.DataFrame], reducers: Dict[str, Reducer]) -> Dict[str, Any]:
+    """Прогоняет все редьюсеры за один проход по частям выгрузки; в памяти одновременно одна часть."""
+    rows = 0
+    for chunk in chunks:
+        rows += len(chunk)
+        for reducer in reducers.values():
+            reducer.update(chunk)
+    logging.info("Потоковая агрегация завершена, обработано строк: %s", rows)
+    return {name: reducer.result() for name, reducer in reducers.items()}
+
+
+def stream_reports(
+    filepath: str | Path, date: DateLike, limit: int = 50, chunksize: int = DEFAULT_CHUNKSIZE
+) -> Dict[str, Any]:
+    """
+    Статистика по картам, категории кешбэка, «Инвесткопилка» и траты по дням недели на дату
+    за один потоковый проход по выгрузке любого размера.
+    """
+    current = pd.Timestamp(date)
+    reducers: Dict[str, Reducer] = {
+        "cards": CardStatsReducer(current, get_cashback_rate()),
+        "cashback_categories": CashbackReducer(current.year, current.month),
+        "investment_bank": InvestmentBankReducer(current.strftime("%Y-%m"), limit),
+        "spending_by_weekday": WeekdayReducer(current),
+    }
+    return run_reducers(iter_operation_chunks(filepath, chunksize), reducers)
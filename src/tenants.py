@@ -0,0 +1,293 @@
+"""
+Операции многих пользователей в партициях пользователь/год/месяц и пакетные отчёты на конец месяца.
+
+Каталог партиции <tenants_path>/<пользователь>/<YYYY>/<MM>/ хранит по файлу .npy на колонку хранилища
+и meta.json с типами колонок и подписями категорий: даты — int64 (наносекунды), суммы — float64,
+текстовые колонки — коды int32. Файлы открываются через np.load(mmap_mode="r"), поэтому операции одного
+месяца процессы пакетного расчёта читают прямо из общих страниц файлового кеша ОС, без копий; в задачу воркера
+передаются только каталог, пользователь и месяц. Выборка за несколько месяцев склеивается и поэтому
+копируется в память процесса — отчёт на конец месяца делает такую выборку только для трат по дням недели.
+Настройки пользователя лежат в <tenants_path>/<пользователь>/user_settings.json.
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src import metrics
+from src.aggregates import ROUNDUP_LIMITS
+from src.cashback import load_program
+from src.config import configure, get_config, setup_logging
+from src.fx import add_rub_amounts, get_fx_table
+from src.ingest import new_rows_mask
+from src.reports import REPORT_MONTHS, spending_by_weekday
+from src.services import cashback_categories_frame, investment_bank_frame
+from src.store import (
+    OperationsStore,
+    concat_operations,
+    month_bounds,
+    month_start,
+    read_operations,
+    sort_by_date,
+)
+from src.views import get_card_stats
+
+META_FILE = "meta.json"
+SETTINGS_FILE = "user_settings.json"
+USER_RE = re.compile(r"^[\w-][\w.-]*$")
+BATCH_CHUNKSIZE = 16
+
+
+def _check_user(user: str) -> str:
+    if not USER_RE.match(user):
+        raise ValueError(f"Некорректное имя пользователя: {user!r}")
+    return user
+
+
+def _encode(values: pd.Series) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """Колонка хранилища -> массив для .npy и описание типа для meta.json."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.to_numpy(dtype="datetime64[ns]").view(np.int64), {"kind": "datetime"}
+    if pd.api.types.is_numeric_dtype(values) and not isinstance(values.dtype, pd.CategoricalDtype):
+        return values.to_numpy(dtype=np.float64), {"kind": "float"}
+    categorical = values.astype("category")
+    labels = [str(label) for label in categorical.cat.categories]
+    return categorical.cat.codes.to_numpy(dtype=np.int32), {"kind": "category", "labels": labels}
+
+
+def _decode(values: np.ndarray, spec: Dict[str, Any]) -> Any:
+    if spec["kind"] == "datetime":
+        return values.view("datetime64[ns]")
+    if spec["kind"] == "category":
+        return pd.Categorical.from_codes(values, categories=spec["labels"])
+    return values
+
+
+class TenantPartitions:
+    """Партиции операций пользователей в каталоге root: <пользователь>/<YYYY>/<MM>/<колонка>.npy."""
+
+    def __init__(self, root: Optional[str | Path] = None):
+        self.root = Path(root or get_config().tenants_path)
+
+    def users(self) -> List[str]:
+        """Пользователи, у которых есть хотя бы одна партиция."""
+        if not self.root.exists():
+            return []
+        return sorted(
+            path.name
+            for path in self.root.iterdir()
+            if path.is_dir() and USER_RE.match(path.name) and self.months(path.name)
+        )
+
+    def months(self, user: str) -> List[str]:
+        """Месяцы с операциями пользователя в виде 'YYYY-MM' по возрастанию."""
+        return sorted(
+            f"{path.parent.name}-{path.name}"
+            for path in (self.root / _check_user(user)).glob("[0-9][0-9][0-9][0-9]/[0-9][0-9]")
+            if (path / META_FILE).exists()
+        )
+
+    def partition_path(self, user: str, month: str) -> Path:
+        start = month_start(month)
+        return self.root / _check_user(user) / f"{start.year:04}" / f"{start.month:02}"
+
+    def write_month(self, user: str, month: str, frame: pd.DataFrame) -> Path:
+        """Атомарно заменяет партицию месяца операциями frame (колонки хранилища)."""
+        path = self.partition_path(user, month)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
+        columns = {}
+        for column in frame.columns:
+            values, columns[column] = _encode(frame[column])
+            np.save(tmp_path / f"{column}.npy", values)
+        meta = {"rows": len(frame), "columns": columns}
+        (tmp_path / META_FILE).write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        return path
+
+    def merge_month(self, user: str, month: str, rows: pd.DataFrame) -> int:
+        """
+        Дописывает в партицию месяца операции rows, которых в ней ещё нет, и возвращает их число.
+
+        Повторы отбрасываются так же, как при ежедневной дозагрузке (src/ingest.py): по хешу содержимого
+        с учётом кратности, поэтому повторная или частичная выгрузка (например, недельная) не теряет
+        и не удваивает операции месяца.
+        """
+        if not (self.partition_path(user, month) / META_FILE).exists():
+            self.write_month(user, month, rows.reset_index(drop=True))
+            return len(rows)
+        existing = self.load_month(user, month)
+        fresh = rows[new_rows_mask(existing, rows, existing["date"].max())]
+        if len(fresh):
+            merged = sort_by_date(concat_operations([existing, fresh], ignore_index=True))
+            self.write_month(user, month, merged)
+        return len(fresh)
+
+    def write_operations(self, user: str, frame: pd.DataFrame) -> List[str]:
+        """
+        Раскладывает операции пользователя по месяцам и дописывает в партиции затронутых месяцев новые.
+
+        Операции без даты в партиции не попадают. Возвращает месяцы, в которые добавились операции.
+        """
+        frame = sort_by_date(frame)
+        dated = frame[frame["date"].notna()]
+        if len(dated) < len(frame):
+            logging.warning("Пропущено операций без даты у пользователя %s: %s", user, len(frame) - len(dated))
+        written, added = [], 0
+        with metrics.span("tenant_write"):
+            for period, rows in dated.groupby(dated["date"].dt.to_period("M"), sort=True):
+                count = self.merge_month(user, str(period), rows)
+                if count:
+                    written.append(str(period))
+                    added += count
+        logging.info(
+            "Пользователь %s: обновлено партиций %s, новых операций %s из %s", user, len(written), added, len(dated)
+        )
+        return written
+
+    def import_export(self, user: str, filepath: str | Path, settings_path: Optional[str | Path] = None) -> List[str]:
+        """Загружает выгрузку пользователя (CSV или XLSX, суммы в рублях по таблице курсов) и его настройки."""
+        frame = add_rub_amounts(read_operations(filepath), get_fx_table())
+        months = self.write_operations(user, frame)
+        if settings_path is not None:
+            shutil.copyfile(settings_path, self.root / _check_user(user) / SETTINGS_FILE)
+        return months
+
+    def load_month(self, user: str, month: str) -> pd.DataFrame:
+        """Операции месяца из партиции; колонки — отображения файлов .npy только на чтение."""
+        path = self.partition_path(user, month)
+        meta = json.loads((path / META_FILE).read_text(encoding="utf-8"))
+        columns = {
+            column: _decode(np.load(path / f"{column}.npy", mmap_mode="r"), spec)
+            for column, spec in meta["columns"].items()
+        }
+        metrics.rows_scanned(meta["rows"], "tenant_partition")
+        return pd.DataFrame(columns, copy=False)
+
+    def load(self, user: str, start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+        """
+        Операции пользователя за месяцы [start, end] ('YYYY-MM', границы необязательны), отсортированные по дате.
+
+        Один месяц возвращается как есть, поверх отображений файлов; несколько месяцев склеиваются в память.
+        """
+        months = [
+            month for month in self.months(user) if (start is None or month >= start) and (end is None or month <= end)
+        ]
+        if not months:
+            return pd.DataFrame({"date": pd.Series(dtype="datetime64[ns]"), "amount": pd.Series(dtype=np.float64)})
+        frames = [self.load_month(user, month) for month in months]
+        return frames[0] if len(frames) == 1 else concat_operations(frames, ignore_index=True)
+
+    def store(self, user: str) -> OperationsStore:
+        """Хранилище со всеми операциями пользователя для функций src/services.py и src/views.py."""
+        return OperationsStore(self.load(user), source=self.root / _check_user(user))
+
+    def settings(self, user: str) -> Dict[str, Any]:
+        """Настройки пользователя; без файла — пустой словарь."""
+        path = self.root / _check_user(user) / SETTINGS_FILE
+        if not path.exists():
+            return {}
+        return json.loads(path.read_text(encoding="utf-8"))  # type: ignore[no-any-return]
+
+
+def month_end_report(partitions: TenantPartitions, user: str, month: str) -> Dict[str, Any]:
+    """
+    Отчёт пользователя на конец месяца: блок карт, расходы по категориям, траты по дням недели
+    за REPORT_MONTHS месяцев до конца месяца и «Инвесткопилка» по стандартным шагам округления.
+
+    Всё, кроме трат по дням недели, считается по партиции месяца без копирования.
+    """
+    start, end = month_bounds(month)
+    label = start.strftime("%Y-%m")
+    first = (start - pd.DateOffset(months=REPORT_MONTHS)).strftime("%Y-%m")
+    month_frame = partitions.load(user, label, label)
+    window = partitions.load(user, first, label)
+    program = load_program(partitions.settings(user))
+    return {
+        "user": user,
+        "month": label,
+        "operations": len(month_frame),
+        "cards": get_card_stats(month_frame, program.base_rate) if len(month_frame) else [],
+        "cashback_categories": cashback_categories_frame(month_frame, start.year, start.month),
+        "spending_by_weekday": json.loads(spending_by_weekday(window, end.strftime("%Y-%m-%d %H:%M:%S"))),
+        "investment_bank": {str(limit): investment_bank_frame(month_frame, label, limit) for limit in ROUNDUP_LIMITS},
+    }
+
+
+def _month_end_task(task: Tuple[str, str, str]) -> Dict[str, Any]:
+    """Задача воркера: ошибка одного пользователя попадает в его отчёт и не останавливает пакет."""
+    root, user, month = task
+    try:
+        return month_end_report(TenantPartitions(root), user, month)
+    except Exception as error:
+        logging.warning("Отчёт пользователя %s за %s не построен: %s", user, month, error)
+        return {"user": user, "month": month, "error": f"{type(error).__name__}: {error}"}
+
+
+def month_end_reports(
+    month: str,
+    users: Optional[Iterable[str]] = None,
+    root: Optional[str | Path] = None,
+    workers: Optional[int] = None,
+    chunksize: int = BATCH_CHUNKSIZE,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Отчёты на конец месяца для пользователей (по умолчанию — всех) на пуле процессов.
+
+    Отчёты возвращаются в порядке users по мере готовности. workers=1 считает в текущем процессе;
+    None — по числу процессоров.
+    """
+    partitions = TenantPartitions(root)
+    tasks = [(str(partitions.root), user, month) for user in (partitions.users() if users is None else users)]
+    logging.info("Отчёты на конец месяца %s: пользователей %s", month, len(tasks))
+    if workers == 1 or len(tasks) <= 1:
+        yield from map(_month_end_task, tasks)
+        return
+    with metrics.span("tenant_batch"), ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_month_end_task, tasks, chunksize=chunksize)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Партиции операций пользователей и отчёты на конец месяца")
+    commands = parser.add_subparsers(dest="command", required=True)
+    importer = commands.add_parser("import", help="загрузить выгрузку пользователя в партиции")
+    importer.add_argument("user")
+    importer.add_argument("export", help="выгрузка пользователя, CSV или XLSX")
+    importer.add_argument("--settings", help="user_settings.json пользователя")
+    batch = commands.add_parser("month-end", help="отчёты на конец месяца для всех пользователей")
+    batch.add_argument("month", help="месяц, YYYY-MM")
+    batch.add_argument("--users", help="пользователи через запятую (по умолчанию — все)")
+    batch.add_argument("--workers", type=int, help="число процессов (по умолчанию — по числу процессоров)")
+    batch.add_argument("--output", help="файл JSON Lines (по умолчанию — stdout)")
+    args = parser.parse_args()
+    setup_logging(configure())
+
+    partitions = TenantPartitions()
+    if args.command == "import":
+        months = partitions.import_export(args.user, args.export, args.settings)
+        print(json.dumps({"user": args.user, "months": months}, ensure_ascii=False))
+        return
+    users = [user.strip() for user in args.users.split(",") if user.strip()] if args.users else None
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for report in month_end_reports(args.month, users, partitions.root, args.workers):
+            output.write(json.dumps(report, ensure_ascii=False) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
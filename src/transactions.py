@@ -0,0 +1,178 @@
+import hashlib
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from src.store import COLUMNS, DateLike, month_bounds, to_transactions
+
+SECONDS_PER_DAY = 86_400
+NS_PER_SECOND = 1_000_000_000
+# день без даты (NaT в DataFrame)
+MISSING_DAY = np.iinfo(np.int32).min
+CODE_COLUMNS = ("category", "card", "description", "mcc")
+
+
+def transactions_to_frame(transactions: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Переводит список словарей с транзакциями в DataFrame с колонками хранилища (date, amount, ...).
+
+    'Дата операции' разбирается как ISO-дата ('YYYY-MM-DD'); нестроковые и некорректные даты становятся NaT.
+    Строки сохраняют исходные позиции в индексе.
+    """
+    df = pd.DataFrame(transactions).rename(columns=COLUMNS)
+    if "date" in df:
+        dates = df["date"].where(df["date"].map(lambda value: isinstance(value, str)))
+        df["date"] = pd.to_datetime(dates, format="ISO8601", errors="coerce")
+    else:
+        df["date"] = pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]")
+    if "amount" not in df:
+        df["amount"] = 0
+    df["amount"] = df["amount"].fillna(0)
+    return df
+
+
+def _codes(values: Optional[pd.Series], size: int) -> tuple[np.ndarray, pd.Index]:
+    """Коды и словарь значений колонки; для категориальной колонки берутся её собственные коды без копирования."""
+    if values is None:
+        return np.full(size, -1, dtype=np.int32), pd.Index([], dtype=object)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories
+    codes, uniques = pd.factorize(values.astype(object), use_na_sentinel=True)
+    return codes.astype(np.int32), pd.Index(uniques, dtype=object)
+
+
+class TransactionBatch:
+    """
+    Компактный колоночный набор операций.
+
+    Сумма хранится в копейках (int64), дата — номером дня от 1970-01-01 (int32) и секундой внутри дня (int32),
+    категория, карта, описание и MCC — кодами в общих словарях значений. Вместо сотен байт на словарь
+    с кириллическими ключами операция занимает несколько десятков байт. Принимается функциями
+    src/services.py и src/reports.py наравне со списком словарей и DataFrame.
+    """
+
+    __slots__ = ("day", "seconds", "amount", "codes", "labels")
+
+    def __init__(
+        self,
+        day: np.ndarray,
+        seconds: np.ndarray,
+        amount: np.ndarray,
+        codes: Dict[str, np.ndarray],
+        labels: Dict[str, pd.Index],
+    ):
+        self.day = day
+        self.seconds = seconds
+        self.amount = amount
+        self.codes = codes
+        self.labels = labels
+
+    def __len__(self) -> int:
+        return len(self.amount)
+
+    def __getitem__(self, selector: Union[slice, np.ndarray, Sequence[int]]) -> "TransactionBatch":
+        """Подмножество операций (срез, булева маска или позиции) с теми же словарями значений."""
+        return TransactionBatch(
+            self.day[selector],
+            self.seconds[selector],
+            self.amount[selector],
+            {column: codes[selector] for column, codes in self.codes.items()},
+            self.labels,
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """Память под массивы операций (словари значений общие и не учитываются)."""
+        arrays = [self.day, self.seconds, self.amount, *self.codes.values()]
+        return sum(array.nbytes for array in arrays)
+
+    def fingerprint(self) -> str:
+        """Хеш содержимого (массивы и словари значений) — версия набора для кеша ответов."""
+        digest = hashlib.blake2b(digest_size=16)
+        for array in (self.day, self.seconds, self.amount, *self.codes.values()):
+            digest.update(memoryview(array).cast("B"))
+        for column, labels in self.labels.items():
+            digest.update(f"{column}:{len(labels)}:".encode())
+            digest.update("\x00".join(map(str, labels)).encode())
+        return digest.hexdigest()
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "TransactionBatch":
+        """
+        Набор из DataFrame хранилища (date, amount, category, card, description, mcc).
+
+        Коды категориальных колонок и их словари переиспользуются без копирования; даты и суммы
+        переводятся в дни, секунды и копейки.
+        """
+        size = len(df)
+        if "date" in df:
+            dates = df["date"].to_numpy(dtype="datetime64[ns]")
+            missing = np.isnat(dates)
+            moments = dates.view(np.int64) // NS_PER_SECOND
+            day = np.where(missing, MISSING_DAY, moments // SECONDS_PER_DAY).astype(np.int32)
+            seconds = np.where(missing, 0, moments % SECONDS_PER_DAY).astype(np.int32)
+        else:
+            day, seconds = np.full(size, MISSING_DAY, dtype=np.int32), np.zeros(size, dtype=np.int32)
+        amounts = df["amount"].to_numpy(dtype=np.float64) if "amount" in df else np.zeros(size)
+        amount = np.round(np.nan_to_num(amounts) * 100).astype(np.int64)
+
+        codes, labels = {}, {}
+        for column in CODE_COLUMNS:
+            codes[column], labels[column] = _codes(df[column] if column in df else None, size)
+        return cls(day, seconds, amount, codes, labels)
+
+    @classmethod
+    def from_transactions(cls, transactions: List[Dict[str, Any]]) -> "TransactionBatch":
+        """Набор из списка словарей в формате src/services.py."""
+        return cls.from_frame(transactions_to_frame(transactions))
+
+    def datetimes(self) -> np.ndarray:
+        """Моменты операций как datetime64[ns]; операции без даты — NaT."""
+        moments = self.day.astype(np.int64) * SECONDS_PER_DAY + self.seconds
+        values = (moments * NS_PER_SECOND).view("datetime64[ns]")
+        return np.where(self.day == MISSING_DAY, np.datetime64("NaT", "ns"), values)
+
+    def amounts(self) -> np.ndarray:
+        """Суммы в рублях (float64)."""
+        return self.amount / 100
+
+    def to_frame(self, columns: Sequence[str] = ("date", "amount", *CODE_COLUMNS)) -> pd.DataFrame:
+        """DataFrame с колонками хранилища; категориальные колонки строятся поверх тех же кодов."""
+        data: Dict[str, Any] = {}
+        for column in columns:
+            if column == "date":
+                data[column] = self.datetimes()
+            elif column == "amount":
+                data[column] = self.amounts()
+            elif column == "mcc":
+                data[column] = self.mccs()
+            else:
+                data[column] = pd.Categorical.from_codes(self.codes[column], categories=self.labels[column])
+        return pd.DataFrame(data)
+
+    def mccs(self) -> np.ndarray:
+        """MCC как float64, как в хранилище; пустые и нечисловые значения — NaN."""
+        labels = pd.to_numeric(pd.Series(self.labels["mcc"], dtype=object), errors="coerce").to_numpy(np.float64)
+        # код -1 (пустое значение) попадает на добавленный в конец NaN
+        return np.append(labels, np.nan)[self.codes["mcc"]]
+
+    def to_transactions(self) -> List[Dict[str, Any]]:
+        """Список словарей в формате src/services.py ('Дата операции' как 'YYYY-MM-DD')."""
+        return to_transactions(self.to_frame(("date", "amount", "category", "description")))
+
+    def month_mask(self, month: DateLike) -> np.ndarray:
+        """Маска операций календарного месяца ('YYYY-MM', дата или Timestamp)."""
+        start, end = month_bounds(month)
+        ns_per_day = NS_PER_SECOND * SECONDS_PER_DAY
+        first, last = start.value // ns_per_day, end.value // ns_per_day
+        return (self.day >= first) & (self.day <= last)
+
+    def moments(self) -> np.ndarray:
+        """Секунды от 1970-01-01 (int64); у операций без даты — максимум int64, чтобы они сортировались в конец."""
+        moments = self.day.astype(np.int64) * SECONDS_PER_DAY + self.seconds
+        moments[self.day == MISSING_DAY] = np.iinfo(np.int64).max
+        return moments
+
+
+Transactions = Union[List[Dict[str, Any]], TransactionBatch]
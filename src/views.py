@@ -1,58 +1,76 @@
+"""
+Данные главной страницы.
+
+Модуль импортируется без побочных эффектов: pandas, requests и dateutil подгружаются при первом
+расчёте, настройки (пути, ключ API) берутся из src.config в момент вызова.
+"""
+
 import json
 import logging
 import math
-import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+from src import metrics
+from src.cache import MARKET_TTLS, cached_call, dataset_version
+from src.config import DEFAULT_CASHBACK_RATE, get_config
 
-import pandas as pd
-import requests
-from dateutil.parser import parse as parse_date
-from dotenv import load_dotenv
+if TYPE_CHECKING:
+    import pandas as pd
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    from src.market import MarketDataClient
 
-load_dotenv()
-DATA_PATH = Path(__file__).resolve().parent.parent / "data" / "operations.csv"
-SETTINGS_PATH = Path(__file__).resolve().parent.parent / "user_settings.json"
-API_KEY = os.getenv("API_KEY")
+_market_client: Optional["MarketDataClient"] = None
+_market_client_lock = threading.Lock()
+
+PAGE_DEADLINE = 10.0
+PAGE_WORKERS = 5
+# разделы с сетевыми запросами идут в отдельный пул: зависший API не занимает потоки расчётов по операциям
+NETWORK_SECTIONS = ("currency_rates", "stock_prices")
+NETWORK_WORKERS = 4
+_page_executors: dict[str, ThreadPoolExecutor] = {}
+_page_executor_lock = threading.Lock()
 
 
 def parse_date_(date_str: str) -> datetime:
-    logging.debug(f"Парсинг даты: {date_str}")
+    import pandas as pd
+
+    logging.debug("Парсинг даты: %s", date_str)
     return pd.to_datetime(date_str)
 
 
-def filter_operations_by_date(date_str: str, filepath: str = str(DATA_PATH)) -> pd.DataFrame:
-    """Возвращает операции из CSV-файла в период с начала месяца по указанную дату."""
+def parse_date(date_str: str) -> datetime:
+    from dateutil.parser import parse
+
+    return parse(date_str)
+
+
+def filter_operations_by_date(date_str: str, filepath: Optional[str | Path] = None) -> "pd.DataFrame":
+    """
+    Возвращает операции из хранилища (src/store.py) в период с начала месяца по указанную дату.
+
+    Операции берутся из filepath, по умолчанию — из data_path настроек.
+    """
+    from src.store import load_store
+
     current_date = parse_date(date_str)
-    start_date = current_date.replace(day=1)
-
-    logging.info(f"Чтение данных операций из: {filepath}")
-    df = pd.read_csv(filepath, sep=",", parse_dates=["Дата операции"], dayfirst=True)
-
-    df.rename(
-        columns={
-            "Дата операции": "date",
-            "Сумма операции": "amount",
-            "Сумма платежа": "payment_amount",
-            "Категория": "category",
-            "Описание": "description",
-            "Номер карты": "card",
-        },
-        inplace=True,
-    )
-
-    mask = (df["date"] >= start_date) & (df["date"] <= current_date)
-    filtered_df = df.loc[mask]
-    logging.info(f"Найдено операций в периоде: {len(filtered_df)}")
+
+    store = load_store(filepath or get_config().data_path)
+    with metrics.span("filter"):
+        filtered_df = store.month_to_date(current_date)
+    metrics.rows_scanned(len(filtered_df), "filter")
+    logging.info("Найдено операций в периоде: %s", len(filtered_df))
 
     return filtered_df
 
 
 def get_greeting(current_time: datetime) -> str:
     hour = current_time.hour
-    logging.debug(f"Определение приветствия по времени: {hour} ч.")
+    logging.debug("Определение приветствия по времени: %s ч.", hour)
 
     if 5 <= hour < 12:
         return "Доброе утро"
@@ -64,26 +82,46 @@ def get_greeting(current_time: datetime) -> str:
         return "Доброй ночи"
 
 
-def get_card_stats(df: pd.DataFrame) -> list[dict]:
-    card_stats = []
-    grouped = df[df["amount"] < 0].groupby("card")
+def card_stats_from_totals(totals: "pd.Series", cashback_rate: float = DEFAULT_CASHBACK_RATE) -> list[dict]:
+    """
+    Форматирует суммы расходов по картам (номер карты -> потрачено) в блок карт главной страницы.
 
-    for card, group in grouped:
-        total_spent = round(-group["amount"].sum(), 2)
-        cashback = math.floor(total_spent / 100)
+    Кешбэк — целые рубли от трат по ставке cashback_rate (по умолчанию 1%).
+    """
+    card_stats = []
+    for card, spent in totals.items():
+        total_spent = round(spent, 2)
+        cashback = math.floor(round(total_spent * cashback_rate, 6))
         card_stats.append({"last_digits": str(card)[-4:], "total_spent": total_spent, "cashback": cashback})
 
-    logging.info(f"Статистика по картам рассчитана для {len(card_stats)} карт")
+    logging.info("Статистика по картам рассчитана для %s карт", len(card_stats))
     return card_stats
 
 
-def get_top_transactions(df: pd.DataFrame) -> list[dict]:
-    top_df = df.sort_values(by="payment_amount", key=abs, ascending=False).head(5)
+def get_card_stats(df: "pd.DataFrame", cashback_rate: float = DEFAULT_CASHBACK_RATE) -> list[dict]:
+    """Блок карт по операциям: расходы в рублях на дату операции (amount_rub, если есть) и кешбэк."""
+    from src.store import rub_column
+
+    with metrics.span("group", stage="card_stats"):
+        expenses = df[df["amount"] < 0]
+        totals = (-expenses[rub_column(df)]).groupby(expenses["card"], observed=True).sum()
+    metrics.rows_scanned(len(df), "card_stats")
+    return card_stats_from_totals(totals, cashback_rate)
+
+
+def get_top_transactions(df: "pd.DataFrame") -> list[dict]:
+    """Топ-5 операций по модулю платежа в рублях (payment_amount_rub, если посчитан по курсам)."""
+    from src.store import rub_column
+
+    payment = rub_column(df, "payment_amount")
+    with metrics.span("group", stage="top_transactions"):
+        top_df = df.sort_values(by=payment, key=abs, ascending=False, kind="stable").head(5)
+    metrics.rows_scanned(len(df), "top_transactions")
     logging.info("Сформирован топ-5 транзакций")
     return [
         {
             "date": row["date"].strftime("%d.%m.%Y"),
-            "amount": round(row["payment_amount"], 2),
+            "amount": round(row[payment], 2),
             "category": row["category"],
             "description": row["description"],
         }
@@ -91,70 +129,144 @@ def get_top_transactions(df: pd.DataFrame) -> list[dict]:
     ]
 
 
-def get_stock_prices(api_key: str | None = None) -> list[dict]:
-    if api_key is None:
-        raise RuntimeError("API_KEY не задано в переменных окружения")
+def get_market_client() -> "MarketDataClient":
+    """Общий для процесса клиент рыночных данных с кешем в market_cache_path настроек."""
+    from src.market import MarketDataClient
 
-    logging.info("Получение цен акций через Alpha Vantage")
-    with open(SETTINGS_PATH, "r", encoding="utf-8") as f:
-        settings = json.load(f)
-
-    stocks = settings.get("user_stocks", [])
-    result = []
-
-    for symbol in stocks:
-        url = f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={symbol}&apikey={api_key}"
-        try:
-            response = requests.get(url)
-            data = response.json()
-            price = float(data["Global Quote"]["05. price"])
-            result.append({"stock": symbol, "price": round(price, 2)})
-        except (KeyError, ValueError):
-            logging.warning(f"Не удалось получить цену для акции: {symbol}")
-            result.append({"stock": symbol, "price": None})
+    global _market_client
+    with _market_client_lock:
+        if _market_client is None:
+            _market_client = MarketDataClient(cache_path=get_config().market_cache_path)
+        return _market_client
 
-    return result
 
+def load_settings() -> dict:
+    with open(get_config().settings_path, "r", encoding="utf-8") as f:
+        return json.load(f)  # type: ignore[no-any-return]
 
-def get_currency_rates() -> list[dict]:
-    logging.info("Получение курсов валют через exchangerate.host")
-    with open(SETTINGS_PATH, "r", encoding="utf-8") as f:
-        settings = json.load(f)
 
-    currencies = settings.get("user_currencies", [])
-    base_url = "https://api.exchangerate.host/latest?base=RUB"
+def get_cashback_rate() -> float:
+    """Базовая ставка кешбэка из раздела "cashback" настроек; без файла или раздела — DEFAULT_CASHBACK_RATE."""
+    if not Path(get_config().settings_path).exists():
+        return DEFAULT_CASHBACK_RATE
+    return float((load_settings().get("cashback") or {}).get("base_rate", DEFAULT_CASHBACK_RATE))
 
-    response = requests.get(base_url)
-    data = response.json()
-    rates = data.get("rates", {})
 
-    result = []
-    for currency in currencies:
-        rate = rates.get(currency)
-        if rate:
-            result.append({"currency": currency, "rate": round(1 / rate, 2)})
-        else:
-            logging.warning(f"Курс для валюты {currency} не найден")
-            result.append({"currency": currency, "rate": None})
+def get_stock_prices(api_key: str | None = None) -> list[dict]:
+    if api_key is None:
+        raise RuntimeError("API_KEY не задано в переменных окружения")
 
-    return result
+    logging.info("Получение цен акций через Alpha Vantage")
+    stocks = load_settings().get("user_stocks", [])
+    return get_market_client().stock_prices(stocks, api_key)
 
 
-def generate_main_page_data(date_str: str) -> dict:
-    logging.info(f"Генерация главной страницы на дату: {date_str}")
+def get_currency_rates() -> list[dict]:
+    logging.info("Получение курсов валют через exchangerate.host")
+    currencies = load_settings().get("user_currencies", [])
+    return get_market_client().currency_rates(currencies)
+
+
+def _timed(name: str, section: Callable[[], Any]) -> tuple[Any, float]:
+    started = time.perf_counter()
+    with metrics.span("page_section", section=name):
+        value = section()
+    return value, time.perf_counter() - started
+
+
+def _cached_section(name: str, arguments: Any, compute: Callable[[], Any], version: Any = None) -> Callable[[], Any]:
+    """Раздел страницы через кеш ответов; у рыночных разделов свой TTL из MARKET_TTLS."""
+    return lambda: cached_call(f"main_page.{name}", arguments, compute, version, MARKET_TTLS.get(name))
+
+
+def _get_page_executor(kind: str = "local") -> ThreadPoolExecutor:
+    """Общий для процесса пул разделов главной страницы: "local" — расчёты по операциям, "network" — API."""
+    with _page_executor_lock:
+        if kind not in _page_executors:
+            workers = NETWORK_WORKERS if kind == "network" else PAGE_WORKERS
+            _page_executors[kind] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"main-page-{kind}")
+        return _page_executors[kind]
+
+
+def generate_main_page_data(
+    date_str: str, deadline: float = PAGE_DEADLINE, filepath: Optional[str | Path] = None
+) -> dict:
+    """
+    Собирает данные главной страницы на указанную дату.
+
+    Разделы считаются параллельно: расчёты по операциям и сетевые запросы — в разных пулах потоков,
+    поэтому медленный API не задерживает и не вытесняет расчёты по операциям следующих запросов.
+    Сетевые запросы ограничены таймаутом клиента рыночных данных, так что зависшие разделы освобождают
+    потоки сами.
+    Разделы, кроме приветствия, берутся из кеша ответов (src/cache.py) по дате, версии операций и настроек;
+    рыночные данные — со своими TTL. Раздел, не уложившийся в deadline секунд или завершившийся ошибкой,
+    возвращается как None, а причина попадает в meta.errors. Время каждого раздела в миллисекундах —
+    в meta.timings_ms.
+    Операции берутся из filepath, по умолчанию — из data_path настроек.
+    """
+    from src.aggregates import month_to_date_top, month_to_date_totals
+    from src.store import load_store
+
+    logging.info("Генерация главной страницы на дату: %s", date_str)
+    config = get_config()
     current_date = parse_date(date_str)
-    df = filter_operations_by_date(date_str)
-
-    return {
-        "greeting": get_greeting(current_date),
-        "cards": get_card_stats(df),
-        "top_transactions": get_top_transactions(df),
-        "currency_rates": get_currency_rates(),
-        "stock_prices": get_stock_prices(api_key=API_KEY),
+    store = load_store(filepath or config.data_path)
+
+    moment, version = current_date.isoformat(), dataset_version(store)
+
+    sections: dict[str, Callable[[], Any]] = {
+        "greeting": lambda: get_greeting(current_date),
+        "cards": _cached_section(
+            "cards",
+            moment,
+            lambda: card_stats_from_totals(month_to_date_totals(store, "card", current_date), get_cashback_rate()),
+            version,
+        ),
+        "top_transactions": _cached_section(
+            "top_transactions", moment, lambda: get_top_transactions(month_to_date_top(store, current_date)), version
+        ),
+        "currency_rates": _cached_section("currency_rates", None, lambda: get_currency_rates()),
+        "stock_prices": _cached_section(
+            "stock_prices", config.api_key is not None, lambda: get_stock_prices(api_key=config.api_key)
+        ),
+    }
+    started = time.perf_counter()
+    futures = {
+        name: _get_page_executor("network" if name in NETWORK_SECTIONS else "local").submit(_timed, name, section)
+        for name, section in sections.items()
     }
+    wait(futures.values(), timeout=deadline)
+
+    result: dict[str, Any] = {}
+    timings: dict[str, float] = {}
+    errors: dict[str, str] = {}
+    for name, future in futures.items():
+        if not future.done():
+            future.cancel()
+            result[name] = None
+            errors[name] = "timeout"
+            timings[name] = round((time.perf_counter() - started) * 1000, 1)
+            logging.warning("Раздел %s не уложился в %s с", name, deadline)
+            continue
+        error = future.exception()
+        if error is not None:
+            result[name] = None
+            errors[name] = f"{type(error).__name__}: {error}"
+            logging.warning("Раздел %s завершился ошибкой: %s", name, error)
+            continue
+        result[name], elapsed = future.result()
+        timings[name] = round(elapsed * 1000, 1)
+
+    for name, error in errors.items():
+        metrics.incr("page_section_errors_total", section=name, reason="timeout" if error == "timeout" else "error")
+    result["meta"] = {"timings_ms": timings, "errors": errors}
+    return result
 
 
 if __name__ == "__main__":
     from pprint import pprint
 
-    pprint(generate_main_page_data("2024-12-20 14:30:00"))
\ No newline at end of file
+    from src.config import setup_logging
+
+    setup_logging()
+    pprint(generate_main_page_data("2024-12-20 14:30:00"))
@@ -0,0 +1,13 @@
+from typing import Iterator
+
+import pytest
+
+from src.cache import clear_response_cache
+
+
+@pytest.fixture(autouse=True)
+def response_cache() -> Iterator[None]:
+    """Каждый тест начинается с пустого кеша ответов: подменённые функции не должны попадать в чужие тесты."""
+    clear_response_cache()
+    yield
+    clear_response_cache()
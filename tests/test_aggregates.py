@@ -0,0 +1,68 @@
+import pandas as pd
+
+from src import aggregates, views
+from src.investment import RoundupLedger, day_number
+from src.store import OperationsStore, coerce_operations
+
+
+def _store() -> OperationsStore:
+    raw = pd.DataFrame(
+        {
+            "Дата операции": [
+                "01.06.2024 10:00:00",
+                "01.06.2024 12:00:00",
+                "02.06.2024 09:00:00",
+                "03.06.2024 08:00:00",
+                "03.06.2024 20:00:00",
+                "28.05.2024 11:00:00",
+            ],
+            "Номер карты": ["*1111", "*2222", "*1111", "*1111", "*2222", "*1111"],
+            "Сумма операции": [-100.0, -250.0, 500.0, -40.0, -1000.0, -70.0],
+            "Сумма платежа": [-100.0, -250.0, 500.0, -40.0, -1000.0, -70.0],
+            "Категория": ["A", "B", "C", "A", "B", "A"],
+            "MCC": [5411, 5812, None, 5411, 5812, 5411],
+            "Описание": ["Магнит", "Кафе", "Зарплата", "Магнит", "Ресторан", "Магнит"],
+        }
+    )
+    return OperationsStore(coerce_operations(raw))
+
+
+def test_month_totals_by_category() -> None:
+    cube = aggregates.AggregateCube.build(_store().frame)
+    assert cube.month_totals("category", "2024-06-01").to_dict() == {"A": 140.0, "B": 1250.0}
+    assert cube.counts("card", "2024-06-01", "2024-06-30").to_dict() == {"*1111": 2, "*2222": 2}
+
+
+def test_month_to_date_matches_raw_rows() -> None:
+    store = _store()
+    date = "2024-06-03 12:00:00"
+    raw = store.month_to_date(date)
+
+    cards = views.card_stats_from_totals(aggregates.month_to_date_totals(store, "card", date))
+    assert cards == views.get_card_stats(raw)
+    top = views.get_top_transactions(aggregates.month_to_date_top(store, date))
+    assert top == views.get_top_transactions(raw)
+
+
+def test_incremental_append() -> None:
+    store = _store()
+    cube = aggregates.AggregateCube.build(store.frame.iloc[:3])
+    cube.append(store.frame.iloc[3:])
+    full = aggregates.AggregateCube.build(store.frame)
+
+    pd.testing.assert_frame_equal(cube.daily["card"], full.daily["card"])
+    assert list(cube.month_top_labels("2024-06-01", 2)) == list(full.month_top_labels("2024-06-01", 2))
+
+
+def test_roundups_match_ledger_in_kopecks() -> None:
+    frame = _store().frame.copy()
+    # сумма с погрешностью float (например, после пересчёта) — ровно 100 ₽ в копейках
+    frame.loc[frame["amount"] == -100.0, "amount"] = -100.00000000000001
+    cube = aggregates.AggregateCube.build(frame)
+    ledger = RoundupLedger.build(frame)
+    period = [(day_number("2024-06-01"), day_number("2024-06-30"))]
+
+    for limit in aggregates.ROUNDUP_LIMITS:
+        expected = int(ledger.totals(limit, period)[0]) / 100
+        assert cube.roundup_total(limit, "2024-06-01", "2024-06-30") == expected
+    assert cube.roundup_total(10, "2024-06-01", "2024-06-01") == 0.0
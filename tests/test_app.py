@@ -0,0 +1,210 @@
+from pathlib import Path
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+from flask.testing import FlaskClient
+
+from src import views
+from src.app import create_app
+
+CSV_CONTENT = """Дата операции,Номер карты,Сумма операции,Сумма платежа,Категория,Описание
+01.06.2024 10:00:00,*1234,-100,-100,Супермаркеты,Магнит
+03.06.2024 12:00:00,*1234,-250,-250,Связь,МТС +7 921 111-22-33
+15.06.2024 09:00:00,*5678,-40,-40,Супермаркеты,Магнит
+"""
+
+
+@pytest.fixture
+def client(tmp_path: Path) -> FlaskClient:
+    data = tmp_path / "operations.csv"
+    data.write_text(CSV_CONTENT, encoding="utf-8")
+    settings = tmp_path / "user_settings.json"
+    settings.write_text('{"user_currencies": [], "user_stocks": []}', encoding="utf-8")
+    return create_app(data_path=data, settings_path=settings).test_client()
+
+
+def test_services_endpoints(client: FlaskClient) -> None:
+    assert client.get("/api/services/investment-bank?month=2024-06&limit=50").json == {
+        "month": "2024-06",
+        "limit": 50,
+        "invested": 10.0,
+    }
+    assert client.get("/api/services/cashback?year=2024&month=6").json == {"Супермаркеты": 140.0, "Связь": 250.0}
+    phones = client.get("/api/services/phones").json
+    assert phones["total"] == 1
+    assert phones["items"][0]["description"] == "МТС +7 921 111-22-33"
+
+
+def test_reports_endpoint(client: FlaskClient) -> None:
+    result = client.get("/api/reports/weekday?date=2024-06-30").json
+    assert result["понедельник"] == 250.0
+    assert client.get("/api/reports/unknown?date=2024-06-30").status_code == 400
+
+
+def test_etag_returns_not_modified(client: FlaskClient) -> None:
+    first = client.get("/api/services/cashback?year=2024&month=6")
+    assert first.status_code == 200
+    second = client.get("/api/services/cashback?year=2024&month=6", headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 304
+    other = client.get("/api/services/cashback?year=2024&month=5", headers={"If-None-Match": first.headers["ETag"]})
+    assert other.status_code == 200
+
+
+def test_main_page_endpoint(client: FlaskClient) -> None:
+    with (
+        patch.object(views, "get_currency_rates", return_value=[]),
+        patch.object(views, "get_stock_prices", return_value=[]),
+    ):
+        first = client.get("/api/main?date=2024-06-15 14:30:00")
+        second = client.get("/api/main?date=2024-06-15 14:30:00", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert first.json["cards"] == [
+        {"last_digits": "1234", "total_spent": 350.0, "cashback": 3},
+        {"last_digits": "5678", "total_spent": 40.0, "cashback": 0},
+    ]
+    assert second.status_code == 304
+    assert client.get("/api/main").status_code == 400
+
+
+def test_ingest_endpoint(client: FlaskClient) -> None:
+    before = client.get("/api/services/cashback?year=2024&month=6")
+    header, rows = CSV_CONTENT.split("\n", 1)
+    export = header + "\n" + rows
+    export += "20.06.2024 09:00:00,*5678,-60,-60,Связь,МТС\n"
+
+    result = client.post("/api/ingest", data=export.encode()).json
+    assert (result["added"], result["skipped"]) == (1, 3)
+
+    after = client.get("/api/services/cashback?year=2024&month=6", headers={"If-None-Match": before.headers["ETag"]})
+    assert after.status_code == 200
+    assert after.json == {"Супермаркеты": 140.0, "Связь": 310.0}
+
+
+def test_search_endpoint(client: FlaskClient) -> None:
+    result = client.get("/api/search?phone=8 921 111 22 33").json
+    assert result["total"] == 1
+    assert result["rows"][0]["amount"] == -250.0
+    assert client.get("/api/search?q=магнит&per_page=1&page=2").json["rows"][0]["amount"] == -40.0
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/api/services/phones?offset=-1",
+        "/api/services/phones?limit=-5",
+        "/api/services/phones?limit=0",
+        "/api/search?q=магнит&page=0",
+        "/api/search?q=магнит&per_page=0",
+        "/api/search?q=магнит&per_page=-1",
+        "/api/services/investment-bank?month=2024-06&limit=0",
+        "/api/services/investment-bank?month=2024-06&limit=-10",
+        "/api/services/cashback?year=2024&month=0",
+        "/api/services/cashback?year=2024&month=13",
+        "/api/services/cashback/ranking?year=2024&month=13",
+    ],
+)
+def test_pagination_parameters_are_validated(client: FlaskClient, url: str) -> None:
+    assert client.get(url).status_code == 400
+
+
+def test_responses_keep_key_order(client: FlaskClient, tmp_path: Path) -> None:
+    hours = client.get("/api/reports/hour?date=2024-06-30").json
+    assert list(hours) == [str(hour) for hour in range(24)]
+    weekdays = client.get("/api/reports/weekday?date=2024-06-30").json
+    assert list(weekdays)[:2] == ["понедельник", "вторник"]
+    data = tmp_path / "ranking.csv"
+    data.write_text(CSV_CONTENT.replace("Связь", "Яхты"), encoding="utf-8")
+    other = create_app(data_path=data, settings_path=tmp_path / "user_settings.json").test_client()
+    assert list(other.get("/api/services/cashback/ranking?year=2024&month=6").json) == ["Яхты", "Супермаркеты"]
+
+
+def test_metrics_endpoint(client: FlaskClient) -> None:
+    from src import metrics
+
+    metrics.reset()
+    metrics.enable()
+    try:
+        client.get("/api/services/cashback?year=2024&month=6")
+        text = client.get("/metrics").get_data(as_text=True)
+        assert 'course_work_compute_seconds_count{endpoint="cashback"} 1' in text
+        snapshot = client.get("/metrics?format=json").json
+        assert snapshot["enabled"] is True
+        assert any(item["name"] == "json_serialize" for item in snapshot["spans"])
+    finally:
+        metrics.enable(False)
+        metrics.reset()
+
+
+def test_investment_bank_grid_endpoint(client: FlaskClient) -> None:
+    query = "limits=10,50&months=2024-06&ranges=2024-06-01..2024-06-03"
+    result = client.get(f"/api/services/investment-bank/grid?{query}").json
+    assert result == {
+        "limits": [10, 50],
+        "rows": [
+            {"period": "2024-06", "invested": {"10": 0.0, "50": 10.0}},
+            {"period": "2024-06-01..2024-06-03", "invested": {"10": 0.0, "50": 0.0}},
+        ],
+    }
+    assert len(client.get("/api/services/investment-bank/grid").json["rows"]) == 12
+    assert client.get("/api/services/investment-bank/grid?limits=0").status_code == 400
+    assert client.get("/api/services/investment-bank/grid?ranges=2024-06-01").status_code == 400
+
+
+def test_cashback_optimize_endpoint(client: FlaskClient) -> None:
+    result = client.get("/api/services/cashback/optimize").json
+    assert result == {
+        "total_cashback": 3.9,
+        "months": [{"month": "2024-06", "spent": 390.0, "selected": [], "cashback": 3.9, "base_cashback": 3.9}],
+    }
+    assert client.get("/api/services/cashback/optimize?pick=-2").status_code == 400
+
+
+def test_sql_endpoint(client: FlaskClient) -> None:
+    sql = "SELECT card, SUM(amount) AS total FROM operations GROUP BY card ORDER BY card"
+    result = client.get(f"/api/sql?q={sql}").json
+    assert result == {"columns": ["card", "total"], "rows": [["*1234", -350.0], ["*5678", -40.0]], "truncated": False}
+    assert client.get("/api/sql?q=SELECT * FROM operations&limit=2").json["truncated"] is True
+
+    denied = client.get("/api/sql?q=DELETE FROM operations")
+    assert denied.status_code == 400
+    assert "not authorized" in denied.json["error"]
+    assert client.get("/api/sql?q=SELECT COUNT(*) FROM operations").json["rows"] == [[3]]
+    assert client.get("/api/sql?q=SELECT 1&limit=0").status_code == 400
+
+
+def test_recurring_endpoint(client: FlaskClient) -> None:
+    result = client.get("/api/services/recurring").json
+    assert result == {"monthly_total": 0.0, "series": []}
+    assert client.get("/api/services/recurring?date=2024-06-30&active=1").status_code == 200
+    assert client.get("/api/services/recurring?date=bad").status_code == 400
+
+
+def test_etag_changes_with_fx_table(tmp_path: Path) -> None:
+    from src.config import Config, configure, get_config
+    from src.fx import FxTable
+    from src.store import clear_stores
+
+    data = tmp_path / "operations.csv"
+    data.write_text(
+        "Дата операции,Номер карты,Сумма операции,Валюта операции,Сумма платежа,Валюта платежа,Категория,Описание\n"
+        "05.06.2024 12:00:00,*1234,-10,USD,-10,USD,Отели,Hotel\n",
+        encoding="utf-8",
+    )
+    fx_path = tmp_path / "fx.csv"
+    previous = get_config()
+    clear_stores()
+    try:
+        configure(Config(fx_rates_path=fx_path))
+        client = create_app(data_path=data, settings_path=tmp_path / "missing.json").test_client()
+        before = client.get("/api/services/cashback?year=2024&month=6")
+        assert before.json == {"Отели": 10.0}
+
+        FxTable(pd.DataFrame({"date": ["2024-06-01"], "currency": ["USD"], "rate": [90.0]})).save(fx_path)
+        etag = before.headers["ETag"]
+        after = client.get("/api/services/cashback?year=2024&month=6", headers={"If-None-Match": etag})
+        assert after.status_code == 200
+        assert after.json == {"Отели": 900.0}
+    finally:
+        configure(previous)
+        clear_stores()
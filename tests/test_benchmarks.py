@@ -0,0 +1,46 @@
+import json
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from benchmarks import run
+from benchmarks.synthetic import write_export
+from src.store import load_store
+
+
+def test_write_export_matches_bank_format(tmp_path: Path) -> None:
+    path = write_export(tmp_path / "operations.csv", 1200, seed=7, chunk_rows=500)
+    header = pd.read_csv("data/operations.csv", nrows=0).columns
+    raw = pd.read_csv(path, dtype=str)
+
+    assert list(raw.columns) == list(header)
+    assert raw["Дата операции"].str.fullmatch(r"\d{2}\.\d{2}\.\d{4} \d{2}:\d{2}:\d{2}").all()
+    assert raw["Сумма операции"].str.contains(",").all()
+
+    dates = pd.to_datetime(raw["Дата операции"], format="%d.%m.%Y %H:%M:%S")
+    assert dates.is_monotonic_decreasing
+
+    store = load_store(path, use_cache=False)
+    assert len(store) == 1200
+    assert store.frame["mcc"].notna().any()
+
+
+def test_synthetic_export_is_reproducible(tmp_path: Path) -> None:
+    first = write_export(tmp_path / "a.csv", 300, seed=1)
+    second = write_export(tmp_path / "b.csv", 300, seed=1)
+    assert first.read_bytes() == second.read_bytes()
+
+
+def test_run_benchmarks_writes_comparable_results(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(run, "DATA_DIR", tmp_path)
+    report = run.run_benchmarks(["500"], repeat=1)
+
+    cases = report["results"]["500"]["cases"]
+    expected = {"filter_operations_by_date", "generate_main_page_data", "investment_bank", "spending_by_weekday"}
+    assert expected <= set(cases)
+    assert all(case["median_s"] >= 0 and case["peak_mb"] >= 0 for case in cases.values())
+    json.dumps(report)
+
+    rows = run.compare(report, report)
+    assert rows and not any(row["regression"] for row in rows)
@@ -0,0 +1,137 @@
+import json
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+
+from src import services, views
+from src.cache import ResponseCache, cached_response, dataset_version, dumps, make_key, settings_hash
+from src.config import Config, configure, get_config
+from src.store import OperationsStore, coerce_operations, load_store
+from src.transactions import TransactionBatch
+
+CSV_CONTENT = """Дата операции,Номер карты,Сумма операции,Сумма платежа,Категория,Описание
+01.06.2024 10:00:00,*1234,-100,-100,Супермаркеты,Магнит
+03.06.2024 12:00:00,*1234,-250,-250,Связь,МТС +7 921 111-22-33
+"""
+
+
+def test_lru_and_ttl_eviction() -> None:
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == (True, 1)
+    cache.set("c", 3)
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+
+    cache.set("expired", 4, ttl=0)
+    assert cache.get("expired") == (False, None)
+
+
+def test_disk_tier_survives_new_instance(tmp_path: Path) -> None:
+    ResponseCache(disk_path=tmp_path).set("key", {"Супермаркеты": 100.0})
+    fresh = ResponseCache(disk_path=tmp_path)
+    assert fresh.get("key") == (True, {"Супермаркеты": 100.0})
+
+    fresh.clear()
+    assert not list(tmp_path.glob("*.json"))
+
+
+def test_make_key_normalizes_arguments() -> None:
+    assert make_key("f", {"year": 2024, "month": 6}, [1]) == make_key("f", {"month": 6, "year": 2024}, [1])
+    assert make_key("f", {"year": 2024}, [1]) != make_key("f", {"year": 2024}, [2])
+
+
+def test_compact_dumps() -> None:
+    value = {"month": "2024-06", "invested": np.float64(10.5)}
+    assert dumps(value, compact=True) == '{"month":"2024-06","invested":10.5}'
+    assert dumps({"month": "2024-06"}, indent=2) == '{\n  "month": "2024-06"\n}'
+
+
+def test_cached_response_keys_by_data_version() -> None:
+    calls = []
+
+    @cached_response("data")
+    def total(data: TransactionBatch, scale: int = 1) -> int:
+        calls.append(scale)
+        return int(data.amount.sum()) * scale
+
+    batch = TransactionBatch.from_transactions([{"Дата операции": "2024-06-01", "Сумма операции": -1.5}])
+    assert total(batch) == total(batch, scale=1) == -150
+    assert total(batch, 2) == -300
+    assert total(batch[np.array([], dtype=int)]) == 0
+    assert calls == [1, 2, 1]
+
+
+def test_store_version_and_settings_hash(tmp_path: Path) -> None:
+    data = tmp_path / "operations.csv"
+    data.write_text(CSV_CONTENT, encoding="utf-8")
+    store = load_store(data, use_cache=False)
+    before = dataset_version(store)
+    store.append(coerce_operations(store.frame.iloc[:0]))
+    assert dataset_version(store) == before
+    store.append(store.frame.iloc[:1].copy())
+    assert dataset_version(store) != before
+    assert dataset_version(OperationsStore(store.frame)) is None
+
+    settings = tmp_path / "settings.json"
+    settings.write_text('{"user_currencies": ["USD"]}', encoding="utf-8")
+    first = settings_hash(settings)
+    settings.write_text('{"user_currencies": ["USD", "EUR"]}', encoding="utf-8")
+    assert settings_hash(settings) != first
+    assert settings_hash(tmp_path / "missing.json") is None
+
+
+def test_services_json_served_from_cache() -> None:
+    batch = TransactionBatch.from_transactions([{"Дата операции": "2024-06-01", "Сумма операции": -7.0}])
+    with patch.object(services, "investment_bank", wraps=services.investment_bank) as compute:
+        first = services.investment_bank_json("2024-06", batch, 10)
+        second = services.investment_bank_json("2024-06", batch, 10)
+    assert first == second
+    assert json.loads(first)["invested"] == 3.0
+    assert compute.call_count == 1
+
+
+def test_compact_json_setting() -> None:
+    previous = get_config()
+    try:
+        configure(Config(compact_json=True, response_cache=False))
+        transactions = [{"Дата операции": "2024-06-01", "Сумма операции": -5.5}]
+        result = services.analyze_cashback_categories(transactions, 2024, 6)
+    finally:
+        configure(previous)
+    assert result == '{"Без категории":5.5}'
+
+
+def test_cached_json_keyed_by_compact_mode() -> None:
+    previous = get_config()
+    batch = TransactionBatch.from_transactions([{"Дата операции": "2024-06-01", "Сумма операции": -7.0}])
+    try:
+        configure(Config(compact_json=False))
+        pretty = services.investment_bank_json("2024-06", batch, 10)
+        configure(Config(compact_json=True))
+        compact = services.investment_bank_json("2024-06", batch, 10)
+    finally:
+        configure(previous)
+    assert "\n" in pretty
+    assert compact == '{"month":"2024-06","limit":10,"invested":3.0}'
+
+
+def test_main_page_sections_cached(tmp_path: Path) -> None:
+    data = tmp_path / "operations.csv"
+    data.write_text(CSV_CONTENT, encoding="utf-8")
+    with (
+        patch.object(views, "get_currency_rates", return_value=[{"currency": "USD", "rate": 80.0}]) as rates,
+        patch.object(views, "get_stock_prices", return_value=[]) as stocks,
+        patch.object(views, "get_top_transactions", wraps=views.get_top_transactions) as top,
+    ):
+        first = views.generate_main_page_data("2024-06-15 14:30:00", filepath=data)
+        second = views.generate_main_page_data("2024-06-15 14:30:00", filepath=data)
+        views.generate_main_page_data("2024-06-16 14:30:00", filepath=data)
+
+    assert {key: value for key, value in first.items() if key != "meta"} == {
+        key: value for key, value in second.items() if key != "meta"
+    }
+    assert (rates.call_count, stocks.call_count) == (1, 1)
+    assert top.call_count == 2
@@ -0,0 +1,127 @@
+import json
+
+import pandas as pd
+import pytest
+
+from src.cashback import (
+    CashbackProgram,
+    CashbackRule,
+    compare_programs,
+    load_program,
+    optimize_cashback,
+    optimize_cashback_json,
+    pick_variants,
+)
+from src.store import OperationsStore, coerce_operations
+from src.transactions import TransactionBatch
+
+SETTINGS = {
+    "cashback": {
+        "base_rate": 0.01,
+        "pick": 1,
+        "excluded_categories": ["Переводы"],
+        "rules": [
+            {"name": "Супермаркеты", "categories": ["Супермаркеты"], "rate": 0.05, "cap": 30},
+            {"name": "Рестораны", "mcc": [5812], "rate": 0.1},
+        ],
+    }
+}
+
+
+def _store() -> OperationsStore:
+    raw = pd.DataFrame(
+        {
+            "Дата операции": [
+                "01.05.2024 10:00:00",
+                "02.05.2024 10:00:00",
+                "03.05.2024 10:00:00",
+                "01.06.2024 10:00:00",
+                "02.06.2024 10:00:00",
+                "03.06.2024 10:00:00",
+                "04.06.2024 10:00:00",
+            ],
+            "Сумма операции": [-1000.0, -200.0, -5000.0, -400.0, -1500.0, 300.0, -100.0],
+            "Категория": ["Супермаркеты", "Кафе", "Переводы", "Супермаркеты", "Кафе", "Зарплата", "Супермаркеты"],
+            "MCC": [5411, 5812, None, 5411, 5812, None, 5411],
+            "Описание": ["Магнит", "Кафе", "Перевод", "Магнит", "Кафе", "Зарплата", "Магнит"],
+        }
+    )
+    return OperationsStore(coerce_operations(raw))
+
+
+def test_load_program() -> None:
+    program = load_program(SETTINGS)
+    assert program.pick == 1
+    assert program.excluded == ("Переводы",)
+    assert program.rules[1] == CashbackRule("Рестораны", 0.1, mccs=(5812,))
+    assert load_program({}) == CashbackProgram()
+    with pytest.raises(ValueError):
+        load_program({"cashback": {"rules": [{"categories": ["A"], "rate": 5}]}})
+
+
+def test_optimize_picks_best_rule_per_month() -> None:
+    plan = optimize_cashback(_store(), load_program(SETTINGS))
+
+    assert list(plan.index) == ["2024-05", "2024-06"]
+    assert plan.loc["2024-05", "spent"] == 1200.0
+    # май: 5% с 1000 (лимит 30) против 10% с 200 — выгоднее супермаркеты
+    assert plan.loc["2024-05", "selected"] == ["Супермаркеты"]
+    assert plan.loc["2024-05", "cashback"] == round(30 + 2, 2)
+    # июнь: 10% с 1500 выгоднее 5% с 500
+    assert plan.loc["2024-06", "selected"] == ["Рестораны"]
+    assert plan.loc["2024-06", "cashback"] == round(150 + 5, 2)
+    assert plan.loc["2024-06", "base_cashback"] == 20.0
+
+
+def test_compare_programs_and_monthly_cap() -> None:
+    program = load_program(SETTINGS)
+    variants = pick_variants(program, [0, 1, 2])
+    variants["capped"] = CashbackProgram(program.rules, pick=2, monthly_cap=40, excluded=program.excluded)
+
+    result = compare_programs(_store(), variants)
+
+    assert list(result.index) == ["pick=2", "pick=1", "capped", "pick=0"]
+    assert result.loc["pick=0", "total"] == 32.0
+    assert result.loc["pick=2", "total"] == (12 + 20 + 18) + (20 + 20 + 135)
+    assert result.loc["capped", "total"] == 80.0
+
+
+def test_matrix_append_and_list_source() -> None:
+    store = _store()
+    program = load_program(SETTINGS)
+    optimize_cashback(store, program)
+    extra = coerce_operations(
+        pd.DataFrame(
+            {
+                "Дата операции": ["05.07.2024 10:00:00"],
+                "Сумма операции": [-2000.0],
+                "Категория": ["Кафе"],
+                "MCC": [5812.0],
+                "Описание": ["Кафе"],
+            }
+        )
+    )
+    store.append(extra)
+
+    plan = optimize_cashback(store, program, months=["2024-07"])
+    assert plan.to_dict("index") == {
+        "2024-07": {"spent": 2000.0, "selected": ["Рестораны"], "cashback": 200.0, "base_cashback": 20.0}
+    }
+
+    transactions = [{"Дата операции": "2024-06-01", "Сумма операции": -100.0, "Категория": "Супермаркеты"}]
+    assert optimize_cashback(transactions, program).loc["2024-06", "cashback"] == 5.0
+
+
+def test_optimize_cashback_json_uses_repo_indent() -> None:
+    text = optimize_cashback_json(_store(), SETTINGS)
+    assert text == json.dumps(json.loads(text), ensure_ascii=False, indent=2)
+
+
+def test_batch_source_applies_mcc_rules() -> None:
+    store = _store()
+    program = load_program(SETTINGS)
+
+    plan = optimize_cashback(TransactionBatch.from_frame(store.frame), program)
+
+    pd.testing.assert_frame_equal(plan, optimize_cashback(store, program))
+    assert plan.loc["2024-06", "selected"] == ["Рестораны"]
@@ -0,0 +1,62 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from src.config import DEFAULT_DATA_PATH, Config, configure, get_config, load_config
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = {"pandas", "numpy", "requests", "dateutil", "dotenv", "flask"}
+# бюджет на импорт модуля вместе с зависимостями, микросекунды
+IMPORT_BUDGET_US = 150_000
+
+
+def test_load_config_prefers_environment_over_env_file(tmp_path: Path) -> None:
+    env_file = tmp_path / ".env"
+    env_file.write_text("API_KEY=from_file\nDATA_PATH=/data/file.csv\n", encoding="utf-8")
+    config = load_config(env={"API_KEY": "from_env", "METRICS_ENABLED": "1"}, env_file=env_file)
+    assert config.api_key == "from_env"
+    assert config.data_path == Path("/data/file.csv")
+    assert config.metrics_enabled is True
+
+
+def test_load_config_defaults() -> None:
+    config = load_config(env={}, env_file=None)
+    assert config == Config()
+    assert config.data_path == DEFAULT_DATA_PATH
+    assert config.api_key is None
+
+
+def test_configure_replaces_process_config(tmp_path: Path) -> None:
+    previous = get_config()
+    try:
+        configure(Config(data_path=tmp_path / "ops.csv"))
+        assert get_config().data_path == tmp_path / "ops.csv"
+    finally:
+        configure(previous)
+
+
+def _import_times(module: str) -> dict[str, int]:
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize("module", ["main", "src.views", "src.config", "src.metrics"])
+def test_import_is_lazy_and_within_budget(module: str) -> None:
+    times = _import_times(module)
+    assert not {name.split(".")[0] for name in times} & HEAVY_MODULES
+    assert times[module] < IMPORT_BUDGET_US
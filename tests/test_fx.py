@@ -0,0 +1,111 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src import views
+from src.config import Config, configure, get_config
+from src.fx import FxTable, add_rub_amounts
+from src.store import clear_stores, load_store
+
+TABLE = FxTable(
+    pd.DataFrame(
+        {
+            "date": ["2024-06-01", "2024-06-10", "2024-06-01"],
+            "currency": ["USD", "USD", "EUR"],
+            "rate": [90.0, 85.0, 100.0],
+        }
+    )
+)
+
+HEADER = ",".join(
+    [
+        "Дата операции",
+        "Номер карты",
+        "Сумма операции",
+        "Валюта операции",
+        "Сумма платежа",
+        "Валюта платежа",
+        "Категория",
+        "Описание",
+    ]
+)
+CSV_CONTENT = HEADER + """
+01.06.2024 10:00:00,*1234,-100,RUB,-100,RUB,Супермаркеты,Магнит
+05.06.2024 12:00:00,*1234,-10,USD,-10,USD,Отели,Hotel
+12.06.2024 12:00:00,*5678,-2,USD,-171,RUB,Кафе,Cafe
+"""
+
+
+def test_rates_as_of_transaction_date() -> None:
+    dates = pd.to_datetime(["2024-06-05", "2024-06-12", "2024-05-01", "2024-06-05", "2024-06-05", None]).to_numpy()
+    currencies = np.array(["USD", "usd", "USD", "RUB", "GBP", "USD"], dtype=object)
+
+    rates = TABLE.rates(dates, currencies)
+
+    assert rates[:4].tolist() == [90.0, 85.0, 90.0, 1.0]
+    assert np.isnan(rates[4:]).all()
+
+
+def test_add_rub_amounts_falls_back_to_payment_in_rub() -> None:
+    frame = pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2024-06-05", "2024-06-05", "2024-06-05"]),
+            "amount": [-10.0, -3.0, -5.0],
+            "currency": ["USD", "GBP", "GBP"],
+            "payment_amount": [-10.0, -300.0, -5.0],
+            "payment_currency": ["USD", "RUB", "GBP"],
+        }
+    )
+    converted = add_rub_amounts(frame, TABLE)
+    assert converted["amount_rub"].tolist() == [-900.0, -300.0, -5.0]
+    assert converted["payment_amount_rub"].tolist() == [-900.0, -300.0, -5.0]
+
+
+def test_table_roundtrip_update_and_implied_rates(tmp_path: Path) -> None:
+    path = tmp_path / "fx.csv"
+    TABLE.save(path)
+    loaded = FxTable.load(path)
+    assert loaded.version == TABLE.version
+    assert FxTable.load(tmp_path / "missing.csv").version == "empty"
+
+    updated = loaded.update([{"date": "2024-06-10", "currency": "USD", "rate": 86.0}])
+    assert len(updated) == 3
+    assert updated.rates(pd.to_datetime(["2024-06-11"]).to_numpy(), np.array(["USD"]))[0] == 86.0
+
+    operations = pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2024-06-01 10:00", "2024-06-01 18:00", "2024-06-02 09:00"]),
+            "amount": [-1.0, -2.0, -1.0],
+            "currency": ["EUR", "EUR", "RUB"],
+            "payment_amount": [-100.0, -202.0, -1.0],
+            "payment_currency": ["RUB", "RUB", "RUB"],
+        }
+    )
+    implied = FxTable.from_operations(operations).frame
+    assert implied.to_dict("records") == [{"date": pd.Timestamp("2024-06-01"), "currency": "EUR", "rate": 100.5}]
+
+
+def test_store_and_dashboard_use_rub_amounts(tmp_path: Path) -> None:
+    data = tmp_path / "operations.csv"
+    data.write_text(CSV_CONTENT, encoding="utf-8")
+    fx_path = tmp_path / "fx.csv"
+    previous = get_config()
+    clear_stores()
+    try:
+        configure(Config(fx_rates_path=fx_path))
+        store = load_store(data, use_cache=False)
+        # без таблицы курсов: платёж в рублях берётся как есть, сумма в долларах остаётся без пересчёта
+        assert store.frame["amount_rub"].tolist() == [-100.0, -10.0, -171.0]
+
+        TABLE.save(fx_path)
+        store = load_store(data, use_cache=False)
+        assert store.frame["amount_rub"].tolist() == [-100.0, -900.0, -170.0]
+        assert views.get_card_stats(store.frame) == [
+            {"last_digits": "1234", "total_spent": 1000.0, "cashback": 10},
+            {"last_digits": "5678", "total_spent": 170.0, "cashback": 1},
+        ]
+        assert views.get_top_transactions(store.frame)[0]["amount"] == -900.0
+    finally:
+        configure(previous)
+        clear_stores()
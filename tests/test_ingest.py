@@ -0,0 +1,108 @@
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from src import ingest
+from src.aggregates import get_cube
+from src.services import investment_bank_frame
+from src.store import cache_delta_path, cache_path_for, clear_stores, file_signature, load_cache, load_store
+
+HEADER = "Дата операции,Номер карты,Сумма операции,Сумма платежа,Категория,Описание\n"
+BASE = """01.06.2024 10:00:00,*1234,"-100,50","-100,50",Супермаркеты,Магнит
+02.06.2024 11:00:00,*1234,-250,-250,Связь,МТС
+02.06.2024 11:00:00,*1234,-250,-250,Связь,МТС
+"""
+OVERLAP = """02.06.2024 11:00:00,*1234,-250,-250,Связь,МТС
+02.06.2024 11:00:00,*1234,-250,-250,Связь,МТС
+02.06.2024 11:00:00,*1234,-250,-250,Связь,МТС
+03.06.2024 09:00:00,*5678,"-40,10","-40,10",Кафе,Кофейня
+"""
+
+
+def _setup(tmp_path: Path) -> tuple[Path, Path]:
+    clear_stores()
+    target = tmp_path / "operations.csv"
+    target.write_text(HEADER + BASE, encoding="utf-8")
+    export = tmp_path / "export.csv"
+    export.write_text(HEADER + OVERLAP, encoding="utf-8")
+    return target, export
+
+
+def test_ingest_appends_only_new_rows(tmp_path: Path) -> None:
+    target, export = _setup(tmp_path)
+    load_store(target)
+
+    result = ingest.ingest_export(export, target)
+    assert (result["received"], result["added"], result["skipped"]) == (4, 2, 2)
+    assert result["watermark"] == "2024-06-03T09:00:00"
+
+    again = ingest.ingest_export(export, target)
+    assert again["added"] == 0
+
+    clear_stores()
+    reloaded = load_store(target).frame
+    assert len(reloaded) == 5
+    assert reloaded["amount"].tolist() == [-100.5, -250.0, -250.0, -250.0, -40.1]
+
+
+def test_ingest_updates_aggregates_incrementally(tmp_path: Path) -> None:
+    target, export = _setup(tmp_path)
+    store = load_store(target)
+    cube = get_cube(store)
+
+    ingest.ingest_export(export, target)
+
+    assert get_cube(store) is cube
+    assert cube.month_totals("category", "2024-06").to_dict() == {"Кафе": 40.1, "Связь": 750.0, "Супермаркеты": 100.5}
+    assert cube.roundup_total(50, "2024-06-01", "2024-06-30") == investment_bank_frame(store.frame, "2024-06", 50)
+
+
+def test_new_rows_mask_without_watermark_keeps_everything() -> None:
+    incoming = pd.DataFrame({"date": pd.to_datetime(["2024-06-01"]), "amount": [-1.0]})
+    assert ingest.new_rows_mask(incoming, incoming, None).tolist() == [True]
+
+
+def test_ingest_appends_delta_to_binary_cache(tmp_path: Path) -> None:
+    target, export = _setup(tmp_path)
+    load_store(target)
+    cache = cache_path_for(target)
+    base_mtime = cache.stat().st_mtime_ns
+
+    ingest.ingest_export(export, target)
+    assert cache.stat().st_mtime_ns == base_mtime
+    assert cache_delta_path(cache, 1).exists()
+
+    cached = load_cache(cache, file_signature(target))
+    assert cached is not None
+    clear_stores()
+    parsed = load_store(target, use_cache=False).frame
+    assert cached["amount"].tolist() == parsed["amount"].tolist()
+    assert cached["category"].astype(str).tolist() == parsed["category"].astype(str).tolist()
+
+
+def test_ingest_skips_repeated_undated_rows(tmp_path: Path) -> None:
+    target, _ = _setup(tmp_path)
+    load_store(target)
+    export = tmp_path / "undated.csv"
+    # строка без даты и строка без суммы платежа
+    rows = ',*1234,-10,,Связь,МТС\n02.06.2024 11:00:00,*1234,-250,"",Связь,МТС\n'
+    export.write_text(HEADER + rows, encoding="utf-8")
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", RuntimeWarning)
+        assert ingest.ingest_export(export, target)["added"] == 2
+        assert ingest.ingest_export(export, target)["added"] == 0
+
+
+def test_concurrent_ingests_append_rows_once(tmp_path: Path) -> None:
+    target, export = _setup(tmp_path)
+    load_store(target)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda _: ingest.ingest_export(export, target), range(4)))
+
+    assert sorted(result["added"] for result in results) == [0, 0, 0, 2]
+    clear_stores()
+    assert len(load_store(target, use_cache=False).frame) == 5
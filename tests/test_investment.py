@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.investment import RoundupLedger, get_ledger, roundup_grid, roundup_grid_table
+from src.services import investment_bank, investment_bank_frame
+from src.store import OperationsStore, coerce_operations
+from src.transactions import TransactionBatch
+
+TRANSACTIONS = [
+    {"Дата операции": "2024-05-28", "Сумма операции": -70.01},
+    {"Дата операции": "2024-06-01", "Сумма операции": -1712.0},
+    {"Дата операции": "2024-06-01", "Сумма операции": -0.1},
+    {"Дата операции": "2024-06-15", "Сумма операции": 500.0},
+    {"Дата операции": "2024-06-30", "Сумма операции": -99.99},
+    {"Дата операции": "2024-07-01", "Сумма операции": -33.33},
+]
+
+
+def _store(transactions: list) -> OperationsStore:
+    raw = pd.DataFrame(
+        {
+            "Дата операции": [
+                pd.Timestamp(item["Дата операции"]).strftime("%d.%m.%Y 12:00:00") for item in transactions
+            ],
+            "Сумма операции": [item["Сумма операции"] for item in transactions],
+            "Категория": ["A"] * len(transactions),
+            "Описание": ["Магнит"] * len(transactions),
+        }
+    )
+    return OperationsStore(coerce_operations(raw))
+
+
+def test_grid_matches_investment_bank() -> None:
+    months = ["2024-05", "2024-06", "2024-07"]
+    limits = [10, 50, 100, 7]
+    grid = roundup_grid(TRANSACTIONS, limits, months=months)
+
+    assert list(grid.index) == months
+    for month in months:
+        for limit in limits:
+            assert grid.loc[month, limit] == investment_bank(month, TRANSACTIONS, limit)
+
+
+def test_grid_sources_agree() -> None:
+    store = _store(TRANSACTIONS)
+    batch = TransactionBatch.from_transactions(TRANSACTIONS)
+    ranges = [("2024-05-01", "2024-06-01")]
+    expected = roundup_grid(TRANSACTIONS, months=["2024-06"], ranges=ranges)
+
+    pd.testing.assert_frame_equal(roundup_grid(store, months=["2024-06"], ranges=ranges), expected)
+    pd.testing.assert_frame_equal(roundup_grid(batch, months=["2024-06"], ranges=ranges), expected)
+    assert list(expected.index) == ["2024-06", "2024-05-01..2024-06-01"]
+    assert expected.loc["2024-05-01..2024-06-01", 10] == round(9.99 + 8.0 + 9.9, 2)
+
+
+def test_default_grid_covers_last_months() -> None:
+    grid = roundup_grid(TRANSACTIONS, [50])
+    assert len(grid) == 12
+    assert grid.index[-1] == "2024-07"
+    assert grid.loc["2024-06", 50] == investment_bank_frame(_store(TRANSACTIONS).frame, "2024-06", 50)
+
+    table = roundup_grid_table(grid)
+    assert table["limits"] == [50]
+    assert table["rows"][-1] == {"period": "2024-07", "invested": {"50": 16.67}}
+
+
+def test_ledger_is_kopeck_exact() -> None:
+    ledger = RoundupLedger(np.zeros(1_000, dtype=np.int64), np.full(1_000, 1, dtype=np.int64))
+    assert ledger.totals(10, [(0, 0)])[0] == 999 * 1_000
+    with pytest.raises(ValueError):
+        ledger.totals(0, [(0, 0)])
+
+
+def test_ledger_append_resets_prefixes() -> None:
+    store = _store(TRANSACTIONS[:3])
+    assert roundup_grid(store, [10], months=["2024-06"]).loc["2024-06", 10] == round(8.0 + 9.9, 2)
+
+    store.append(_store(TRANSACTIONS[3:]).frame)
+
+    assert len(get_ledger(store).spent) == 5
+    assert roundup_grid(store, [10], months=["2024-06"]).loc["2024-06", 10] == round(8.0 + 9.9 + 0.01, 2)
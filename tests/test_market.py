@@ -0,0 +1,111 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Iterator
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from src.market import MarketDataClient
+
+PRICES = {"AAPL": "150.12", "MSFT": "410.5"}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    calls: list[str] = []
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        StubHandler.calls.append(url.path)
+        if url.path == "/query":
+            body = {"Global Quote": {"05. price": PRICES[query["symbol"][0]]}} if query["symbol"][0] in PRICES else {}
+        elif url.path == "/timeseries":
+            body = {"rates": {"2024-06-02": {"USD": 0.0125}, "2024-06-01": {"USD": 0.0111, "EUR": 0.01}}}
+        else:
+            body = {"rates": {"USD": 0.0125, "EUR": 0.0111}}
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def stub_url() -> Iterator[str]:
+    StubHandler.calls = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def _client(url: str, **kwargs: object) -> MarketDataClient:
+    return MarketDataClient(  # type: ignore[arg-type]
+        stock_url=f"{url}/query", currency_url=f"{url}/latest", history_url=f"{url}/timeseries", timeout=2, **kwargs
+    )
+
+
+def test_stock_prices_are_fetched_and_cached(stub_url: str) -> None:
+    client = _client(stub_url)
+    expected = [{"stock": "AAPL", "price": 150.12}, {"stock": "MSFT", "price": 410.5}, {"stock": "XXX", "price": None}]
+
+    assert client.stock_prices(["AAPL", "MSFT", "XXX"], "key") == expected
+    assert len(StubHandler.calls) == 3
+
+    assert client.stock_prices(["AAPL", "MSFT"], "key") == expected[:2]
+    assert len(StubHandler.calls) == 3
+
+
+def test_currency_rates_use_single_request(stub_url: str) -> None:
+    client = _client(stub_url)
+    assert client.currency_rates(["USD", "EUR", "GBP"]) == [
+        {"currency": "USD", "rate": 80.0},
+        {"currency": "EUR", "rate": 90.09},
+        {"currency": "GBP", "rate": None},
+    ]
+    client.currency_rates(["USD"])
+    assert StubHandler.calls == ["/latest"]
+
+
+def test_disk_cache_survives_restart_and_outage(stub_url: str, tmp_path: Path) -> None:
+    cache_path = tmp_path / "market.json"
+    _client(stub_url, cache_path=cache_path).stock_prices(["AAPL"], "key")
+
+    restarted = _client(stub_url, cache_path=cache_path)
+    assert restarted.stock_prices(["AAPL"], "key") == [{"stock": "AAPL", "price": 150.12}]
+    assert len(StubHandler.calls) == 1
+
+    offline = MarketDataClient(stock_url="http://127.0.0.1:9/query", timeout=0.5, ttl=0, cache_path=cache_path)
+    assert offline.stock_prices(["AAPL"], "key") == [{"stock": "AAPL", "price": 150.12}]
+
+
+def test_concurrent_disk_cache_saves(stub_url: str, tmp_path: Path) -> None:
+    cache_path = tmp_path / "market.json"
+    client = _client(stub_url, cache_path=cache_path)
+    threads = [
+        threading.Thread(target=client.stock_prices, args=(["AAPL", "MSFT"], "key")),
+        threading.Thread(target=client.currency_rates, args=(["USD", "EUR"],)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(json.loads(cache_path.read_text(encoding="utf-8"))) == sorted(client._cache)
+    assert list(tmp_path.glob("*.tmp")) == []
+
+
+def test_currency_history(stub_url: str) -> None:
+    assert _client(stub_url).currency_history(["USD", "RUB"], "2024-06-01", "2024-06-02") == [
+        {"date": "2024-06-01", "currency": "USD", "rate": 90.09009},
+        {"date": "2024-06-02", "currency": "USD", "rate": 80.0},
+    ]
+    assert StubHandler.calls == ["/timeseries"]
@@ -0,0 +1,80 @@
+import json
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from src import metrics
+from src.metrics import Metrics
+
+
+def test_disabled_registry_records_nothing() -> None:
+    registry = Metrics()
+    with registry.span("csv_load"):
+        pass
+    registry.incr("rows_scanned_total", 100, stage="filter")
+    snapshot = registry.snapshot()
+    assert snapshot["counters"] == [] and snapshot["spans"] == []
+    assert registry.span("csv_load") is registry.span("filter")
+
+
+def test_spans_and_counters() -> None:
+    registry = Metrics(enabled=True)
+    for _ in range(3):
+        with registry.span("external_fetch", service="stock"):
+            pass
+    registry.incr("cache_hits_total", cache="market")
+    registry.incr("cache_hits_total", 2, cache="market")
+
+    @registry.timed("report")
+    def report() -> int:
+        return 42
+
+    assert report() == 42
+    snapshot = registry.snapshot()
+    assert snapshot["counters"] == [{"name": "cache_hits_total", "labels": {"cache": "market"}, "value": 3}]
+    spans = {item["name"]: item for item in snapshot["spans"]}
+    assert spans["external_fetch"]["count"] == 3
+    assert spans["external_fetch"]["labels"] == {"service": "stock"}
+    assert spans["report"]["count"] == 1
+    json.dumps(snapshot)
+
+    registry.reset()
+    assert registry.snapshot()["counters"] == []
+
+
+def test_prometheus_text() -> None:
+    registry = Metrics(enabled=True, prefix="app")
+    registry.incr("external_calls_total", service="currency")
+    with registry.span("csv_load"):
+        pass
+    text = registry.to_prometheus()
+    assert "# TYPE app_external_calls_total counter" in text
+    assert 'app_external_calls_total{service="currency"} 1' in text
+    assert "# TYPE app_csv_load_seconds summary" in text
+    assert "app_csv_load_seconds_count 1" in text
+
+
+@pytest.fixture
+def enabled_metrics() -> Iterator[None]:
+    metrics.reset()
+    metrics.enable()
+    yield
+    metrics.enable(False)
+    metrics.reset()
+
+
+def test_store_loading_is_instrumented(tmp_path: Path, enabled_metrics: None) -> None:
+    from src.store import clear_stores, load_store
+
+    path = tmp_path / "operations.csv"
+    path.write_text("Дата операции,Сумма операции\n01.06.2024 10:00:00,-100\n", encoding="utf-8")
+    clear_stores()
+    load_store(path)
+    load_store(path)
+
+    text = metrics.to_prometheus()
+    assert 'course_work_cache_misses_total{cache="store"} 1' in text
+    assert 'course_work_cache_hits_total{cache="store"} 1' in text
+    assert 'course_work_rows_scanned_total{stage="csv_load"} 1' in text
+    assert "course_work_csv_load_seconds_count 1" in text
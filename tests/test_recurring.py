@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.recurring import RecurringDetector, find_recurring, get_detector, normalize_merchant, recurring_table
+from src.store import OperationsStore
+
+
+def _operations() -> pd.DataFrame:
+    rows = []
+    for month, day in zip(range(1, 7), [15, 15, 16, 15, 14, 15]):
+        rows.append((f"2024-{month:02}-{day:02} 03:00:00", -799.0, "Онлайн-кинотеатры", "Netflix.com"))
+        rows.append((f"2024-{month:02}-01 10:00:00", -30000.0 if month < 4 else -31000.0, "ЖКХ", "Аренда квартиры"))
+        rows.append((f"2024-{month:02}-05 09:00:00", 100000.0, "Зарплата", "Зарплата"))
+    for week, day in enumerate(pd.date_range("2024-04-01", periods=8, freq="7D")):
+        phone = "+7 921 111-22-33" if week % 2 else "+7 921 555-44-33"
+        rows.append((f"{day:%Y-%m-%d} 20:00:00", -300.0, "Мобильная связь", f"МТС {phone}"))
+    rng = np.random.default_rng(7)
+    for day in pd.Timestamp("2024-01-02") + pd.to_timedelta(np.cumsum(rng.integers(1, 5, 50)), unit="D"):
+        rows.append((f"{day:%Y-%m-%d} 18:00:00", -float(rng.integers(100, 3000)), "Супермаркеты", "Магнит"))
+    frame = pd.DataFrame(rows, columns=["date", "amount", "category", "description"])
+    frame["date"] = pd.to_datetime(frame["date"])
+    frame[["category", "description"]] = frame[["category", "description"]].astype("category")
+    return frame.sort_values("date", kind="stable", ignore_index=True)
+
+
+def test_normalize_merchant() -> None:
+    assert normalize_merchant("Я МТС +7 921 11-22-33") == "я мтс"
+    assert normalize_merchant("Яндекс.Плюс 12") == "яндекс плюс"
+    assert normalize_merchant("Ёлка") == normalize_merchant("елка")
+    assert normalize_merchant(None) == ""
+
+
+def test_find_recurring_series() -> None:
+    series = find_recurring(_operations(), as_of="2024-06-30").set_index("merchant")
+
+    assert set(series.index) == {"Netflix.com", "Аренда квартиры", "МТС +7 921 111-22-33"}
+    rent, netflix = series.loc["Аренда квартиры"], series.loc["Netflix.com"]
+    mobile = series.loc["МТС +7 921 111-22-33"]
+    assert (rent["period"], rent["count"], rent["amount"], rent["monthly_cost"]) == ("monthly", 6, 30500.0, 30500.0)
+    assert netflix["next_date"] == pd.Timestamp("2024-07-15")
+    assert netflix["category"] == "Онлайн-кинотеатры"
+    assert (mobile["period"], mobile["count"], mobile["monthly_cost"]) == ("weekly", 8, 1304.46)
+    assert mobile["next_date"] == pd.Timestamp("2024-05-27")
+    assert not mobile["active"] and netflix["active"]
+    assert list(find_recurring(_operations(), as_of="2024-06-30")["merchant"])[0] == "Аренда квартиры"
+
+    active = find_recurring(_operations(), as_of="2024-06-30", active_only=True)
+    assert set(active["merchant"]) == {"Netflix.com", "Аренда квартиры"}
+    assert recurring_table(active)["monthly_total"] == pytest.approx(31299.0)
+    assert recurring_table(active)["series"][1]["next_date"] == "2024-07-15"
+
+
+def test_detector_updates_incrementally_on_append() -> None:
+    operations = _operations()
+    cut = int(operations["date"].searchsorted(pd.Timestamp("2024-04-20")))
+    store = OperationsStore(operations.iloc[:cut].reset_index(drop=True))
+
+    before = find_recurring(store)
+    assert "МТС +7 921 111-22-33" not in set(before["merchant"])
+    detector = get_detector(store)
+
+    store.append(operations.iloc[cut:])
+    assert get_detector(store) is detector
+    appended = operations.iloc[cut:].query("amount < 0")["description"].astype(str)
+    dirty = {name for name, code in detector.merchants.items() if code in detector._dirty}
+    assert dirty == {normalize_merchant(description) for description in appended}
+    pd.testing.assert_frame_equal(find_recurring(store), find_recurring(operations))
+
+
+def test_detector_handles_concurrent_appends_and_reads() -> None:
+    operations = _operations()
+    detector = RecurringDetector()
+    chunks = np.array_split(np.arange(len(operations)), 8)
+
+    def work(positions: np.ndarray) -> None:
+        detector.append(operations.iloc[positions])
+        detector.series()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(work, chunks))
+
+    expected = RecurringDetector.build(operations).series()
+    pd.testing.assert_frame_equal(detector.series(), expected)
@@ -2,7 +2,7 @@ import json
 
 import pandas as pd
 
-from src.reports import spending_by_weekday
+from src.reports import spending_by_hour, spending_by_weekday, spending_by_weekday_batch, spending_by_weekday_type
 
 
 def test_spending_by_weekday_basic() -> None:
@@ -31,4 +31,35 @@ def test_spending_by_weekday_basic() -> None:
     assert all(v >= 0 for v in result.values())
 
     # Проверяем, что доход (положительная сумма) не учтен
-    assert result["суббота"] < 1000
\ No newline at end of file
+    assert result["суббота"] < 1000
+
+
+def _history() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "date": pd.to_datetime(
+                ["2024-05-04 10:00", "2024-05-06 12:30", "2024-06-01 10:15", "2024-06-03 12:45", "2024-06-03 18:00"]
+            ),
+            "amount": [-100.0, -300.0, -200.0, -50.0, 1000.0],
+        }
+    )
+
+
+def test_spending_by_weekday_type() -> None:
+    result = json.loads(spending_by_weekday_type(_history(), "2024-06-03 23:59:59"))
+    assert result == {"рабочий день": 175.0, "выходной день": 150.0}
+
+
+def test_spending_by_hour() -> None:
+    result = json.loads(spending_by_hour(_history(), "2024-06-03 23:59:59"))
+    assert result["10"] == 150.0
+    assert result["12"] == 175.0
+    assert result["18"] == 0
+
+
+def test_spending_by_weekday_batch_matches_single_calls() -> None:
+    df = _history()
+    dates = ["2024-05-05", "2024-06-01 23:00:00", "2024-06-03 23:59:59", "2024-09-01"]
+    batch = spending_by_weekday_batch(df, dates)
+    for date in dates:
+        assert batch[date] == json.loads(spending_by_weekday(df, date))
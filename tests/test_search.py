@@ -0,0 +1,52 @@
+import pandas as pd
+
+from src import search
+from src.store import OperationsStore, coerce_operations
+
+
+def _store() -> OperationsStore:
+    raw = pd.DataFrame(
+        {
+            "Дата операции": [
+                "01.06.2024 10:00:00",
+                "02.06.2024 10:00:00",
+                "03.06.2024 10:00:00",
+                "04.06.2024 10:00:00",
+            ],
+            "Сумма операции": [-500, -300, -450, -120],
+            "MCC": [4814, 5411, 4814, None],
+            "Описание": ["Я МТС +7 921 111-22-33", "Магнит у дома", "МТС +7-921-111-22-33", "Магнит"],
+        }
+    )
+    return OperationsStore(coerce_operations(raw))
+
+
+def test_normalize_phone() -> None:
+    assert search.normalize_phone("+7 921 111-22-33") == "+79211112233"
+    assert search.normalize_phone("8 (921) 111-22-33") == "+79211112233"
+    assert search.normalize_phone("9211112233") == "+79211112233"
+
+
+def test_search_by_phone_keyword_merchant_and_mcc() -> None:
+    store = _store()
+
+    by_phone = search.search_operations(store, phone="89211112233")
+    assert by_phone["total"] == 2
+    assert by_phone["rows"]["amount"].tolist() == [-500.0, -450.0]
+
+    assert search.search_operations(store, keyword="магнит")["total"] == 2
+    assert search.search_operations(store, merchant="у дом")["rows"]["amount"].tolist() == [-300.0]
+    assert search.search_operations(store, mcc=4814, keyword="мтс")["total"] == 2
+
+
+def test_search_pagination_and_append() -> None:
+    store = _store()
+    search.get_search_index(store)
+    rows = pd.DataFrame({"Дата операции": ["05.06.2024 10:00:00"], "Сумма операции": [-1], "Описание": ["Магнит"]})
+    store.append(coerce_operations(rows))
+
+    first = search.search_operations(store, keyword="магнит", per_page=2)
+    second = search.search_operations(store, keyword="магнит", page=2, per_page=2)
+    assert first["total"] == 3
+    assert first["rows"]["amount"].tolist() == [-300.0, -120.0]
+    assert second["rows"]["amount"].tolist() == [-1.0]
@@ -1,6 +1,17 @@
 import json
 
-from src.services import analyze_cashback_categories, find_phone_transactions, investment_bank
+import pandas as pd
+
+from src.services import (
+    analyze_cashback_categories,
+    cashback_categories_frame,
+    find_phone_frame,
+    find_phone_transactions,
+    investment_bank,
+    investment_bank_frame,
+    rank_cashback_categories,
+)
+from src.store import OperationsStore, coerce_operations
 
 
 def test_investment_bank_basic() -> None:
@@ -92,4 +103,48 @@ def test_analyze_cashback_categories_positive_amounts_ignored() -> None:
     result_json = analyze_cashback_categories(data, 2024, 6)
     result = json.loads(result_json)
 
-    assert result.get("Категория 1") == 500
\ No newline at end of file
+    assert result.get("Категория 1") == 500
+
+
+def test_analyze_cashback_categories_keeps_input_order_and_ints() -> None:
+    data = [
+        {"Дата операции": "2024-06-20", "Сумма операции": -300, "Категория": "Позже"},
+        {"Дата операции": "2024-06-01", "Сумма операции": -100, "Категория": "Раньше"},
+        {"Дата операции": "2024-06-02", "Сумма операции": -50},
+    ]
+
+    result_json = analyze_cashback_categories(data, 2024, 6)
+    assert result_json == '{"Позже": 300, "Раньше": 100, "Без категории": 50}'
+
+
+def test_rank_cashback_categories() -> None:
+    operations = OperationsStore(
+        coerce_operations(
+            pd.DataFrame(
+                {
+                    "Дата операции": ["01.06.2024 10:00:00", "02.06.2024 10:00:00", "03.06.2024 10:00:00"],
+                    "Сумма операции": [-100.0, -300.0, -50.0],
+                    "Категория": ["A", "B", "A"],
+                }
+            )
+        )
+    )
+    result = json.loads(rank_cashback_categories(operations, 2024, 6))
+    assert list(result.items()) == [("B", 300.0), ("A", 150.0)]
+
+
+def test_columnar_services_on_store_frame() -> None:
+    df = coerce_operations(
+        pd.DataFrame(
+            {
+                "Дата операции": ["15.06.2024 10:00:00", "01.06.2024 09:00:00", "31.05.2024 23:00:00"],
+                "Сумма операции": ["-160,89", "-64,00", "-100,50"],
+                "Категория": ["A", "B", "A"],
+                "Описание": ["МТС +7 921 111-22-33", "Магнит", "МТС +7 921 111-22-33"],
+            }
+        )
+    )
+
+    assert investment_bank_frame(df, "2024-06", 10) == 15.11
+    assert cashback_categories_frame(df, 2024, 6) == {"B": 64.0, "A": 160.89}
+    assert find_phone_frame(df)["amount"].tolist() == [-100.5, -160.89]
@@ -0,0 +1,122 @@
+import json
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from src import views
+from src.reports import spending_by_hour, spending_by_weekday, spending_by_weekday_type
+from src.services import cashback_categories_frame
+from src.sql_backend import OperationsDatabase, database_path_for, get_database
+from src.store import load_store, month_bounds
+
+DATES = ["2018-01-31 23:59:59", "2020-05-15 00:00:00", "2021-12-20 14:30:00"]
+
+HEADER = ",".join(
+    [
+        "Дата операции",
+        "Номер карты",
+        "Сумма операции",
+        "Валюта операции",
+        "Сумма платежа",
+        "Валюта платежа",
+        "Категория",
+        "MCC",
+        "Описание",
+    ]
+)
+CSV_CONTENT = HEADER + """
+01.06.2024 10:00:00,*1234,-100,RUB,-100,RUB,Супермаркеты,5411,Магнит
+05.06.2024 12:00:00,*1234,-10,USD,-900,RUB,Отели,7011,Hotel
+12.06.2024 12:00:00,*5678,-200,RUB,-200,RUB,,,Перевод
+"""
+
+
+@pytest.fixture(scope="module")
+def store():
+    return load_store("data/operations.csv")
+
+
+@pytest.fixture(scope="module")
+def database(store) -> OperationsDatabase:
+    database = OperationsDatabase()
+    database.import_frame(store.frame, "test")
+    return database
+
+
+@pytest.mark.parametrize("date", DATES)
+def test_main_page_blocks_match_pandas(store, database: OperationsDatabase, date: str) -> None:
+    month = store.month_to_date(date)
+
+    filtered = database.month_to_date(date)
+    assert filtered["date"].tolist() == month["date"].tolist()
+    assert filtered["description"].astype(object).tolist() == month["description"].astype(object).tolist()
+    assert database.card_stats(date) == views.get_card_stats(month)
+    assert database.card_stats(date, cashback_rate=0.05) == views.get_card_stats(month, cashback_rate=0.05)
+    assert database.top_transactions(date) == views.get_top_transactions(month)
+
+
+@pytest.mark.parametrize("date", DATES)
+def test_reports_match_pandas(store, database: OperationsDatabase, date: str) -> None:
+    assert database.spending_by_weekday(date) == pytest.approx(json.loads(spending_by_weekday(store.frame, date)))
+    assert database.spending_by_weekday_type(date) == pytest.approx(
+        json.loads(spending_by_weekday_type(store.frame, date))
+    )
+    assert database.spending_by_hour(date) == pytest.approx(json.loads(spending_by_hour(store.frame, date)))
+
+
+@pytest.mark.parametrize("month", ["2018-03", "2020-05", "2021-12"])
+def test_category_totals_match_pandas(store, database: OperationsDatabase, month: str) -> None:
+    start, _ = month_bounds(month)
+    expected = cashback_categories_frame(store.frame, start.year, start.month)
+    totals = database.category_totals(start.year, start.month)
+
+    assert list(totals) == list(expected)
+    assert totals == pytest.approx(expected)
+
+
+def test_queries_use_indexes(database: OperationsDatabase) -> None:
+    plans = {
+        "date": "SELECT * FROM operations WHERE date >= '2021-12-01' AND date <= '2021-12-20'",
+        "card": "SELECT * FROM operations WHERE card = '*7197' AND date >= '2021-12-01'",
+        "category": "SELECT * FROM operations WHERE category = 'Фастфуд' AND date >= '2021-12-01'",
+        "mcc": "SELECT * FROM operations WHERE mcc = 5411",
+    }
+    for column, sql in plans.items():
+        plan = " ".join(row[-1] for row in database.execute(f"EXPLAIN QUERY PLAN {sql}"))
+        assert f"USING INDEX idx_operations_{column}" in plan, plan
+
+
+def test_adhoc_query_is_read_only(store, database: OperationsDatabase) -> None:
+    result = database.query("SELECT category, COUNT(*) AS n FROM operations GROUP BY 1 ORDER BY n DESC", limit=2)
+    assert result["columns"] == ["category", "n"]
+    assert result["rows"][0] == ["Супермаркеты", 2274]
+    assert result["truncated"] is True
+    assert database.query("SELECT ? + 1 AS value", (41,))["rows"] == [[42]]
+
+    denied = ["DELETE FROM operations", "DROP TABLE operations", "PRAGMA table_info(operations)", "SELECT 1; SELECT 2"]
+    for sql in denied:
+        with pytest.raises(ValueError):
+            database.query(sql)
+    with pytest.raises(ValueError, match="interrupted"):
+        database.query(
+            "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) SELECT COUNT(*) FROM n", timeout=0.05
+        )
+    assert database.execute("SELECT COUNT(*) FROM operations") == [(len(store.frame),)]
+
+
+def test_database_is_reused_until_operations_change(tmp_path: Path) -> None:
+    path = tmp_path / "operations.csv"
+    path.write_text(CSV_CONTENT, encoding="utf-8")
+    store = load_store(path, use_cache=False)
+
+    database = get_database(store)
+    assert database.path == str(database_path_for(path)) == str(tmp_path / "operations.cache.sqlite")
+    assert database.category_totals(2024, 6) == {"Супермаркеты": 100.0, "Отели": 900.0, "Без категории": 200.0}
+    assert OperationsDatabase(database.path).version == database.version
+
+    version = database.version
+    assert get_database(store).version == version
+    store.append(store.frame.iloc[[0]].assign(date=pd.Timestamp("2024-06-20 10:00:00")))
+    assert get_database(store).version != version
+    assert get_database(store).execute("SELECT COUNT(*) FROM operations WHERE mcc = 5411") == [(2,)]
@@ -0,0 +1,153 @@
+import os
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import Workbook
+
+from src import store
+
+HEADER = ",".join(
+    [
+        "Дата операции",
+        "Дата платежа",
+        "Номер карты",
+        "Статус",
+        "Сумма операции",
+        "Валюта операции",
+        "Сумма платежа",
+        "Валюта платежа",
+        "Кэшбэк",
+        "Категория",
+        "MCC",
+        "Описание",
+        "Бонусы (включая кэшбэк)",
+        "Округление на инвесткопилку",
+        "Сумма операции с округлением",
+    ]
+)
+CSV_CONTENT = HEADER + """
+31.12.2021 16:44:00,31.12.2021,*7197,OK,"-160,89",RUB,"-160,89",RUB,,Супермаркеты,5411,Колхоз,"3,00","0,00","160,89"
+30.12.2021 12:00:00,30.12.2021,*4556,OK,"5000,00",RUB,"5000,00",RUB,,Пополнения,,Пополнение,"0,00","0,00","5000,00"
+"""
+
+
+def _write_csv(tmp_path: Path) -> Path:
+    file = tmp_path / "operations.csv"
+    file.write_text(CSV_CONTENT, encoding="utf-8")
+    return file
+
+
+def test_load_operations_types(tmp_path: Path) -> None:
+    store.clear_stores()
+    df = store.load_operations(_write_csv(tmp_path))
+
+    assert pd.api.types.is_datetime64_any_dtype(df["date"])
+    assert df["amount"].tolist() == [5000.0, -160.89]
+    assert isinstance(df["card"].dtype, pd.CategoricalDtype)
+    assert isinstance(df["category"].dtype, pd.CategoricalDtype)
+    assert df["date"].iloc[-1] == pd.Timestamp("2021-12-31 16:44:00")
+
+
+def test_load_operations_uses_binary_cache(tmp_path: Path) -> None:
+    store.clear_stores()
+    file = _write_csv(tmp_path)
+    first = store.load_operations(file)
+    assert store.cache_path_for(file).exists()
+
+    store.clear_stores()
+    second = store.load_operations(file)
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_load_store_reloads_changed_file(tmp_path: Path) -> None:
+    store.clear_stores()
+    file = _write_csv(tmp_path)
+    assert len(store.load_store(file)) == 2
+
+    file.write_text(CSV_CONTENT.rsplit("\n", 2)[0] + "\n", encoding="utf-8")
+    os.utime(file, ns=(1, 1))
+    assert len(store.load_store(file)) == 1
+
+
+def test_to_transactions() -> None:
+    df = store.coerce_operations(
+        pd.DataFrame({"Дата операции": ["01.06.2024 10:00:00"], "Сумма операции": ["-1,5"], "Категория": ["A"]})
+    )
+    assert store.to_transactions(df) == [{"Дата операции": "2024-06-01", "Сумма операции": -1.5, "Категория": "A"}]
+
+
+def test_store_is_sorted_and_sliced_by_date() -> None:
+    raw = pd.DataFrame(
+        {
+            "Дата операции": [
+                "15.06.2024 10:00:00",
+                "01.05.2024 09:00:00",
+                "20.06.2024 23:59:59",
+                "01.06.2024 00:00:00",
+            ],
+            "Сумма операции": [-1, -2, -3, -4],
+        }
+    )
+    operations = store.OperationsStore(store.coerce_operations(raw))
+
+    assert operations.frame["date"].is_monotonic_increasing
+    assert operations.month_to_date("2024-06-15 10:00:00")["amount"].tolist() == [-4.0, -1.0]
+    assert operations.between("2024-05-01", "2024-06-01")["amount"].tolist() == [-2.0, -4.0]
+    assert operations.between(start="2024-06-16")["amount"].tolist() == [-3.0]
+    assert operations.last_n_days("2024-06-21", 7)["amount"].tolist() == [-1.0, -3.0]
+    assert operations.between("2025-01-01", "2025-02-01").empty
+
+
+def _write_xlsx(tmp_path: Path) -> Path:
+    """Та же выгрузка, что CSV_CONTENT, но с ячейками Excel: даты — datetime, суммы — числа и строки с запятой."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(CSV_CONTENT.splitlines()[0].split(","))
+    sheet.append(
+        [datetime(2021, 12, 31, 16, 44), "31.12.2021", "*7197", "OK", -160.89, "RUB", "-160,89", "RUB", None]
+        + ["Супермаркеты", 5411, "Колхоз", "3,00", 0, 160.89]
+    )
+    sheet.append([None] * 15)
+    sheet.append(
+        ["30.12.2021 12:00:00", datetime(2021, 12, 30), "*4556", "OK", 5000, "RUB", 5000, "RUB", None]
+        + ["Пополнения", None, "Пополнение", 0, 0, "5000,00"]
+    )
+    file = tmp_path / "operations.xlsx"
+    workbook.save(file)
+    return file
+
+
+def test_read_operations_xlsx_matches_csv(tmp_path: Path) -> None:
+    xlsx = store.read_operations_xlsx(_write_xlsx(tmp_path), chunksize=1)
+    csv = store.read_operations_csv(_write_csv(tmp_path))
+
+    pd.testing.assert_frame_equal(xlsx, csv, check_categorical=False)
+    assert isinstance(xlsx["card"].dtype, pd.CategoricalDtype)
+    assert xlsx["card"].tolist() == ["*4556", "*7197"]
+
+
+def test_load_store_reads_xlsx_through_binary_cache(tmp_path: Path) -> None:
+    store.clear_stores()
+    file = _write_xlsx(tmp_path)
+    _write_csv(tmp_path)
+    first = store.load_operations(file)
+    assert store.cache_path_for(file) == tmp_path / "operations.xlsx.cache.npz"
+    assert store.cache_path_for(file).exists()
+
+    store.clear_stores()
+    pd.testing.assert_frame_equal(store.load_operations(file), first)
+    assert store.load_store(tmp_path / "operations.csv").frame["amount"].tolist() == [5000.0, -160.89]
+
+
+def test_store_append_keeps_undated_rows_last() -> None:
+    frame = store.coerce_operations(
+        pd.DataFrame({"date": pd.to_datetime(["2024-06-01", "2024-06-05", None]), "amount": [-1.0, -2.0, -3.0]})
+    )
+    operations = store.OperationsStore(frame)
+    rows = pd.DataFrame({"date": pd.to_datetime([None, "2024-06-03", "2024-06-10"]), "amount": [-4.0, -5.0, -6.0]})
+
+    operations.append(store.coerce_operations(rows))
+
+    assert operations.frame["amount"].tolist() == [-1.0, -5.0, -2.0, -6.0, -3.0, -4.0]
+    assert operations.between("2024-06-02", "2024-06-06")["amount"].tolist() == [-5.0, -2.0]
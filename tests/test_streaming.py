@@ -0,0 +1,49 @@
+import json
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from src import streaming, views
+from src.reports import spending_by_weekday
+from src.services import cashback_categories_frame, investment_bank_frame
+from src.store import load_store
+
+DATA_PATH = Path(__file__).resolve().parent.parent / "data" / "operations.csv"
+
+
+@pytest.mark.parametrize(
+    "date",
+    # 2021-08-31 и 2020-12-25 — месяцы с операциями в валюте: суммы в рублях отличаются от amount
+    ["2021-12-20 14:30:00", "2020-05-31 23:59:59", "2021-08-31 23:59:59", "2020-12-25 12:00:00"],
+)
+def test_stream_reports_match_in_memory(date: str) -> None:
+    streamed = streaming.stream_reports(DATA_PATH, date, limit=50, chunksize=500)
+
+    store = load_store(DATA_PATH)
+    current = pd.Timestamp(date)
+    month = store.month_to_date(current)
+    assert streamed["cards"] == views.get_card_stats(month, views.get_cashback_rate())
+    expected_categories = cashback_categories_frame(store.frame, current.year, current.month)
+    assert streamed["cashback_categories"] == pytest.approx(expected_categories)
+    assert streamed["investment_bank"] == investment_bank_frame(store.frame, current.strftime("%Y-%m"), 50)
+
+    assert streamed["spending_by_weekday"] == json.loads(spending_by_weekday(store.frame, date))
+
+
+@pytest.mark.parametrize("date", ["2021-08-31 23:59:59", "2020-12-25 12:00:00"])
+def test_parity_dates_have_foreign_currency(date: str) -> None:
+    month = load_store(DATA_PATH).month_to_date(date)
+    assert (month["amount_rub"] != month["amount"]).any()
+
+
+def test_iter_operation_chunks_are_typed() -> None:
+    chunks = list(streaming.iter_operation_chunks(DATA_PATH, chunksize=1000))
+    assert sum(len(chunk) for chunk in chunks) == len(load_store(DATA_PATH))
+    assert all(chunk["date"].is_monotonic_increasing for chunk in chunks)
+    assert all({"amount_rub", "payment_amount_rub"} <= set(chunk.columns) for chunk in chunks)
+
+
+def test_reducer_is_abstract() -> None:
+    with pytest.raises(TypeError):
+        streaming.Reducer()  # type: ignore[abstract]
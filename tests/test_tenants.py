@@ -0,0 +1,97 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import views
+from src.reports import spending_by_weekday
+from src.services import cashback_categories_frame, investment_bank_frame
+from src.store import load_store
+from src.tenants import TenantPartitions, month_end_report, month_end_reports
+
+CSV_CONTENT = """Дата операции,Номер карты,Сумма операции,Сумма платежа,Категория,Описание
+28.05.2024 10:00:00,*1234,-75,-75,Кафе,Кофейня
+01.06.2024 10:00:00,*1234,-100,-100,Супермаркеты,Магнит
+03.06.2024 12:00:00,*1234,-250,-250,Связь,МТС
+15.06.2024 09:00:00,*5678,-40,-40,Супермаркеты,Магнит
+"""
+
+
+@pytest.fixture
+def partitions(tmp_path: Path) -> TenantPartitions:
+    export = tmp_path / "operations.csv"
+    export.write_text(CSV_CONTENT, encoding="utf-8")
+    settings = tmp_path / "user_settings.json"
+    settings.write_text('{"cashback": {"base_rate": 0.05}}', encoding="utf-8")
+    partitions = TenantPartitions(tmp_path / "tenants")
+    assert partitions.import_export("alice", export, settings) == ["2024-05", "2024-06"]
+    partitions.import_export("bob", export)
+    return partitions
+
+
+def test_partitions_round_trip_through_memory_map(partitions: TenantPartitions) -> None:
+    assert partitions.users() == ["alice", "bob"]
+    assert partitions.months("alice") == ["2024-05", "2024-06"]
+    assert (partitions.root / "alice" / "2024" / "06" / "amount.npy").exists()
+
+    june = partitions.load_month("alice", "2024-06")
+    assert june["amount"].tolist() == [-100.0, -250.0, -40.0]
+    assert june["card"].tolist() == ["*1234", "*1234", "*5678"]
+    assert isinstance(june["amount"].to_numpy().base, np.memmap)
+    assert not june["amount"].to_numpy().flags.writeable
+
+    everything = partitions.load("alice")
+    assert everything["date"].is_monotonic_increasing
+    assert isinstance(everything["category"].dtype, pd.CategoricalDtype)
+    assert everything["category"].tolist() == ["Кафе", "Супермаркеты", "Связь", "Супермаркеты"]
+    assert partitions.settings("alice") == {"cashback": {"base_rate": 0.05}}
+    assert partitions.settings("bob") == {}
+    with pytest.raises(ValueError):
+        partitions.months("../alice")
+
+
+def test_partial_export_is_merged_into_month(partitions: TenantPartitions, tmp_path: Path) -> None:
+    header = CSV_CONTENT.split("\n", 1)[0]
+    weekly = tmp_path / "weekly.csv"
+    # недельная выгрузка: одна операция уже есть в партиции, одна новая
+    rows = "15.06.2024 09:00:00,*5678,-40,-40,Супермаркеты,Магнит\n20.06.2024 10:00:00,*1234,-5,-5,Кафе,Чай\n"
+    weekly.write_text(f"{header}\n{rows}", encoding="utf-8")
+
+    assert partitions.import_export("alice", weekly) == ["2024-06"]
+    assert partitions.load_month("alice", "2024-06")["amount"].tolist() == [-100.0, -250.0, -40.0, -5.0]
+    assert partitions.import_export("alice", weekly) == []
+    assert len(partitions.load_month("alice", "2024-06")) == 4
+
+
+def test_month_end_report_matches_single_user_functions(tmp_path: Path) -> None:
+    store = load_store("data/operations.csv")
+    partitions = TenantPartitions(tmp_path)
+    partitions.write_operations("demo", store.frame)
+
+    report = month_end_report(partitions, "demo", "2021-12")
+
+    month = store.between("2021-12-01", "2021-12-31 23:59:59")
+    assert report["operations"] == len(month)
+    assert report["cards"] == views.get_card_stats(month)
+    assert report["cashback_categories"] == cashback_categories_frame(store.frame, 2021, 12)
+    assert report["spending_by_weekday"] == json.loads(spending_by_weekday(store.frame, "2021-12-31 23:59:59"))
+    assert report["investment_bank"]["50"] == investment_bank_frame(store.frame, "2021-12", 50)
+
+
+def test_month_end_reports_on_process_pool(partitions: TenantPartitions) -> None:
+    users = ["alice", "bob", "carol", "../eve"]
+    reports = list(month_end_reports("2024-06", users, partitions.root, workers=2, chunksize=1))
+
+    assert [report["user"] for report in reports] == users
+    assert reports[0]["cards"] == [
+        {"last_digits": "1234", "total_spent": 350.0, "cashback": 17},
+        {"last_digits": "5678", "total_spent": 40.0, "cashback": 2},
+    ]
+    assert reports[1]["cards"][0]["cashback"] == 3
+    assert reports[0]["cashback_categories"] == {"Супермаркеты": 140.0, "Связь": 250.0}
+    assert reports[0]["investment_bank"] == {"10": 0.0, "50": 10.0, "100": 110.0}
+    assert reports[2]["operations"] == 0
+    assert "Некорректное имя" in reports[3]["error"]
+    assert reports[:3] == list(month_end_reports("2024-06", users[:3], partitions.root, workers=1))
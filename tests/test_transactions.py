@@ -0,0 +1,89 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from src.reports import spending_by_hour, spending_by_weekday
+from src.services import analyze_cashback_categories, find_phone_transactions, investment_bank
+from src.store import coerce_operations
+from src.transactions import MISSING_DAY, TransactionBatch
+
+TRANSACTIONS = [
+    {"Дата операции": "2024-06-01", "Сумма операции": -1712.35, "Категория": "Продукты", "Описание": "Покупка"},
+    {"Дата операции": "2024-06-15", "Сумма операции": -2050, "Категория": "Связь", "Описание": "МТС +7 921 111-22-33"},
+    {"Дата операции": "2024-05-20", "Сумма операции": -900, "Категория": "Рестораны", "Описание": "Обед"},
+    {"Дата операции": "2024-06-10", "Сумма операции": 500, "Категория": "Доход", "Описание": "Зарплата"},
+    {"Дата операции": "2024-06-03", "Сумма операции": -350.1, "Категория": None, "Описание": "Магазин"},
+    {"Дата операции": None, "Сумма операции": -10, "Категория": "Продукты", "Описание": "Без даты"},
+]
+
+
+def test_batch_layout() -> None:
+    batch = TransactionBatch.from_transactions(TRANSACTIONS)
+    assert len(batch) == 6
+    assert batch.amount.dtype == np.int64 and batch.day.dtype == np.int32
+    assert batch.amount.tolist() == [-171235, -205000, -90000, 50000, -35010, -1000]
+    assert batch.day[0] == (pd.Timestamp("2024-06-01") - pd.Timestamp("1970-01-01")).days
+    assert batch.day[5] == MISSING_DAY
+    assert batch.codes["category"][4] == -1
+    assert batch.nbytes < 40 * len(batch)
+
+
+def test_frame_round_trip_shares_category_codes() -> None:
+    frame = coerce_operations(
+        pd.DataFrame(
+            {
+                "Дата операции": ["01.06.2024 10:15:30", "02.06.2024 23:00:00"],
+                "Сумма операции": ["-100,5", "-20"],
+                "Категория": ["Супермаркеты", "Такси"],
+                "Номер карты": ["*1234", "*5678"],
+                "Описание": ["Магнит", "Яндекс Такси"],
+            }
+        )
+    )
+    batch = TransactionBatch.from_frame(frame)
+    assert np.shares_memory(batch.codes["category"], frame["category"].cat.codes.to_numpy())
+
+    restored = batch.to_frame()
+    assert restored["date"].tolist() == frame["date"].tolist()
+    assert restored["amount"].tolist() == [-100.5, -20.0]
+    assert restored["card"].astype(str).tolist() == ["*1234", "*5678"]
+
+
+def test_services_accept_batch() -> None:
+    batch = TransactionBatch.from_transactions(TRANSACTIONS)
+    for limit in (10, 50, 100):
+        assert investment_bank("2024-06", batch, limit) == investment_bank("2024-06", TRANSACTIONS, limit)
+    assert json.loads(analyze_cashback_categories(batch, 2024, 6)) == json.loads(
+        analyze_cashback_categories(TRANSACTIONS, 2024, 6)
+    )
+    assert json.loads(find_phone_transactions(batch)) == [
+        {
+            "Дата операции": "2024-06-15",
+            "Сумма операции": -2050.0,
+            "Категория": "Связь",
+            "Описание": "МТС +7 921 111-22-33",
+        }
+    ]
+
+
+def test_reports_accept_batch() -> None:
+    frame = coerce_operations(
+        pd.DataFrame(
+            {
+                "Дата операции": ["03.06.2024 10:00:00", "04.06.2024 12:30:00", "08.06.2024 12:00:00"],
+                "Сумма операции": ["-100", "-250,5", "40"],
+            }
+        )
+    )
+    batch = TransactionBatch.from_frame(frame)
+    assert spending_by_weekday(batch, "2024-06-30") == spending_by_weekday(frame, "2024-06-30")
+    assert spending_by_hour(batch, "2024-06-30") == spending_by_hour(frame, "2024-06-30")
+
+
+def test_batch_keeps_mcc() -> None:
+    transactions = [{**TRANSACTIONS[0], "MCC": 5411}, {**TRANSACTIONS[1], "MCC": None}, TRANSACTIONS[2]]
+    batch = TransactionBatch.from_transactions(transactions)
+    mccs = batch.to_frame(("date", "mcc"))["mcc"]
+    assert mccs.dtype == np.float64
+    assert mccs.fillna(-1).tolist() == [5411.0, -1.0, -1.0]
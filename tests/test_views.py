@@ -1,10 +1,13 @@
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
-from unittest.mock import mock_open, patch, Mock
+from unittest.mock import Mock, mock_open, patch
 
 import pandas as pd
 
 from src import views
+from src.market import MarketDataClient
 
 
 def test_get_greeting() -> None:
@@ -23,6 +26,7 @@ def test_get_card_stats() -> None:
         {"last_digits": "4321", "total_spent": 250.0, "cashback": 2},
     ]
     assert result == expected
+    assert [card["cashback"] for card in views.get_card_stats(df, cashback_rate=0.05)] == [10, 12]
 
 
 def test_get_top_transactions() -> None:
@@ -54,16 +58,74 @@ def test_filter_operations_by_date(tmp_path: Path) -> None:
 
 
 @patch("builtins.open", new_callable=mock_open, read_data='{"user_stocks": ["AAPL"]}')
-@patch("src.views.requests.get")
-def test_get_stock_prices(mock_requests_get: Mock, _: Mock) -> None:
-    mock_requests_get.return_value.json.return_value = {"Global Quote": {"05. price": "150.12"}}
-    result = views.get_stock_prices(api_key="test_api_key")
+def test_get_stock_prices(_: Mock) -> None:
+    session = Mock()
+    session.get.return_value.json.return_value = {"Global Quote": {"05. price": "150.12"}}
+    with patch.object(views, "get_market_client", return_value=MarketDataClient(session=session)):
+        result = views.get_stock_prices(api_key="test_api_key")
     assert result == [{"stock": "AAPL", "price": 150.12}]
 
 
 @patch("builtins.open", new_callable=mock_open, read_data='{"user_currencies": ["USD"]}')
-@patch("src.views.requests.get")
-def test_get_currency_rates(mock_requests_get: Mock, _: Mock) -> None:
-    mock_requests_get.return_value.json.return_value = {"rates": {"USD": 0.013}}
-    result = views.get_currency_rates()
-    assert result == [{"currency": "USD", "rate": 76.92}]
\ No newline at end of file
+def test_get_currency_rates(_: Mock) -> None:
+    session = Mock()
+    session.get.return_value.json.return_value = {"rates": {"USD": 0.013}}
+    with patch.object(views, "get_market_client", return_value=MarketDataClient(session=session)):
+        result = views.get_currency_rates()
+    assert result == [{"currency": "USD", "rate": 76.92}]
+
+
+def test_generate_main_page_data_degrades_slow_sections(tmp_path: Path) -> None:
+    file = tmp_path / "ops.csv"
+    file.write_text(
+        """Дата операции,Сумма операции,Сумма платежа,Категория,Описание,Номер карты
+01.06.2024 10:00:00,-100,-100,TestCat,desc1,*1234
+15.06.2024 09:00:00,-200,-200,TestCat,desc2,*1234
+""",
+        encoding="utf-8",
+    )
+
+    def slow_stocks(api_key: str | None = None) -> list[dict]:
+        time.sleep(1)
+        return []
+
+    with (
+        patch.object(views, "get_currency_rates", return_value=[{"currency": "USD", "rate": 80.0}]),
+        patch.object(views, "get_stock_prices", side_effect=slow_stocks),
+    ):
+        result = views.generate_main_page_data("2024-06-15 14:30:00", deadline=0.3, filepath=file)
+
+    assert result["greeting"] == "Добрый день"
+    assert result["cards"] == [{"last_digits": "1234", "total_spent": 300.0, "cashback": 3}]
+    assert result["currency_rates"] == [{"currency": "USD", "rate": 80.0}]
+    assert result["stock_prices"] is None
+    assert result["meta"]["errors"] == {"stock_prices": "timeout"}
+    sections = {"greeting", "cards", "top_transactions", "currency_rates", "stock_prices"}
+    assert set(result["meta"]["timings_ms"]) == sections
+
+
+def test_hung_network_sections_do_not_starve_local_sections(tmp_path: Path) -> None:
+    file = tmp_path / "ops.csv"
+    file.write_text(
+        "Дата операции,Сумма операции,Сумма платежа,Категория,Описание,Номер карты\n"
+        "01.06.2024 10:00:00,-100,-100,TestCat,desc1,*1234\n",
+        encoding="utf-8",
+    )
+    released = threading.Event()
+
+    def hung_fetch(api_key: str | None = None) -> list[dict]:
+        released.wait(5)
+        return []
+
+    try:
+        with (
+            patch.object(views, "get_currency_rates", side_effect=hung_fetch),
+            patch.object(views, "get_stock_prices", side_effect=hung_fetch),
+        ):
+            # больше запросов, чем потоков в пулах: зависшие сетевые разделы копятся в своём пуле
+            for _ in range(views.PAGE_WORKERS + 1):
+                result = views.generate_main_page_data("2024-06-15 14:30:00", deadline=0.2, filepath=file)
+                assert result["cards"] == [{"last_digits": "1234", "total_spent": 100.0, "cashback": 1}]
+                assert set(result["meta"]["errors"]) == {"currency_rates", "stock_prices"}
+    finally:
+        released.set()